@@ -1,9 +1,34 @@
+from __future__ import annotations # Shouldn't be needed after python 3.14
 
-
-from .res import Resource
-from .step import Step
+# Submodules are only imported once their classes are used, to keep startup
+# fast. Even typing is left alone here, as `python -m Skritt.client` goes
+# through this file.
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Any
+    from .res import Resource
+    from .runner import Runner
+    from .step import Step
+    from .base import hook
 
 __all__ = (
         'Resource',
+        'Runner',
         'Step',
+        'hook',
         )
+
+def __getattr__(name: str) -> Any:
+    if name == 'Resource':
+        from .res import Resource
+        return Resource
+    if name == 'Runner':
+        from .runner import Runner
+        return Runner
+    if name == 'Step':
+        from .step import Step
+        return Step
+    if name == 'hook':
+        from .base import hook
+        return hook
+    raise AttributeError(F"module {__name__!r} has no attribute {name!r}")
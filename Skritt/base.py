@@ -15,13 +15,87 @@
 # limitations under the License.
 
 from __future__ import annotations # Shouldn't be needed after python 3.14
-from collections.abc import Generator
-from typing import Protocol, Self
+from collections.abc import Callable, Coroutine, Generator, Sequence
+from typing import Any, ClassVar, NamedTuple, NoReturn, Protocol, Self
 
+import contextlib
 from abc import ABC, abstractmethod
 from argparse import ArgumentParser, Namespace, _ArgumentGroup
+from collections import deque
+from threading import Lock
 
-from collections import defaultdict
+# An argument definition: group name, then add_argument()'s args and kwargs
+type TypeArgumentDef = tuple[str, tuple[Any, ...], dict[str, Any]]
+
+class ParserShared:
+    """
+    A parser built once from a list of argument definitions, for all Steps of a
+    class defining the same arguments. Parsing mutates it for a moment, hence the lock.
+    """
+    def __init__(self, aGroups: list[str], aDefs: list[TypeArgumentDef]) -> None:
+        self.aGroups = aGroups
+        self.aDefs = aDefs
+        self.parser, self.mGroups = buildParser(aGroups, aDefs)
+        self.lock = Lock()
+        # parse_intermixed_args() would otherwise format this all over again each time
+        self.usage = self.parser.format_usage()[7:]
+
+    def parse(self, aCmdline: list[str], isQuiet: bool = False) -> Namespace:
+        with self.lock, quietParser(self.parser) if isQuiet else contextlib.nullcontext():
+            self.parser.usage = self.usage
+            try:
+                return self.parser.parse_intermixed_args(aCmdline)
+            finally:
+                self.parser.usage = None
+
+@contextlib.contextmanager
+def quietParser(parser: ArgumentParser) -> Generator[None]:
+    """
+    Make a parser raise SystemExit without printing anything on bad arguments
+    or --help, for parsing on the side
+    """
+    def exitQuietly(status: int = 0, message: str | None = None) -> NoReturn:
+        raise SystemExit(status)
+    def errorQuietly(message: str) -> NoReturn:
+        raise SystemExit(2)
+    def printNothing(file: Any = None) -> None:
+        pass
+    mOverrides = {'exit': exitQuietly, 'error': errorQuietly, 'print_help': printNothing, 'print_usage': printNothing}
+    for name, func in mOverrides.items():
+        setattr(parser, name, func)
+    try:
+        yield
+    finally:
+        for name in mOverrides:
+            delattr(parser, name)
+
+def buildParser(aGroups: list[str], aDefs: list[TypeArgumentDef]) -> tuple[ArgumentParser, dict[str, _ArgumentGroup]]:
+    parser = ArgumentParser(allow_abbrev=False, exit_on_error=False)
+    mGroups = {name: parser.add_argument_group(name) for name in aGroups}
+    for nameGroup, args, kwargs in aDefs:
+        mGroups[nameGroup].add_argument(*args, **kwargs)
+    return parser, mGroups
+
+class ArgumentGroup:
+    """
+    What getParser() returns: records add_argument() calls, so that Steps can
+    share a parser instead of each building their own. Anything else argparse
+    groups can do is passed on to a parser of the Step's own, built on the spot.
+
+    Unlike with argparse, add_argument() doesn't return the Action.
+    """
+    def __init__(self, step: StepBase, nameGroup: str) -> None:
+        self.step = step
+        self.nameGroup = nameGroup
+
+    def add_argument(self, *args: Any, **kwargs: Any) -> None:
+        if self.step.parserOwn is not None:
+            self.step.parserOwn[1][self.nameGroup].add_argument(*args, **kwargs)
+        else:
+            self.step.aArgumentDefs.append((self.nameGroup, args, kwargs))
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.step.detachParser()[1][self.nameGroup], name)
 
 class TypeHookFunc[C: StepBase](Protocol):
     """
@@ -32,6 +106,53 @@ class TypeHookFunc[C: StepBase](Protocol):
     def __call__(self, step: C) -> None:
         pass
 
+# The hooks of a lifecycle, in the order they run
+type TypeHooks[C: StepBase] = Sequence[tuple[str, TypeHookFunc[C]]]
+
+class HookDecl(NamedTuple):
+    """
+    A hook declared with @hook on a method
+    """
+    nameLifecycle: str
+    priority: int
+    name: str
+
+def hook[F: Callable[..., None]](nameLifecycle: str, priority: int = 0, name: str = "") -> Callable[[F], F]:
+    """
+    Declare a method as a hook of a lifecycle, for all instances of the class.
+    Hooks with lower priority run first; at equal priority, base classes' first,
+    then in the order of declaration. Can be stacked to hook several lifecycles.
+    """
+    def decorate(func: F) -> F:
+        aDecls: list[HookDecl] = getattr(func, 'aHookDecls', [])
+        setattr(func, 'aHookDecls', aDecls + [HookDecl(nameLifecycle, priority, name or func.__name__)])
+        return func
+    return decorate
+
+def compileHooks(cls: type) -> dict[str, TypeHooks[Any]]:
+    """
+    Merge the hooks declared along the MRO of a class into a dispatch tuple per lifecycle.
+    A method overriden in a subclass stays hooked, unless re-declared with @hook.
+    """
+    mDecls: dict[str, list[HookDecl]] = {}
+    for klass in reversed(cls.__mro__):
+        for nameAttr, value in vars(klass).items():
+            if hasattr(value, 'aHookDecls'):
+                mDecls.pop(nameAttr, None) # Re-declared: now ordered as the subclass's
+                mDecls[nameAttr] = value.aHookDecls
+
+    aEntries: list[tuple[int, int, str, str, TypeHookFunc[Any]]] = []
+    for nameAttr, aDecls in mDecls.items():
+        func = getattr(cls, nameAttr)
+        for decl in aDecls:
+            aEntries.append((decl.priority, len(aEntries), decl.nameLifecycle, decl.name, func))
+    aEntries.sort(key=lambda e: e[:2])
+
+    mLifecycle: dict[str, list[tuple[str, TypeHookFunc[Any]]]] = {}
+    for _, _, nameLifecycle, name, func in aEntries:
+        mLifecycle.setdefault(nameLifecycle, []).append((name, func))
+    return {nameLifecycle: tuple(hooks) for nameLifecycle, hooks in mLifecycle.items()}
+
 class StepBase(ABC):
     """
     Base class defining the lifecycle of a Step.
@@ -43,11 +164,20 @@ class StepBase(ABC):
     This base class include things that don't interact with outside world (logging etc.).
     """
 
+    # Hooks declared with @hook, compiled once per class. Instances share these
+    # until addHook() is called on them.
+    mLifecycleClass: ClassVar[dict[str, TypeHooks[Any]]] = {}
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        cls.mLifecycleClass = compileHooks(cls)
+
     def __init__(self, *args: str) -> None:
-        self.mLifecycle: defaultdict[str, list[tuple[str, TypeHookFunc[Self]]]] = defaultdict(list)
+        self.mLifecycle: dict[str, TypeHooks[Any]] = self.mLifecycleClass
         self.aCmdline: list[str] = list(args)
-        self.parser = ArgumentParser(allow_abbrev=False, exit_on_error=False)
-        self.mParserGroups: dict[str, _ArgumentGroup] = {}
+        self.mParserGroups: dict[str, ArgumentGroup] = {}
+        self.aArgumentDefs: list[TypeArgumentDef] = []
+        self.parserOwn: tuple[ArgumentParser, dict[str, _ArgumentGroup]] | None = None
 
     # The main lifecycle functions to be overriden: needed, cleanup, main
 
@@ -64,7 +194,11 @@ class StepBase(ABC):
         pass
 
     @abstractmethod
-    def main(self) -> int:
+    def main(self) -> int | Coroutine[Any, Any, int]:
+        """
+        The script itself, returning its exit code. May also be `async def`,
+        then the whole of it runs on one event loop.
+        """
         return 0
 
     # Invoke: include need-to-run check
@@ -82,7 +216,18 @@ class StepBase(ABC):
 
     # Execute: main life cycle
     def execute(self) -> int:
-        return self.main()
+        return self.runMain()
+
+    def runMain(self) -> int:
+        """
+        Call main(), and run it to completion on a new event loop if it's a coroutine.
+        Anything else main() returns is passed on as-is.
+        """
+        rtn = self.main()
+        if not isinstance(rtn, Coroutine):
+            return rtn
+        import asyncio
+        return asyncio.run(rtn)
 
     def addHook(self, nameLifecycle: str, nameFunc: str, func: TypeHookFunc[Self], atBegin: bool = False) -> None:
         """
@@ -90,10 +235,15 @@ class StepBase(ABC):
 
         Optionally, the hook function can be prepended at the beginning of the list instead of at the end.
         """
+        if self.mLifecycle is self.mLifecycleClass:
+            self.mLifecycle = dict(self.mLifecycleClass)
+        hooks = self.mLifecycle.get(nameLifecycle, ())
+        if not isinstance(hooks, deque):
+            hooks = self.mLifecycle[nameLifecycle] = deque(hooks)
         if atBegin:
-            self.mLifecycle[nameLifecycle].insert(0, (nameFunc, func))
+            hooks.appendleft((nameFunc, func))
         else:
-            self.mLifecycle[nameLifecycle].append((nameFunc, func))
+            hooks.append((nameFunc, func))
 
     def listLifecycles(self) -> Generator[str]:
         """
@@ -105,8 +255,7 @@ class StepBase(ABC):
         """
         Yield all hooks (name and callable) associated with the given lifecycle.
         """
-        if nameLifecycle in self.mLifecycle:
-            yield from self.mLifecycle[nameLifecycle]
+        yield from self.mLifecycle.get(nameLifecycle, ())
 
     def invokeHookFunc(self, name: str, func: TypeHookFunc[Self]) -> None:
         func(self)
@@ -115,25 +264,80 @@ class StepBase(ABC):
         """
         Call all functions in a certain lifecycle in order, passing `self`.
         """
-        if nameLifecycle not in self.mLifecycle:
-            return
-
-        for name, func in self.listHooks(nameLifecycle):
+        for name, func in self.mLifecycle.get(nameLifecycle, ()):
             self.invokeHookFunc(name, func)
 
     # argparse-related things
 
+    # Parsers shared by Steps with the same argument definitions, a few per class
+    mParsersShared: ClassVar[dict[type, list[ParserShared]]] = {}
+    lockParsersShared: ClassVar[Lock] = Lock()
+    N_PARSERS_SHARED: ClassVar[int] = 4
+
     def parseArgs(self) -> None:
         """
         Actually parse the commandline arguments stored in this object, and store the
         results as self.args
         """
-        self.args: Namespace = self.parser.parse_intermixed_args(self.aCmdline)
+        self.args: Namespace = self.parseCmdline()
+
+    def parseCmdline(self, isQuiet: bool = False) -> Namespace:
+        """
+        Parse the commandline arguments stored in this object and return them.
+        When quiet, bad arguments and --help raise SystemExit without printing anything.
+        """
+        if self.parserOwn is not None:
+            with quietParser(self.parserOwn[0]) if isQuiet else contextlib.nullcontext():
+                return self.parserOwn[0].parse_intermixed_args(self.aCmdline)
+        return self.getParserShared().parse(self.aCmdline, isQuiet)
 
-    def getParser(self, nameGroup: str = "Skritt") -> _ArgumentGroup:
+    def getParserShared(self) -> ParserShared:
+        """
+        Find the shared parser for the argument definitions of this Step, or build it
+        """
+        aGroups = list(self.mParserGroups)
+        with self.lockParsersShared:
+            aParsers = self.mParsersShared.setdefault(self.__class__, [])
+            for parserShared in aParsers:
+                if parserShared.aGroups == aGroups and parserShared.aDefs == self.aArgumentDefs:
+                    return parserShared
+        parserShared = ParserShared(aGroups, list(self.aArgumentDefs))
+        with self.lockParsersShared:
+            aParsers.insert(0, parserShared)
+            del aParsers[self.N_PARSERS_SHARED:]
+        return parserShared
+
+    def getParser(self, nameGroup: str = "Skritt") -> ArgumentGroup:
         """
         Get the argparse group to add argument definitions
         """
         if nameGroup not in self.mParserGroups:
-            self.mParserGroups[nameGroup] = self.parser.add_argument_group(nameGroup)
+            self.mParserGroups[nameGroup] = ArgumentGroup(self, nameGroup)
+            if self.parserOwn is not None:
+                self.parserOwn[1][nameGroup] = self.parserOwn[0].add_argument_group(nameGroup)
         return self.mParserGroups[nameGroup]
+
+    def detachParser(self) -> tuple[ArgumentParser, dict[str, _ArgumentGroup]]:
+        """
+        Give this Step a parser of its own, for when the argparse objects are
+        needed directly. Argument definitions then go straight into it.
+        """
+        if self.parserOwn is None:
+            self.parserOwn = buildParser(list(self.mParserGroups), self.aArgumentDefs)
+        return self.parserOwn
+
+    @property
+    def parser(self) -> ArgumentParser:
+        return self.detachParser()[0]
+
+    def getArgumentDests(self, nameGroup: str = "Skritt") -> set[str]:
+        """
+        Get the names in self.args of the arguments defined in a group
+        """
+        if self.parserOwn is not None:
+            group = self.parserOwn[1].get(nameGroup)
+        else:
+            group = self.getParserShared().mGroups.get(nameGroup)
+        if group is None:
+            return set()
+        return {action.dest for action in group._group_actions}
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright 2024-2025, Hojin Koh
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+# Run many Step invocations in one interpreter.
+#
+# Usage: python -m Skritt.batch manifest [--jobs N] [--pipelines N] [--profile FILE] [--summary FILE] [--check]
+#
+# Each line of the manifest is one invocation: either a JSON object
+# {"step": "package.module.Class", "args": [...]} or a JSON list
+# ["package.module.Class", args...], or tab-separated class path and args.
+# Blank lines and lines starting with "#" are skipped. "-" reads from stdin.
+#
+# Imports, the logger, the scheduler, stamps and the argparse parsers are then
+# set up once and shared by all invocations, instead of once per process.
+# Process-wide settings are the batch's own: the pipeline limit and the
+# profile are given to the batch, and invocations giving --jobs or --profile
+# fail instead of changing them for all the others.
+#
+# With --check, nothing runs: the lines of invocations needing to run are
+# printed, and the exit code is 0 if there is any, like --check of a Step.
+
+from __future__ import annotations # Shouldn't be needed after python 3.14
+from collections.abc import Iterable, Iterator
+from typing import Any, TextIO
+
+import argparse
+import contextlib
+import importlib
+import json
+import sys
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from .base import StepBase
+from .runner import Runner, checkNeeded
+
+# Whether Steps are running as part of a batch, which owns the process-wide settings
+varInBatch: ContextVar[bool] = ContextVar('varInBatch', default=False)
+
+@dataclass
+class Invocation:
+    """
+    One line of a manifest
+    """
+    iLine: int
+    pathClass: str
+    aArgs: list[str]
+
+def parseManifest(fp: Iterable[str]) -> Iterator[Invocation]:
+    """
+    Parse manifest lines, raising ValueError with the line number on bad ones
+    """
+    for iLine, line in enumerate(fp, 1):
+        line = line.rstrip('\r\n')
+        if not line.strip() or line.startswith('#'):
+            continue
+        if line.lstrip()[0] not in '[{':
+            aFields = line.split('\t')
+            yield Invocation(iLine, aFields[0], aFields[1:])
+            continue
+        try:
+            entry = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(F"Line {iLine}: {e}") from None
+        pathClass: object = None
+        aArgs: object = None
+        if isinstance(entry, dict):
+            pathClass, aArgs = entry.get('step'), entry.get('args', [])
+        elif isinstance(entry, list) and entry:
+            pathClass, aArgs = entry[0], entry[1:]
+        if not isinstance(pathClass, str) or not isinstance(aArgs, list):
+            raise ValueError(F"Line {iLine}: expecting a class path and a list of args")
+        yield Invocation(iLine, pathClass, [str(arg) for arg in aArgs])
+
+def loadClass(pathClass: str) -> type[StepBase]:
+    """
+    Get a Step class from "package.module.Class" or "package.module:Class"
+    """
+    nameModule, sep, nameClass = pathClass.rpartition(':')
+    if not sep:
+        nameModule, _, nameClass = pathClass.rpartition('.')
+    cls: Any = importlib.import_module(nameModule)
+    for name in nameClass.split('.'):
+        cls = getattr(cls, name)
+    if not isinstance(cls, type) or not issubclass(cls, StepBase):
+        raise TypeError(F"{pathClass} is not a Step")
+    return cls
+
+def writeSummary(fp: TextIO, runner: Runner, aInvocations: list[tuple[Invocation, StepBase]], isJson: bool) -> None:
+    """
+    One line per invocation: line number, class, return code, seconds taken, args
+    """
+    for invocation, step in aInvocations:
+        rtn = runner.mReturn.get(step, -1)
+        elapsed = runner.mElapsed.get(step, 0.0)
+        if isJson:
+            fp.write(json.dumps({
+                'line': invocation.iLine, 'step': invocation.pathClass, 'returncode': rtn,
+                'elapsed': round(elapsed, 6), 'args': invocation.aArgs,
+                }) + '\n')
+        else:
+            fp.write('\t'.join((str(invocation.iLine), invocation.pathClass, str(rtn), F"{elapsed:.6f}", *invocation.aArgs)) + '\n')
+
+def loadManifest(fpManifest: Iterable[str]) -> list[tuple[Invocation, StepBase]]:
+    """
+    Parse a manifest and instantiate its Steps
+    """
+    aInvocations: list[tuple[Invocation, StepBase]] = []
+    for invocation in parseManifest(fpManifest):
+        try:
+            cls = loadClass(invocation.pathClass)
+        except (ImportError, AttributeError, TypeError) as e:
+            raise ValueError(F"Line {invocation.iLine}: {e}") from e
+        aInvocations.append((invocation, cls(*invocation.aArgs)))
+    return aInvocations
+
+def checkBatch(fpManifest: Iterable[str], nJobs: int = 0, fpOut: TextIO | None = None) -> int:
+    """
+    Check which invocations of a manifest need to run, all in parallel, and
+    write their manifest lines out (to stdout by default). Return 0 if any
+    needs to run, 1 otherwise.
+    """
+    fpOut = fpOut or sys.stdout
+    aInvocations = loadManifest(fpManifest)
+    aNeeded = checkNeeded((step for _, step in aInvocations), nJobs)
+    for (invocation, _), isNeeded in zip(aInvocations, aNeeded):
+        if isNeeded:
+            fpOut.write('\t'.join((str(invocation.iLine), invocation.pathClass, *invocation.aArgs)) + '\n')
+    return 0 if any(aNeeded) else 1
+
+def runBatch(fpManifest: Iterable[str], nJobs: int = 0, pathSummary: str = '', nPipelines: int = 0, pathProfile: str = '') -> int:
+    """
+    Run all invocations of a manifest, at most `nJobs` at a time, and return 0
+    if all of them succeeded, or the first failure's return code otherwise.
+    At most `nPipelines` background pipelines run at once across all of them.
+    """
+    runner = Runner(nJobs)
+    aInvocations = loadManifest(fpManifest)
+    for _, step in aInvocations:
+        runner.add(step)
+
+    if nPipelines > 0:
+        from .scheduler import ResourceScheduler
+        ResourceScheduler().setMaxJobs(nPipelines)
+    from .profiling import ResourceProfiler
+    resProfiler = ResourceProfiler()
+    if pathProfile:
+        resProfiler.setOutput(pathProfile)
+    resProfiler.enter() # Writing out the profile once at the end rather than whenever no step is running
+    token = varInBatch.set(True)
+    try:
+        rtn = runner.run()
+    finally:
+        varInBatch.reset(token)
+        resProfiler.leave()
+
+    nFailed = sum(1 for _, step in aInvocations if runner.mReturn.get(step, -1) != 0)
+    if nFailed:
+        runner.logger.error(F"{nFailed}/{len(aInvocations)} invocations failed")
+    if pathSummary:
+        with open(pathSummary, 'w', encoding='utf-8') as fp:
+            writeSummary(fp, runner, aInvocations, pathSummary.endswith('.jsonl'))
+    return rtn
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run many Step invocations listed in a manifest, in one process")
+    parser.add_argument("manifest", help="JSONL or TSV file of class path and args, one invocation per line, or - for stdin")
+    parser.add_argument("--jobs", type=int, default=0, help="Maximum number of Steps running at once (default: number of CPUs)")
+    parser.add_argument("--pipelines", type=int, default=0, help="Maximum number of background pipelines running at once, across all Steps (default: number of CPUs)")
+    parser.add_argument("--profile", default='', help="Write timings of all Steps to this file, in Chrome trace format")
+    parser.add_argument("--summary", default='', help="Write return code and time of each invocation here, as JSONL if named *.jsonl, TSV otherwise")
+    parser.add_argument("--check", action='store_true', help="Only print the line number, class and args of invocations needing to run, and return 0 if there is any")
+    args = parser.parse_args()
+
+    try:
+        with (contextlib.nullcontext(sys.stdin) if args.manifest == '-' else open(args.manifest, encoding='utf-8')) as fp:
+            if args.check:
+                rtn = checkBatch(fp, args.jobs)
+            else:
+                rtn = runBatch(fp, args.jobs, args.summary, args.pipelines, args.profile)
+    except ValueError as e:
+        parser.error(str(e))
+    sys.exit(rtn)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright 2024-2025, Hojin Koh
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+# Content-addressed cache of step outputs.
+#
+# Each file is stored once under objects/, named after its content hash, and
+# an entry maps a key (step class, arguments and input hashes) to the objects
+# of its outputs in order. Objects are put in the store with a reflink or a
+# hardlink when possible, while restored outputs are only ever reflinks or
+# copies, so that changing a restored file can't change the store or other
+# restored copies. A hardlinked object changes along with the output it came
+# from, which is caught by its size and mtime no longer matching the index.
+#
+# The index is a SQLite database shared by all processes using the store.
+# Changes to it and to objects/ happen in the same write transaction, so that
+# an object being evicted can't be claimed by another process at the same time.
+
+from __future__ import annotations # Shouldn't be needed after python 3.14
+from collections.abc import Sequence
+
+import errno
+import fcntl
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from threading import Lock
+
+from .res import Resource
+from .stamp import getCacheDir, openDB
+
+FICLONE = 0x40049409 # From linux/fs.h
+ERRNOS_NO_CLONE = (errno.EOPNOTSUPP, errno.EXDEV, errno.EINVAL, errno.ENOTTY, errno.ENOSYS, errno.EBADF)
+ERRNOS_NO_LINK = (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.EOPNOTSUPP)
+
+def cloneFile(pathSrc: str, pathDst: str, isLinkable: bool = False) -> str:
+    """
+    Make a new file pathDst with the content of pathSrc, as cheaply as possible:
+    a reflink sharing its extents, a hardlink if `isLinkable`, or a real copy.
+    Return which one of 'reflink', 'hardlink' or 'copy' was made.
+    """
+    with open(pathSrc, 'rb') as fpSrc, open(pathDst, 'xb') as fpDst:
+        try:
+            fcntl.ioctl(fpDst.fileno(), FICLONE, fpSrc.fileno())
+        except OSError as e:
+            if e.errno not in ERRNOS_NO_CLONE:
+                raise
+        else:
+            shutil.copymode(pathSrc, pathDst)
+            return 'reflink'
+    if isLinkable:
+        os.unlink(pathDst)
+        try:
+            os.link(pathSrc, pathDst)
+            return 'hardlink'
+        except OSError as e:
+            if e.errno not in ERRNOS_NO_LINK:
+                raise
+    shutil.copyfile(pathSrc, pathDst)
+    shutil.copymode(pathSrc, pathDst)
+    return 'copy'
+
+def getCacheKey(nameStep: str, argsKey: str, aHashInputs: Sequence[str]) -> str:
+    """
+    Key of a run from the step class, its normalized arguments and the content
+    hashes of its inputs in order. Input paths are left out, so that identical
+    runs in different directories share the entry.
+    """
+    h = hashlib.sha256(F"{nameStep}\0{argsKey}".encode())
+    for digest in aHashInputs:
+        h.update(F"\0{digest}".encode())
+    return h.hexdigest()
+
+class ResourceCache(Resource):
+    """
+    On-disk cache of step outputs, shared by all processes on the machine.
+    Up to `sizeMax` bytes of objects are kept, evicting the least recently
+    used entries first.
+
+    The store is at $SKRITT_CACHEDIR, or under ~/.cache/skritt by default,
+    with a size cap of $SKRITT_CACHESIZE bytes (10GiB by default).
+    """
+    SIZE_MAX = 10 << 30
+
+    def initialize(self, path: str = '', sizeMax: int = 0) -> None:
+        self.path = path or os.environ.get('SKRITT_CACHEDIR') or os.path.join(getCacheDir(), 'outputs')
+        self.sizeMax = sizeMax or int(os.environ.get('SKRITT_CACHESIZE') or self.SIZE_MAX)
+        self.lock = Lock()
+        self.conn: sqlite3.Connection | None = None
+
+    def getConn(self) -> sqlite3.Connection:
+        if self.conn is None:
+            os.makedirs(os.path.join(self.path, 'tmp'), exist_ok=True)
+            conn = openDB(os.path.join(self.path, 'index.db'))
+            conn.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, atime REAL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_atime ON entries (atime)")
+            conn.execute("CREATE TABLE IF NOT EXISTS refs (key TEXT, idx INTEGER, hash TEXT, PRIMARY KEY (key, idx))")
+            conn.execute("CREATE INDEX IF NOT EXISTS refs_hash ON refs (hash)")
+            conn.execute("CREATE TABLE IF NOT EXISTS objects (hash TEXT PRIMARY KEY, size INTEGER, mtime INTEGER)")
+            self.conn = conn
+        return self.conn
+
+    def getObjectPath(self, digest: str) -> str:
+        return os.path.join(self.path, 'objects', digest[:2], digest)
+
+    def getTempPath(self, path: str) -> str:
+        return F"{path}.skritt-{os.getpid()}-{threading.get_ident()}"
+
+    def getSize(self) -> int:
+        with self.lock:
+            return int(self.getConn().execute("SELECT COALESCE(SUM(size), 0) FROM objects").fetchone()[0])
+
+    def store(self, key: str, aPaths: Sequence[str], aHashes: Sequence[str]) -> None:
+        """
+        Store files with known content hashes as the outputs of `key`, then
+        evict old entries if the store got too large
+        """
+        if not aPaths or '' in aHashes:
+            return
+        mPaths = dict(zip(aHashes, aPaths))
+        with self.lock:
+            conn = self.getConn()
+            setKnown = {digest for digest in mPaths if conn.execute("SELECT 1 FROM objects WHERE hash=?", (digest,)).fetchone()}
+
+        # Copying may take a while: done before taking the write lock of the index
+        mTemp: dict[str, str] = {}
+        try:
+            for digest, path in mPaths.items():
+                if digest not in setKnown:
+                    mTemp[digest] = self.getTempPath(os.path.join(self.path, 'tmp', digest))
+                    cloneFile(path, mTemp[digest], isLinkable=True)
+
+            with self.lock:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    for digest, pathTemp in mTemp.items():
+                        if conn.execute("SELECT 1 FROM objects WHERE hash=?", (digest,)).fetchone():
+                            continue # Stored by someone else in the meantime
+                        pathObject = self.getObjectPath(digest)
+                        os.makedirs(os.path.dirname(pathObject), exist_ok=True)
+                        os.replace(pathTemp, pathObject)
+                        st = os.stat(pathObject)
+                        conn.execute("INSERT INTO objects VALUES (?,?,?)", (digest, st.st_size, st.st_mtime_ns))
+                    conn.execute("DELETE FROM refs WHERE key=?", (key,))
+                    conn.executemany("INSERT INTO refs VALUES (?,?,?)", ((key, i, digest) for i, digest in enumerate(aHashes)))
+                    conn.execute("INSERT OR REPLACE INTO entries VALUES (?,?)", (key, time.time()))
+                    self.evict(conn)
+                    conn.execute("COMMIT")
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+        finally:
+            for pathTemp in mTemp.values():
+                if os.path.lexists(pathTemp):
+                    os.unlink(pathTemp)
+
+    def evict(self, conn: sqlite3.Connection) -> None:
+        """
+        Remove the least recently used entries, and the objects only they used,
+        until the store fits in sizeMax. Must be in a write transaction.
+        """
+        size = int(conn.execute("SELECT COALESCE(SUM(size), 0) FROM objects").fetchone()[0])
+        if size <= self.sizeMax:
+            return
+        for (key,) in conn.execute("SELECT key FROM entries ORDER BY atime").fetchall():
+            size -= self.removeEntry(conn, key)
+            if size <= self.sizeMax:
+                break
+
+    def removeEntry(self, conn: sqlite3.Connection, key: str) -> int:
+        """
+        Remove an entry and the objects no other entry uses, returning the size
+        freed. Must be in a write transaction.
+        """
+        aHashes = [row[0] for row in conn.execute("SELECT DISTINCT hash FROM refs WHERE key=?", (key,))]
+        conn.execute("DELETE FROM refs WHERE key=?", (key,))
+        conn.execute("DELETE FROM entries WHERE key=?", (key,))
+        sizeFreed = 0
+        for digest in aHashes:
+            if conn.execute("SELECT 1 FROM refs WHERE hash=?", (digest,)).fetchone():
+                continue
+            row = conn.execute("SELECT size FROM objects WHERE hash=?", (digest,)).fetchone()
+            conn.execute("DELETE FROM objects WHERE hash=?", (digest,))
+            sizeFreed += row[0] if row else 0
+            try:
+                os.unlink(self.getObjectPath(digest))
+            except FileNotFoundError:
+                pass
+        return sizeFreed
+
+    def restore(self, key: str, aPaths: Sequence[str]) -> bool:
+        """
+        Put the stored outputs of `key` at `aPaths`, and return whether they
+        were all there. Outputs are replaced all at once, or not at all.
+        """
+        with self.lock:
+            conn = self.getConn()
+            aRows = conn.execute("SELECT hash, size, mtime FROM refs JOIN objects USING (hash) WHERE key=? ORDER BY idx", (key,)).fetchall()
+        if not aRows or len(aRows) != len(aPaths):
+            return False
+
+        aTemp: list[tuple[str, str]] = []
+        try:
+            for (digest, size, mtime), path in zip(aRows, aPaths):
+                pathObject = self.getObjectPath(digest)
+                try:
+                    st = os.stat(pathObject)
+                except FileNotFoundError: # Evicted in the meantime
+                    return False
+                if st.st_size != size or st.st_mtime_ns != mtime: # Changed through a hardlink
+                    self.dropObject(digest)
+                    return False
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                pathTemp = self.getTempPath(path)
+                try:
+                    cloneFile(pathObject, pathTemp)
+                except FileNotFoundError:
+                    return False
+                aTemp.append((pathTemp, path))
+            for pathTemp, path in aTemp:
+                os.replace(pathTemp, path)
+            aTemp.clear()
+        finally:
+            for pathTemp, _ in aTemp:
+                if os.path.lexists(pathTemp):
+                    os.unlink(pathTemp)
+
+        with self.lock:
+            conn.execute("UPDATE entries SET atime=? WHERE key=?", (time.time(), key))
+        return True
+
+    def dropObject(self, digest: str) -> None:
+        """
+        Forget a damaged object, along with all entries using it
+        """
+        with self.lock:
+            conn = self.getConn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for (key,) in conn.execute("SELECT DISTINCT key FROM refs WHERE hash=?", (digest,)).fetchall():
+                    self.removeEntry(conn, key)
+                conn.execute("DELETE FROM objects WHERE hash=?", (digest,))
+                try:
+                    os.unlink(self.getObjectPath(digest))
+                except FileNotFoundError:
+                    pass
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
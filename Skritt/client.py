@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright 2024-2025, Hojin Koh
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Thin client of the Skritt server (see server.py).
+#
+# Usage: python -m Skritt.client script.py [args...]
+#        python -m Skritt.client -m package.module [args...]
+#
+# Hands argv, the environment, the working directory and the stdio fds over to
+# a resident server, which forks an already warmed-up worker to run the script,
+# and exits with the worker's exit code. Without a server, the script is just
+# run in this process instead. Only light standard modules are used here, as
+# the whole point is to not pay for importing the framework.
+
+from __future__ import annotations # Shouldn't be needed after python 3.14
+
+import json
+import os
+import signal
+import socket
+import struct
+import sys
+
+def getSocketPath() -> str:
+    """
+    Where the server listens: $SKRITT_SOCKET, or a per-user path
+    """
+    if 'SKRITT_SOCKET' in os.environ:
+        return os.environ['SKRITT_SOCKET']
+    if 'XDG_RUNTIME_DIR' in os.environ:
+        return os.path.join(os.environ['XDG_RUNTIME_DIR'], "skritt.sock")
+    return F"/tmp/skritt-{os.getuid():d}.sock"
+
+def runLocal(argv: list[str]) -> int:
+    """
+    Run a script (or `-m module`) in this process, the way python itself would
+    """
+    import runpy
+    try:
+        if argv[0] == '-m':
+            sys.argv = argv[1:]
+            runpy.run_module(argv[1], run_name='__main__', alter_sys=True)
+        else:
+            sys.argv = argv
+            sys.path[0] = os.path.dirname(os.path.abspath(argv[0]))
+            runpy.run_path(argv[0], run_name='__main__')
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            return e.code or 0
+        print(e.code, file=sys.stderr)
+        return 1
+    return 0
+
+def runRemote(sock: socket.socket, argv: list[str]) -> int:
+    """
+    Have the server run the script, and return its exit code (negative for signals)
+    """
+    payload = json.dumps({'argv': argv, 'env': dict(os.environ), 'cwd': os.getcwd()}).encode()
+    socket.send_fds(sock, [struct.pack('!I', len(payload))], [0, 1, 2])
+    sock.sendall(payload)
+
+    # Pass on what would have reached the worker had it been our child
+    def forward(signum: int, frame: object) -> None:
+        sock.sendall(struct.pack('!i', signum))
+    for sig in (signal.SIGINT, signal.SIGTERM, signal.SIGHUP):
+        signal.signal(sig, forward)
+
+    data = b''
+    while len(data) < 4:
+        chunk = sock.recv(4 - len(data))
+        if not chunk:
+            print("Skritt server went away", file=sys.stderr)
+            return 1
+        data += chunk
+    rtn: int = struct.unpack('!i', data)[0]
+    return rtn
+
+def main() -> None:
+    argv = sys.argv[1:]
+    if not argv:
+        print(F"Usage: {sys.argv[0]} script.py|-m module [args...]", file=sys.stderr)
+        sys.exit(2)
+    try:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(getSocketPath())
+    except OSError:
+        sock.close()
+        sys.exit(runLocal(argv))
+
+    with sock:
+        rtn = runRemote(sock, argv)
+    if rtn < 0: # Die the same way
+        signal.signal(-rtn, signal.SIG_DFL)
+        os.kill(os.getpid(), -rtn)
+    sys.exit(rtn)
+
+if __name__ == '__main__':
+    main()
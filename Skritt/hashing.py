@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright 2024-2025, Hojin Koh
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Content hashing for change detection.
+#
+# A file is hashed as a list of fixed-size blocks, and its digest is the hash
+# of the block digests. Blocks are hashed straight out of an mmap on a thread
+# pool (hashlib releases the GIL for large buffers), so one big file uses as
+# many cores as many small ones do. Keeping the block digests around also
+# allows rehashing only the tail of a file that has been appended to.
+
+from __future__ import annotations # Shouldn't be needed after python 3.14
+from collections.abc import Iterable
+
+import hashlib
+import mmap
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+SIZE_BLOCK = 16 << 20
+SIZE_DIGEST = 32
+
+type TypeBlocks = bytes # Concatenated block digests
+
+def hashBlocks(path: str, size: int, iBegin: int, iEnd: int) -> TypeBlocks:
+    """
+    Hash blocks [iBegin, iEnd) of the first `size` bytes of a file, and return
+    their concatenated digests
+    """
+    with open(path, 'rb') as fp:
+        offBegin = iBegin * SIZE_BLOCK
+        offEnd = min(iEnd * SIZE_BLOCK, size)
+        if offEnd <= offBegin:
+            return b''
+        offMap = offBegin - offBegin % mmap.ALLOCATIONGRANULARITY
+        with mmap.mmap(fp.fileno(), offEnd - offMap, offset=offMap, access=mmap.ACCESS_READ) as mm:
+            mm.madvise(mmap.MADV_SEQUENTIAL)
+            with memoryview(mm) as view:
+                return b''.join(
+                        hashlib.sha256(view[off-offMap : min(off+SIZE_BLOCK, offEnd)-offMap]).digest()
+                        for off in range(offBegin, offEnd, SIZE_BLOCK))
+
+def getDigest(size: int, blocks: TypeBlocks) -> str:
+    return hashlib.sha256(F"{size}:".encode() + blocks).hexdigest()
+
+class HashService:
+    """
+    Hash many files at once on a thread pool. Each job covers a few blocks, so
+    the work is balanced no matter how the sizes are distributed.
+    """
+    def __init__(self, nWorkers: int = 0, nBlocksPerJob: int = 4) -> None:
+        self.nWorkers = nWorkers or os.cpu_count() or 1
+        self.nBlocksPerJob = nBlocksPerJob
+
+    def hashFiles(
+            self,
+            aPaths: Iterable[str],
+            mPrev: dict[str, tuple[int, TypeBlocks]] | None = None,
+            ) -> dict[str, tuple[str, int, TypeBlocks]]:
+        """
+        Hash files and return {path: (digest, size, blocks)}. Files that
+        disappear before being hashed are left out.
+
+        For files known to be append-only, mPrev can give {path: (size, blocks)}
+        from an earlier hash; only the blocks past the last complete one are
+        then read again.
+        """
+        mPrev = mPrev or {}
+        mResult: dict[str, tuple[str, int, TypeBlocks]] = {}
+        with ThreadPoolExecutor(self.nWorkers) as executor:
+            mJobs = {}
+            for path in aPaths:
+                try:
+                    size = os.stat(path).st_size
+                except FileNotFoundError:
+                    continue
+                nBlocks = -(-size // SIZE_BLOCK)
+                iBegin = 0
+                blocksKept = b''
+                if path in mPrev and mPrev[path][0] <= size:
+                    iBegin = mPrev[path][0] // SIZE_BLOCK
+                    blocksKept = mPrev[path][1][:iBegin*SIZE_DIGEST]
+                mJobs[path] = (size, blocksKept, [
+                        executor.submit(hashBlocks, path, size, i, min(i+self.nBlocksPerJob, nBlocks))
+                        for i in range(iBegin, nBlocks, self.nBlocksPerJob)])
+            for path, (size, blocksKept, aFutures) in mJobs.items():
+                try:
+                    blocks = blocksKept + b''.join(f.result() for f in aFutures)
+                except FileNotFoundError:
+                    continue
+                mResult[path] = (getDigest(size, blocks), size, blocks)
+        return mResult
+
+    def hashFile(self, path: str, prev: tuple[int, TypeBlocks] | None = None) -> str:
+        return self.hashFiles((path,), {path: prev} if prev else None)[path][0]
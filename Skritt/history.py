@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright 2024-2025, Hojin Koh
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from __future__ import annotations # Shouldn't be needed after python 3.14
+from collections.abc import Iterable
+
+import os
+import sqlite3
+import statistics
+import time
+from threading import Lock
+
+from .res import Resource
+from .stamp import getCacheDir, openDB
+
+class ResourceHistory(Resource):
+    """
+    On-disk history of how long each step took to run, with its exit code and
+    the peak memory of its pipelines, used to run the longest steps first,
+    estimate remaining time and notice steps getting slower.
+
+    Runs are grouped by a key of the step class and its arguments. Estimates
+    only use the last `N_RECENT` successful runs of a key.
+
+    The history is at $SKRITT_HISTORYDB, or under ~/.cache/skritt by default.
+    Setting $SKRITT_HISTORYDB to an empty string turns it off.
+    """
+    N_RECENT = 20
+    N_MIN_REGRESSION = 5 # Runs needed before flagging a regression
+    RATIO_REGRESSION = 2.0
+    ELAPSED_MIN_REGRESSION = 1.0 # Seconds slower than the median, so that short steps aren't flagged for noise
+
+    def initialize(self, path: str = '') -> None:
+        self.path = path or os.environ.get('SKRITT_HISTORYDB', os.path.join(getCacheDir(), 'history.db'))
+        self.lock = Lock()
+        self.conn: sqlite3.Connection | None = None
+
+    def isEnabled(self) -> bool:
+        return bool(self.path)
+
+    def disable(self, error: Exception) -> str:
+        """
+        Stop using the history for the rest of this process, after it failed
+        with `error`, and return a message saying so. The history is only
+        telemetry: failing to use it must never fail a step.
+        """
+        message = F"Not using the run time history at {self.path}: {error}"
+        self.path = ''
+        return message
+
+    def getConn(self) -> sqlite3.Connection:
+        if self.conn is None:
+            conn = openDB(self.path)
+            conn.execute("CREATE TABLE IF NOT EXISTS runs (key TEXT, step TEXT, time REAL, elapsed REAL, returncode INTEGER, maxrss INTEGER)")
+            conn.execute("CREATE INDEX IF NOT EXISTS runs_key ON runs (key, time)")
+            self.conn = conn
+        return self.conn
+
+    def record(self, key: str, nameStep: str, elapsed: float, returncode: int, maxrss: int | None = None) -> None:
+        """
+        Remember one run. `maxrss` is in KiB.
+        """
+        if not self.isEnabled():
+            return
+        with self.lock:
+            self.getConn().execute("INSERT INTO runs VALUES (?,?,?,?,?,?)", (key, nameStep, time.time(), elapsed, returncode, maxrss))
+
+    def getElapsed(self, key: str) -> list[float]:
+        """
+        Times taken by the most recent successful runs of a key, latest first
+        """
+        if not self.isEnabled():
+            return []
+        with self.lock:
+            return [row[0] for row in self.getConn().execute(
+                "SELECT elapsed FROM runs WHERE key=? AND returncode=0 ORDER BY time DESC LIMIT ?", (key, self.N_RECENT))]
+
+    def estimate(self, key: str) -> float | None:
+        """
+        Median time of recent successful runs, or None without any
+        """
+        aElapsed = self.getElapsed(key)
+        return statistics.median(aElapsed) if aElapsed else None
+
+    def estimateMany(self, aKeys: Iterable[str]) -> dict[str, float]:
+        """
+        Estimates for many keys at once, leaving out keys without history
+        """
+        mEstimate: dict[str, float] = {}
+        for key in set(aKeys):
+            elapsed = self.estimate(key)
+            if elapsed is not None:
+                mEstimate[key] = elapsed
+        return mEstimate
+
+    def getRegression(self, key: str, elapsed: float) -> tuple[float, int] | None:
+        """
+        If `elapsed` is much longer than the median of recent successful runs,
+        return that median and how many runs it is over; otherwise None.
+        Call before record(), so that the run isn't compared against itself.
+        """
+        aElapsed = self.getElapsed(key)
+        if len(aElapsed) < self.N_MIN_REGRESSION:
+            return None
+        median = statistics.median(aElapsed)
+        if elapsed > median * self.RATIO_REGRESSION and elapsed - median > self.ELAPSED_MIN_REGRESSION:
+            return median, len(aElapsed)
+        return None
@@ -14,44 +14,218 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import logging
-import sys
+from __future__ import annotations # Shouldn't be needed after python 3.14
 
-import loguru._logger
-from loguru import logger
+import atexit
+import itertools
+import sys
+import time
+from collections import deque
+from contextvars import ContextVar, Token
+from threading import Condition, RLock, Thread
+from typing import TYPE_CHECKING, Any, Literal
 
 from .res import Resource
 
+if TYPE_CHECKING:
+    import logging
+    import loguru
+
 type TypeLogger = loguru.Logger | logging.Logger
+type TypePolicy = Literal['block', 'drop-oldest', 'summarize']
+
+# The Steps being invoked in the current context, outermost first, so that
+# each Step's log file only gets what that Step logged. Steps bind it into
+# their own logger (extra["aSteps"]), which then routes records from any thread.
+# Records logged otherwise are routed by it as it is when they are logged:
+# tasks copy the context when created; threads and the scheduler are given a copy.
+varSteps: ContextVar[tuple[int, ...]] = ContextVar('SkrittSteps', default=())
+counterSteps = itertools.count(1)
+
+class SinkBuffered:
+    """
+    Loguru sink appending to a file from a background thread, so a slow disk
+    doesn't hold up whoever is logging. Messages are queued, and written in
+    batches at least every `intervalFlush` seconds.
+
+    When `sizeQueue` messages are waiting, `policy` decides what happens:
+    'block' makes the logging thread wait, 'drop-oldest' discards the oldest
+    queued messages, and 'summarize' discards new ones. Either way of dropping
+    leaves a line in the file saying how many messages were lost.
+    """
+    def __init__(self, filename: str, policy: TypePolicy = 'block', sizeQueue: int = 65536, intervalFlush: float = 1.0) -> None:
+        self.fp = open(filename, 'a', encoding='utf-8', buffering=1 << 20)
+        self.policy = policy
+        self.sizeQueue = sizeQueue
+        self.intervalFlush = intervalFlush
+        self.aQueue: deque[str] = deque()
+        self.nDropped = 0
+        self.isStopping = False
+        self.cond = Condition()
+        self.thread = Thread(target=self.run, name="SkrittLogWriter", daemon=True)
+        self.thread.start()
+        atexit.register(self.stop)
+
+    def write(self, message: str) -> None:
+        with self.cond:
+            if len(self.aQueue) >= self.sizeQueue:
+                if self.policy == 'block':
+                    self.cond.wait_for(lambda: len(self.aQueue) < self.sizeQueue or self.isStopping)
+                elif self.policy == 'drop-oldest':
+                    self.aQueue.popleft()
+                    self.nDropped += 1
+                else:
+                    self.nDropped += 1
+                    return
+            self.aQueue.append(message)
+            if len(self.aQueue) == 1:
+                self.cond.notify_all()
+
+    def run(self) -> None:
+        timeFlush = time.monotonic() + self.intervalFlush
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: self.aQueue or self.isStopping, max(timeFlush - time.monotonic(), 0))
+                aBatch = list(self.aQueue)
+                self.aQueue.clear()
+                nDropped, self.nDropped = self.nDropped, 0
+                isStopping = self.isStopping
+                self.cond.notify_all()
+
+            if nDropped:
+                aBatch.append(F"[log buffer full: dropped {nDropped} messages]\n")
+            if aBatch:
+                self.fp.write(''.join(aBatch))
+            if isStopping or time.monotonic() >= timeFlush:
+                self.fp.flush()
+                timeFlush = time.monotonic() + self.intervalFlush
+
+            with self.cond:
+                if isStopping and not self.aQueue:
+                    return
+
+    def stop(self) -> None:
+        """
+        Drain and close. Loguru calls this when the sink is removed.
+        """
+        with self.cond:
+            if self.isStopping:
+                return
+            self.isStopping = True
+            self.cond.notify_all()
+        self.thread.join()
+        self.fp.close()
+        atexit.unregister(self.stop)
 
 class ResourceLogger(Resource):
     """
     Configure the global logger for this process and expose the logger instance
     as public member.
+
+    Loguru is only imported and configured once the logger is first needed.
     """
     def initialize(self) -> None:
-        self.logger = logger
+        # Steps running in threads may set up the logger or change sinks at once.
+        # Reentrant, as setup() calls setStderr().
+        self.lock = RLock()
+        self.levelStderr = ''
+        self.mFilesStep: dict[int, int] = {} # Handles of the sinks of Steps' log files: idStep
+
+    def __getattr__(self, name: str) -> Any:
+        if name in ('logger', 'hStderr') and 'logger' not in self.__dict__:
+            with self.lock:
+                if 'logger' not in self.__dict__:
+                    self.setup()
+            return getattr(self, name)
+        raise AttributeError(F"{self.__class__.__name__!r} object has no attribute {name!r}")
+
+    def isReady(self) -> bool:
+        """
+        Whether the logger is set up. Until then, no sink would show debug messages.
+        """
+        return 'logger' in self.__dict__
+
+    def setup(self) -> None:
+        from loguru import logger
+        self.logger: loguru.Logger = logger
         # For subprocess logging
         logger.level('PROC', no=22, color="<white>")
         logger.remove(0)
         self.setStderr()
 
+    def enterStep(self, idStep: int) -> Token[tuple[int, ...]] | None:
+        """
+        Tag what gets logged from now on in this context as coming from a Step,
+        or do nothing if it is already. Pass the result to leaveStep() after.
+        """
+        aSteps = varSteps.get()
+        if idStep in aSteps:
+            return None
+        return varSteps.set(aSteps + (idStep,))
+
+    def leaveStep(self, token: Token[tuple[int, ...]] | None) -> None:
+        if token is not None:
+            varSteps.reset(token)
+
+    def getFormatHead(self) -> str:
+        return '{time:YYYYMMDD HHmmss} [{level.name[0]}] '
+
     def getFormat(self) -> str:
-        return '<level>{time:YYYYMMDD HHmmss} [{level.name[0]}] {message}</level>'
+        return '<level>' + self.getFormatHead() + '{message}</level>'
+
+    def formatRecord(self, record: loguru.Record) -> str:
+        """
+        Format function for the sinks. A batch of lines logged as one record
+        (extra["isBatch"], see subprocess.logLines()) gets a header on every line.
+        """
+        if 'isBatch' not in record['extra']:
+            return self.getFormat() + '\n{exception}'
+        if 'textBatch' not in record['extra']: # Records are shared between sinks, only render once
+            head = self.getFormatHead().format_map(record)
+            record['extra']['textBatch'] = head + record['message'].replace('\n', '\n' + head)
+        return '<level>{extra[textBatch]}</level>\n{exception}'
 
     def setStderr(self, level: str = 'INFO') -> int:
-        if hasattr(self, 'hStderr'):
-            self.logger.remove(self.hStderr)
-        handle = self.logger.add(sys.stderr, level=level, format=self.getFormat())
-        self.hStderr: int = handle
+        with self.lock:
+            logger = self.logger # Setting up first: it adds the default sink, to be replaced here
+            if 'hStderr' in self.__dict__:
+                # Nothing logged from other threads gets lost between remove and add then
+                if level == self.levelStderr:
+                    return self.hStderr
+                logger.remove(self.hStderr)
+            handle = logger.add(sys.stderr, level=level, format=self.formatRecord)
+            self.hStderr: int = handle
+            self.levelStderr = level
         return handle
 
-    def setFile(self, filename: str) -> int:
+    def setFile(self, filename: str, policy: TypePolicy | None = None, idStep: int = 0, **kwargs: Any) -> int:
         """
         Setup a file as the logging sink, and return an integer handler to later
         be used to remove the sink through removeSink()
+
+        With a `policy`, the file is written from a background thread through
+        SinkBuffered, which takes the other keyword arguments. With an `idStep`,
+        only what is logged inside that Step (see enterStep()) goes to the file,
+        plus records not known to come from any Step while this is the only
+        Step with a log file.
         """
-        return self.logger.add(filename, level="DEBUG", format=self.getFormat())
+        filterStep = None
+        if idStep:
+            def filterStep(record: loguru.Record) -> bool:
+                aSteps = record['extra'].get('aSteps') or varSteps.get()
+                if aSteps:
+                    return idStep in aSteps
+                return len(self.mFilesStep) == 1
+        with self.lock:
+            if policy is None:
+                handle = self.logger.add(filename, level="DEBUG", format=self.formatRecord, filter=filterStep)
+            else:
+                handle = self.logger.add(SinkBuffered(filename, policy, **kwargs), level="DEBUG", format=self.formatRecord, filter=filterStep)
+            if idStep:
+                self.mFilesStep[handle] = idStep
+        return handle
 
     def removeSink(self, handler: int) -> None:
+        with self.lock:
+            self.mFilesStep.pop(handler, None)
         self.logger.remove(handler)
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright 2024-2025, Hojin Koh
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import annotations # Shouldn't be needed after python 3.14
+from collections.abc import Generator
+from contextlib import contextmanager, nullcontext
+from typing import TYPE_CHECKING, Any, ContextManager
+
+import os
+import threading
+import time
+from threading import Lock
+
+from .res import Resource
+
+if TYPE_CHECKING:
+    from .subprocess import ResultPipeline
+
+class ResourceProfiler(Resource):
+    """
+    Collect timings of lifecycles, hooks and pipelines, and write them out in
+    Chrome trace-event format (viewable in chrome://tracing or Perfetto).
+    Per-name totals are included in the same file under "otherData".
+
+    Disabled unless an output file is given, through $SKRITT_PROFILE or setOutput().
+    """
+    def initialize(self) -> None:
+        self.path = os.environ.get('SKRITT_PROFILE', '')
+        self.aEvents: list[dict[str, Any]] = []
+        self.lock = Lock()
+        self.pid = os.getpid()
+        self.depth = 0
+
+    def isEnabled(self) -> bool:
+        return bool(self.path)
+
+    def setOutput(self, path: str) -> None:
+        self.path = path
+
+    def addSpan(self, name: str, cat: str, timeBegin: float, timeEnd: float, tid: int = 0, **kwargs: Any) -> None:
+        """
+        Record a span, with times from time.perf_counter()
+        """
+        if not self.path:
+            return
+        event = {
+                'name': name,
+                'cat': cat,
+                'ph': 'X',
+                'ts': timeBegin * 1e6,
+                'dur': (timeEnd - timeBegin) * 1e6,
+                'pid': self.pid,
+                'tid': tid or threading.get_native_id(),
+                }
+        if kwargs:
+            event['args'] = kwargs
+        with self.lock:
+            self.aEvents.append(event)
+
+    def span(self, name: str, cat: str, **kwargs: Any) -> ContextManager[None]:
+        """
+        Time the enclosed block as a span, or do nothing if not enabled
+        """
+        if not self.path:
+            return nullcontext()
+        return self.spanEnabled(name, cat, **kwargs)
+
+    @contextmanager
+    def spanEnabled(self, name: str, cat: str, **kwargs: Any) -> Generator[None]:
+        timeBegin = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.addSpan(name, cat, timeBegin, time.perf_counter(), **kwargs)
+
+    def addPipeline(self, name: str, timeBegin: float, result: ResultPipeline) -> None:
+        """
+        Record a finished pipeline and each of its processes. They get their own
+        rows in the viewer, as pipelines running in the background overlap.
+        """
+        if not self.path or not result.aStages:
+            return
+        tid = result.aStages[0].pid
+        self.addSpan(name, 'pipeline', timeBegin, time.perf_counter(), tid=tid, returncode=result.returncode)
+        for stage in result.aStages:
+            self.addSpan(
+                    F"{stage.pid}({stage.name})", 'process', stage.timeBegin, stage.timeBegin + stage.elapsed, tid=stage.pid,
+                    returncode=stage.returncode, utime=stage.utime, stime=stage.stime, maxrss=stage.maxrss,
+                    )
+
+    def getSummary(self) -> dict[str, dict[str, float]]:
+        """
+        Total time (seconds) and count for each span name
+        """
+        mSummary: dict[str, dict[str, float]] = {}
+        with self.lock:
+            for event in self.aEvents:
+                entry = mSummary.setdefault(event['name'], {'total': 0.0, 'count': 0})
+                entry['total'] += event['dur'] / 1e6
+                entry['count'] += 1
+        return mSummary
+
+    def write(self) -> None:
+        if not self.path:
+            return
+        import json
+        with self.lock:
+            aEvents = list(self.aEvents)
+        with open(self.path, 'w') as fp:
+            json.dump({
+                'traceEvents': aEvents,
+                'displayTimeUnit': 'ms',
+                'otherData': {'summary': self.getSummary()},
+                }, fp)
+
+    def enter(self) -> None:
+        """
+        Mark the start of a step. Nested and concurrent steps share one report,
+        which is written when the last of them finishes.
+        """
+        with self.lock:
+            self.depth += 1
+
+    def leave(self) -> None:
+        with self.lock:
+            self.depth -= 1
+            isLast = self.depth == 0
+        if isLast:
+            self.write()
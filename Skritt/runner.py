@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright 2024-2025, Hojin Koh
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import annotations # Shouldn't be needed after python 3.14
+from collections.abc import Iterable
+
+import contextvars
+import heapq
+import os
+import statistics
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+from .base import StepBase
+from .logging import ResourceLogger
+from .statcache import scopeStatCache
+
+def checkStep(step: StepBase) -> bool:
+    if hasattr(step, 'args'):
+        return step.needed()
+    # Parsed on the side: log files, banners, --jobs etc. are for when it's invoked
+    try:
+        step.args = step.parseCmdline(isQuiet=True)
+    except SystemExit: # Bad arguments: running it is what shows the error
+        return True
+    try:
+        return step.needed()
+    finally:
+        del step.args
+
+def checkNeeded(aSteps: Iterable[StepBase], nWorkers: int = 0) -> list[bool]:
+    """
+    Evaluate needed() of many Steps on a thread pool, all looking up files
+    through one StatCache. Steps not parsed yet get their arguments parsed
+    just for this, without setting up anything else as parseArgs() would.
+    """
+    aSteps = list(aSteps)
+    with scopeStatCache(), ThreadPoolExecutor(nWorkers or os.cpu_count() or 1) as executor:
+        aFutures = [executor.submit(contextvars.copy_context().run, checkStep, step) for step in aSteps]
+        return [future.result() for future in aFutures]
+
+class Runner:
+    """
+    Run a graph of Steps. Each Step is invoked once all Steps it depends on have
+    succeeded, and independent Steps run in parallel, at most `nWorkers` at a time.
+
+    Steps are run through their normal invoke(), so needed(), --force, hooks etc.
+    behave exactly as when running them alone. When a Step fails, everything
+    depending on it (directly or not) is skipped, while unrelated branches go on.
+
+    With run times of earlier runs in the history, the ready Steps heading the
+    longest chains of work go first, and the remaining time is estimated as it goes.
+
+    Files are looked up through one StatCache for the whole run.
+    """
+    INTERVAL_PROGRESS = 10.0 # Seconds between remaining time estimates
+
+    def __init__(self, nWorkers: int = 0) -> None:
+        self.nWorkers = nWorkers or os.cpu_count() or 1
+        self.mDeps: dict[StepBase, tuple[StepBase, ...]] = {}
+        self.mReturn: dict[StepBase, int] = {}
+        self.mElapsed: dict[StepBase, float] = {}
+        self.mEstimate: dict[StepBase, float] = {}
+        self.mChain: dict[StepBase, float] = {} # Estimated time of a step and the longest chain of steps after it
+        self.mStarted: dict[StepBase, float] = {}
+        self.logger = ResourceLogger().logger
+
+    def add(self, step: StepBase, deps: Iterable[StepBase] = ()) -> StepBase:
+        """
+        Add a step and the steps it depends on. Dependencies not yet added are
+        added as well, without dependencies of their own.
+        """
+        aDeps = tuple(deps)
+        for dep in aDeps:
+            if dep not in self.mDeps:
+                self.mDeps[dep] = ()
+        self.mDeps[step] = aDeps
+        return step
+
+    def getName(self, step: StepBase) -> str:
+        return F"{step.__class__.__qualname__}#{list(self.mDeps).index(step)}"
+
+    def sortSteps(self) -> list[StepBase]:
+        """
+        Return the steps in a topological order, raising ValueError on cycles.
+        """
+        aOrder: list[StepBase] = []
+        mState: dict[StepBase, bool] = {} # False: visiting, True: done
+        for stepRoot in self.mDeps:
+            if stepRoot in mState:
+                continue
+            mState[stepRoot] = False
+            aStack = [(stepRoot, iter(self.mDeps[stepRoot]))]
+            while aStack:
+                step, itDeps = aStack[-1]
+                for dep in itDeps:
+                    if dep not in mState:
+                        mState[dep] = False
+                        aStack.append((dep, iter(self.mDeps[dep])))
+                        break
+                    if mState[dep] is False:
+                        raise ValueError(F"Dependency cycle involving {self.getName(dep)}")
+                else:
+                    aStack.pop()
+                    mState[step] = True
+                    aOrder.append(step)
+        return aOrder
+
+    def invokeStep(self, step: StepBase) -> int:
+        timeBegin = time.perf_counter()
+        try:
+            return step.invoke()
+        except SystemExit as e: # e.g. argparse rejecting the arguments: only this Step fails
+            return e.code if isinstance(e.code, int) else int(e.code is not None)
+        finally:
+            self.mElapsed[step] = time.perf_counter() - timeBegin
+
+    def run(self) -> int:
+        """
+        Run all steps, and return 0 if all of them succeeded, or the return code
+        of the first failure otherwise.
+        """
+        aOrder = self.sortSteps()
+        mDependents: dict[StepBase, list[StepBase]] = {step: [] for step in aOrder}
+        mWaiting: dict[StepBase, int] = {}
+        for step in aOrder:
+            mWaiting[step] = len(self.mDeps[step])
+            for dep in self.mDeps[step]:
+                mDependents[dep].append(step)
+
+        self.mEstimate = self.getEstimates(aOrder)
+        for step in reversed(aOrder):
+            self.mChain[step] = self.mEstimate[step] + max((self.mChain[s] for s in mDependents[step]), default=0.0)
+        isEstimated = any(self.mEstimate.values())
+        if isEstimated:
+            self.logger.info(F"Estimated {self.estimateRemaining(time.perf_counter()):.1f}s for {len(aOrder)} steps")
+
+        # Longest chain first, then in the order added; a heap of (-chain, index, step)
+        mIndex = {step: i for i, step in enumerate(aOrder)}
+        aReady: list[tuple[float, int, StepBase]] = []
+        def setReady(step: StepBase) -> None:
+            heapq.heappush(aReady, (-self.mChain[step], mIndex[step], step))
+        for step in aOrder:
+            if mWaiting[step] == 0:
+                setReady(step)
+
+        mRunning: dict[Future[int], StepBase] = {}
+        rtnFirst = 0
+        timeBegin = time.perf_counter()
+        timeProgress = timeBegin
+        with scopeStatCache(), ThreadPoolExecutor(self.nWorkers) as executor:
+            while aReady or mRunning:
+                # Submit only as many as can run, so that the order above holds
+                while aReady and len(mRunning) < self.nWorkers:
+                    step = heapq.heappop(aReady)[2]
+                    self.mStarted[step] = time.perf_counter()
+                    # A Runner inside a Step: what its Steps log is the outer Step's too
+                    mRunning[executor.submit(contextvars.copy_context().run, self.invokeStep, step)] = step
+                setDone, _ = wait(mRunning, return_when=FIRST_COMPLETED)
+                for future in setDone:
+                    step = mRunning.pop(future)
+                    try:
+                        rtn = future.result()
+                    except Exception:
+                        self.logger.exception(F"Step {self.getName(step)} raised")
+                        rtn = 1
+                    self.mReturn[step] = rtn
+                    if rtn != 0:
+                        rtnFirst = rtnFirst or rtn
+                        self.skipDependents(step, mDependents)
+                        continue
+                    for stepNext in mDependents[step]:
+                        mWaiting[stepNext] -= 1
+                        if mWaiting[stepNext] == 0 and stepNext not in self.mReturn:
+                            setReady(stepNext)
+                now = time.perf_counter()
+                if isEstimated and (aReady or mRunning) and now - timeProgress >= self.INTERVAL_PROGRESS:
+                    timeProgress = now
+                    self.logger.info(F"Done {len(self.mReturn)}/{len(aOrder)} steps, about {self.estimateRemaining(now):.1f}s left")
+
+        self.reportCriticalPath(aOrder, time.perf_counter() - timeBegin)
+        return rtnFirst
+
+    def check(self) -> dict[StepBase, bool]:
+        """
+        Evaluate needed() of all steps in parallel, without running anything.
+        A step whose dependencies need to run may still be reported as not
+        needed, since its inputs haven't changed yet.
+        """
+        aSteps = list(self.mDeps)
+        return dict(zip(aSteps, checkNeeded(aSteps, self.nWorkers)))
+
+    def getEstimates(self, aOrder: list[StepBase]) -> dict[StepBase, float]:
+        """
+        Expected run time of each step from the history. Steps never run before
+        are taken to be typical ones: the median of the others, or 0 without any.
+        """
+        import sqlite3
+        from .history import ResourceHistory
+        history = ResourceHistory()
+        if not history.isEnabled():
+            return {step: 0.0 for step in aOrder}
+        mKey: dict[StepBase, str] = {}
+        for step in aOrder:
+            getKey = getattr(step, 'getHistoryKey', None) # Only Steps have a history
+            if getKey is not None and (key := getKey()) is not None:
+                mKey[step] = key
+        try:
+            mByKey = history.estimateMany(mKey.values())
+        except (OSError, sqlite3.Error) as e:
+            self.logger.warning(history.disable(e))
+            return {step: 0.0 for step in aOrder}
+        mEstimate = {step: mByKey[key] for step, key in mKey.items() if key in mByKey}
+        elapsedDefault = statistics.median(mEstimate.values()) if mEstimate else 0.0
+        return {step: mEstimate.get(step, elapsedDefault) for step in aOrder}
+
+    def estimateRemaining(self, now: float) -> float:
+        """
+        Estimate the time until all unfinished steps are done: the total work left
+        spread over all workers, or the longest chain left if that's longer
+        """
+        work = 0.0
+        chain = 0.0
+        for step, elapsed in self.mEstimate.items():
+            if step in self.mReturn:
+                continue
+            elapsedDone = min(now - self.mStarted[step], elapsed) if step in self.mStarted else 0.0
+            work += elapsed - elapsedDone
+            chain = max(chain, self.mChain[step] - elapsedDone)
+        return max(work / self.nWorkers, chain)
+
+    def skipDependents(self, stepFailed: StepBase, mDependents: dict[StepBase, list[StepBase]]) -> None:
+        aStack = list(mDependents[stepFailed])
+        while aStack:
+            step = aStack.pop()
+            if step in self.mReturn:
+                continue
+            self.logger.warning(F"Skip {self.getName(step)} because {self.getName(stepFailed)} failed")
+            self.mReturn[step] = -1
+            aStack.extend(mDependents[step])
+
+    def getCriticalPath(self, aOrder: list[StepBase]) -> tuple[float, list[StepBase]]:
+        """
+        Find the chain of dependent steps with the largest total run time
+        """
+        mPath: dict[StepBase, tuple[float, list[StepBase]]] = {}
+        for step in aOrder:
+            if step not in self.mElapsed:
+                continue
+            elapsed, aPath = max((mPath[dep] for dep in self.mDeps[step] if dep in mPath), default=(0.0, []), key=lambda x: x[0])
+            mPath[step] = (elapsed + self.mElapsed[step], aPath + [step])
+        return max(mPath.values(), default=(0.0, []), key=lambda x: x[0])
+
+    def reportCriticalPath(self, aOrder: list[StepBase], elapsedTotal: float) -> None:
+        elapsed, aPath = self.getCriticalPath(aOrder)
+        self.logger.info(F"Ran {len(self.mElapsed)}/{len(aOrder)} steps in {elapsedTotal:.3f}s")
+        if aPath:
+            self.logger.info(F"Critical path {elapsed:.3f}s: {' -> '.join(self.getName(s) for s in aPath)}")
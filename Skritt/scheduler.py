@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright 2024-2025, Hojin Koh
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import annotations # Shouldn't be needed after python 3.14
+from collections.abc import Callable, Coroutine
+from typing import Any
+
+import asyncio
+import atexit
+import contextvars
+import heapq
+import itertools
+import os
+from concurrent.futures import Future, wait
+from threading import Lock, Thread
+
+from .res import Resource
+from .subprocess import ResultPipeline
+
+type TypeJobFunc = Callable[[], Coroutine[Any, Any, int | ResultPipeline]]
+
+class Job:
+    """
+    Handle to a job submitted to ResourceScheduler. The job runs in a copy of
+    the context it was submitted from, so that it logs as part of the same Step.
+    """
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.future: Future[int | ResultPipeline] = Future()
+        self.context = contextvars.copy_context()
+
+    def join(self, timeout: float | None = None) -> int:
+        """
+        Wait for the job to finish and return its exit code
+        """
+        result = self.future.result(timeout)
+        if isinstance(result, ResultPipeline):
+            return result.returncode
+        return result
+
+    async def ajoin(self) -> int:
+        """
+        Like join(), but awaiting on the running event loop instead of blocking
+        """
+        result = await asyncio.wrap_future(self.future)
+        if isinstance(result, ResultPipeline):
+            return result.returncode
+        return result
+
+    def getResult(self, timeout: float | None = None) -> int | ResultPipeline:
+        """
+        Wait for the job to finish and return whatever it returned, which is
+        the full ResultPipeline for pipelines
+        """
+        return self.future.result(timeout)
+
+    def done(self) -> bool:
+        return self.future.done()
+
+class ResourceScheduler(Resource):
+    """
+    Run background jobs (usually pipelines) on one shared event loop living in
+    its own thread, with at most `nJobs` of them running at the same time.
+
+    Waiting jobs start in order of priority (higher first), then in FIFO order.
+    Jobs submitted with isLimited=False start right away and don't count
+    against the limit, for pipelines something is waiting on in the foreground.
+
+    The loop thread doesn't keep the process alive, but jobs nobody joined are
+    still waited for at exit, as the threads running them used to be.
+    """
+    def initialize(self, nJobs: int = 0) -> None:
+        self.nJobs = nJobs or os.cpu_count() or 1
+        self.nRunning = 0
+        self.aQueue: list[tuple[int, int, Job, TypeJobFunc]] = []
+        self.counter = itertools.count()
+        self.lock = Lock()
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.setPending: set[Job] = set()
+
+    def setMaxJobs(self, nJobs: int) -> None:
+        """
+        Change the concurrency limit. Already running jobs are not affected.
+        """
+        self.nJobs = max(nJobs, 1)
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.dispatch)
+
+    def getLoop(self) -> asyncio.AbstractEventLoop:
+        with self.lock:
+            if self.loop is None:
+                loop = asyncio.new_event_loop()
+                Thread(target=loop.run_forever, name="SkrittScheduler", daemon=True).start()
+                self.loop = loop
+                atexit.register(self.drain)
+        return self.loop
+
+    def drain(self) -> None:
+        """
+        Wait for all jobs submitted so far, including those they submit
+        """
+        while True:
+            with self.lock:
+                aFutures = [job.future for job in self.setPending]
+            if not aFutures:
+                return
+            wait(aFutures)
+
+    def forget(self, job: Job) -> None:
+        with self.lock:
+            self.setPending.discard(job)
+
+    def submit(self, func: TypeJobFunc, priority: int = 0, name: str = '', isLimited: bool = True) -> Job:
+        """
+        Queue a coroutine function to be run on the shared loop, and return its handle.
+        """
+        job = Job(name)
+        with self.lock:
+            self.setPending.add(job)
+        job.future.add_done_callback(lambda _: self.forget(job))
+        if isLimited:
+            self.getLoop().call_soon_threadsafe(self.enqueue, (-priority, next(self.counter), job, func))
+        else:
+            self.getLoop().call_soon_threadsafe(self.start, job, func, False)
+        return job
+
+    # Below are only called in the scheduler thread
+
+    def enqueue(self, item: tuple[int, int, Job, TypeJobFunc]) -> None:
+        heapq.heappush(self.aQueue, item)
+        self.dispatch()
+
+    def dispatch(self) -> None:
+        while self.aQueue and self.nRunning < self.nJobs:
+            _, _, job, func = heapq.heappop(self.aQueue)
+            self.start(job, func, True)
+
+    def start(self, job: Job, func: TypeJobFunc, isLimited: bool) -> None:
+        if not job.future.set_running_or_notify_cancel():
+            return
+        if isLimited:
+            self.nRunning += 1
+        asyncio.get_running_loop().create_task(self.runJob(job, func, isLimited), context=job.context)
+
+    async def runJob(self, job: Job, func: TypeJobFunc, isLimited: bool) -> None:
+        try:
+            job.future.set_result(await func())
+        except BaseException as e:
+            job.future.set_exception(e)
+        finally:
+            if isLimited:
+                self.nRunning -= 1
+                self.dispatch()
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright 2024-2025, Hojin Koh
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Resident server running Skritt scripts in forked, already warmed-up workers.
+#
+# Usage: python -m Skritt.server [--socket PATH] [--preload MODULE ...]
+#
+# The server imports the framework (and any --preload modules, typically those
+# defining the steps) once. For each request from client.py, it forks a worker,
+# which takes over the client's stdio fds, argv, environment and working
+# directory, and runs the script as python would. The exit code goes back to
+# the client once the worker is reaped, and signals the client gets are
+# forwarded to the worker. The server stays single-threaded, so forking it is
+# safe.
+
+from __future__ import annotations # Shouldn't be needed after python 3.14
+from typing import Any
+
+import argparse
+import atexit
+import importlib
+import json
+import os
+import selectors
+import signal
+import socket
+import struct
+import sys
+import threading
+
+from .client import getSocketPath, runLocal
+
+# What every step needs anyway
+MODULES_PRELOAD = ('asyncio', 'argparse', 'loguru', 'Skritt.step', 'Skritt.runner', 'Skritt.scheduler', 'Skritt.stamp', 'Skritt.subprocess')
+
+def recvExact(conn: socket.socket, size: int) -> bytes:
+    data = b''
+    while len(data) < size:
+        chunk = conn.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Client went away mid-request")
+        data += chunk
+    return data
+
+def recvRequest(conn: socket.socket) -> tuple[dict[str, Any], list[int]]:
+    """
+    Receive the stdio fds and the request (argv, env, cwd) sent by runRemote()
+    """
+    data, aFds, _, _ = socket.recv_fds(conn, 4, 3)
+    try:
+        data += recvExact(conn, 4 - len(data))
+        request: dict[str, Any] = json.loads(recvExact(conn, struct.unpack('!I', data)[0]))
+    except BaseException:
+        for fd in aFds:
+            os.close(fd)
+        raise
+    if len(aFds) != 3:
+        for fd in aFds:
+            os.close(fd)
+        raise ConnectionError("Client didn't pass its stdio")
+    return request, aFds
+
+class Server:
+    """
+    Accept requests on a unix socket, and fork a worker for each of them.
+    serve() only ever returns in a worker, with the request it should run.
+    """
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.selector = selectors.DefaultSelector()
+        self.mWorkers: dict[int, socket.socket] = {} # pid -> client connection
+        self.mPidfds: dict[int, int] = {}
+
+    def listen(self) -> socket.socket:
+        sockProbe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sockProbe.connect(self.path)
+            raise RuntimeError(F"A server is already listening on {self.path}")
+        except (FileNotFoundError, ConnectionRefusedError):
+            if os.path.exists(self.path):
+                os.unlink(self.path) # Left behind by a dead server
+        finally:
+            sockProbe.close()
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        umaskOld = os.umask(0o077) # Whoever can connect can run anything as us
+        try:
+            sock.bind(self.path)
+        finally:
+            os.umask(umaskOld)
+        sock.listen(64)
+        return sock
+
+    def serve(self) -> dict[str, Any]:
+        self.sock = self.listen()
+        self.selector.register(self.sock, selectors.EVENT_READ)
+        try:
+            while True:
+                timeout = None if hasattr(os, 'pidfd_open') else 0.1
+                for key, _ in self.selector.select(timeout):
+                    if key.fileobj is self.sock:
+                        request = self.accept()
+                        if request is not None:
+                            return request
+                    elif isinstance(key.fileobj, socket.socket):
+                        self.receiveSignal(key.fileobj, key.data)
+                self.reap()
+        finally:
+            if hasattr(self, 'isWorker'):
+                self.sock.close()
+            else:
+                self.shutdown()
+
+    def accept(self) -> dict[str, Any] | None:
+        """
+        Take a request and fork a worker for it. Return the request in the worker.
+        """
+        conn, _ = self.sock.accept()
+        try:
+            if hasattr(socket, 'SO_PEERCRED'):
+                _, uid, _ = struct.unpack('3i', conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i')))
+                if uid != os.getuid():
+                    raise ConnectionError(F"Refusing a client of uid {uid:d}")
+            conn.settimeout(10)
+            request, aFds = recvRequest(conn)
+        except (OSError, ValueError) as e:
+            print(F"Skritt server: bad request: {e}", file=sys.stderr)
+            conn.close()
+            return None
+
+        pid = os.fork()
+        if pid == 0:
+            self.isWorker = True
+            self.becomeWorker(conn, aFds)
+            return request
+
+        for fd in aFds:
+            os.close(fd)
+        conn.settimeout(None)
+        self.mWorkers[pid] = conn
+        self.selector.register(conn, selectors.EVENT_READ, pid)
+        if hasattr(os, 'pidfd_open'):
+            self.mPidfds[pid] = os.pidfd_open(pid)
+            self.selector.register(self.mPidfds[pid], selectors.EVENT_READ, pid)
+        return None
+
+    def becomeWorker(self, conn: socket.socket, aFds: list[int]) -> None:
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        for sig in (signal.SIGTERM, signal.SIGCHLD):
+            signal.signal(sig, signal.SIG_DFL)
+        self.selector.close()
+        conn.close()
+        for connOther in self.mWorkers.values():
+            connOther.close()
+        for fd in self.mPidfds.values():
+            os.close(fd)
+        for fdTarget, fd in enumerate(aFds):
+            os.dup2(fd, fdTarget)
+            os.close(fd)
+
+    def receiveSignal(self, conn: socket.socket, pid: int) -> None:
+        """
+        Forward a signal from the client, or terminate the worker if the client is gone
+        """
+        try:
+            data = conn.recv(4)
+        except OSError:
+            data = b''
+        if len(data) == 4:
+            sig = struct.unpack('!i', data)[0]
+        elif not data:
+            sig = signal.SIGTERM
+            self.selector.unregister(conn)
+        else:
+            return
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            pass
+
+    def reap(self) -> None:
+        for pid in list(self.mWorkers):
+            pidDone, status = os.waitpid(pid, os.WNOHANG)
+            if pidDone == 0:
+                continue
+            conn = self.mWorkers.pop(pid)
+            if pid in self.mPidfds:
+                fdPid = self.mPidfds.pop(pid)
+                self.selector.unregister(fdPid)
+                os.close(fdPid)
+            try:
+                self.selector.unregister(conn)
+            except KeyError:
+                pass
+            try:
+                conn.sendall(struct.pack('!i', os.waitstatus_to_exitcode(status)))
+            except OSError:
+                pass
+            conn.close()
+
+    def shutdown(self) -> None:
+        self.sock.close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        for pid, conn in self.mWorkers.items():
+            os.kill(pid, signal.SIGTERM)
+            conn.close()
+
+def runRequest(request: dict[str, Any]) -> int:
+    """
+    In a worker: take on the client's context, and run what it asked for
+    """
+    os.chdir(request['cwd'])
+    os.environ.clear()
+    os.environ.update(request['env'])
+    return runLocal(request['argv'])
+
+def exitWorker(rtn: int) -> None:
+    """
+    Exit a worker like the interpreter would, minus the teardown of all the
+    preloaded modules, which takes longer than running a small step
+    """
+    for thread in threading.enumerate():
+        if thread is not threading.current_thread() and not thread.daemon:
+            thread.join()
+    atexit._run_exitfuncs()
+    for stream in (sys.stdout, sys.stderr):
+        try:
+            stream.flush()
+        except (OSError, ValueError): # Closed by the script, or nobody reading
+            pass
+    os._exit(rtn)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run Skritt scripts in forked, preloaded workers")
+    parser.add_argument("--socket", default=getSocketPath(), help="Unix socket to listen on")
+    parser.add_argument("--preload", nargs='*', default=[], help="Modules to import in advance, e.g. those defining the steps")
+    args = parser.parse_args()
+
+    for name in (*MODULES_PRELOAD, *args.preload):
+        importlib.import_module(name)
+    # Quit through the finally clauses, removing the socket
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        request = Server(args.socket).serve()
+    except KeyboardInterrupt:
+        sys.exit(0)
+    exitWorker(runRequest(request))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright 2024-2025, Hojin Koh
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Splitting a file into shards and concatenating results back.
+#
+# Shards are byte ranges cut at record boundaries, found by peeking at a few
+# bytes around each cut, so the input is never read through python: each
+# range goes into its pipeline with splice()/sendfile() (see FileRange). The
+# outputs are concatenated with copy_file_range(), which stays in the kernel
+# and can even share extents on filesystems supporting reflinks.
+
+from __future__ import annotations # Shouldn't be needed after python 3.14
+
+import errno
+import os
+
+from .subprocess import FileRange
+
+SIZE_PEEK = 1 << 16
+
+def findBoundary(fd: int, pos: int, size: int, sep: bytes) -> int:
+    """
+    Return the first record boundary at or after pos: the position right after
+    a separator, or the end of the file
+    """
+    if pos <= 0:
+        return 0
+    # The separator may end right before pos, or straddle it
+    pos = max(pos - len(sep), 0)
+    while pos < size:
+        data = os.pread(fd, SIZE_PEEK + len(sep), pos)
+        idx = data.find(sep)
+        if idx >= 0:
+            return pos + idx + len(sep)
+        pos += SIZE_PEEK
+    return size
+
+def splitFile(path: str, nShards: int, sep: bytes = b'\n') -> list[FileRange]:
+    """
+    Cut a file into up to nShards ranges of about the same size, each made of
+    whole records ending with `sep`. Empty ranges are left out.
+    """
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        size = os.fstat(fd).st_size
+        aBounds = [findBoundary(fd, size * i // nShards, size, sep) for i in range(nShards)] + [size]
+    finally:
+        os.close(fd)
+    return [FileRange(path, begin, end - begin) for begin, end in zip(aBounds, aBounds[1:]) if end > begin]
+
+def appendFile(fdOut: int, fdIn: int) -> None:
+    """
+    Append the whole content of fdIn at the current position of fdOut, with
+    copy_file_range() when possible, and sendfile() otherwise
+    """
+    length = os.fstat(fdIn).st_size
+    offset = 0
+    isKernelCopy = hasattr(os, 'copy_file_range')
+    while offset < length:
+        if isKernelCopy:
+            try:
+                n = os.copy_file_range(fdIn, fdOut, length - offset, offset)
+            except OSError as e:
+                if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+                    raise
+                isKernelCopy = False
+                continue
+        else:
+            n = os.sendfile(fdOut, fdIn, offset, length - offset)
+        if n == 0:
+            break
+        offset += n
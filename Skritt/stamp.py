@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright 2024-2025, Hojin Koh
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import annotations # Shouldn't be needed after python 3.14
+from collections.abc import Iterable
+
+import errno
+import hashlib
+import os
+import sqlite3
+import stat
+from threading import Lock
+
+from .hashing import HashService, TypeBlocks
+from .res import Resource
+from .statcache import existsPath, statPath
+
+def getCacheDir() -> str:
+    return os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'skritt')
+
+def openDB(path: str) -> sqlite3.Connection:
+    """
+    Open one of the sqlite databases, creating its directory as needed. The
+    default rollback journal is kept unless $SKRITT_SQLITE_WAL is set: WAL
+    relies on shared memory between processes, which NFS can't provide, and
+    the cache directory is often on an NFS home.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=60, check_same_thread=False, isolation_level=None)
+    if os.environ.get('SKRITT_SQLITE_WAL'):
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+class ResourceStamp(Resource):
+    """
+    On-disk store of file stamps (size, mtime and content hash), and of what
+    each step was last run with, to decide whether a step need to run.
+
+    A file is only rehashed when its size or mtime differ from what was stored.
+    The mtime is only compared for equality, so clock skew doesn't matter, and
+    touching a file without changing it doesn't make anything rerun. Files
+    marked with markAppendOnly() only get their new tail rehashed.
+
+    The store is at $SKRITT_STAMPDB, or under ~/.cache/skritt by default.
+    """
+    def initialize(self, path: str = '') -> None:
+        self.path = path or os.environ.get('SKRITT_STAMPDB') or os.path.join(getCacheDir(), 'stamp.db')
+        self.lock = Lock()
+        self.conn: sqlite3.Connection | None = None
+        self.service = HashService()
+        self.setAppendOnly: set[str] = set()
+
+    def getConn(self) -> sqlite3.Connection:
+        if self.conn is None:
+            conn = openDB(self.path)
+            conn.execute("CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, hash TEXT, blocks BLOB)")
+            if not any(row[1] == 'blocks' for row in conn.execute("PRAGMA table_info(files)")):
+                conn.execute("ALTER TABLE files ADD COLUMN blocks BLOB")
+            conn.execute("CREATE TABLE IF NOT EXISTS steps (key TEXT PRIMARY KEY, signature TEXT)")
+            self.conn = conn
+        return self.conn
+
+    def markAppendOnly(self, *aPaths: str) -> None:
+        """
+        Declare files that only ever get appended to, so that a changed one only
+        has its new tail rehashed.
+        """
+        self.setAppendOnly.update(os.path.abspath(path) for path in aPaths)
+
+    def getHashes(self, aPaths: Iterable[str]) -> dict[str, str]:
+        """
+        Get the content hashes of files as {abspath: hash}, with '' for files
+        that don't exist. All files needing a rehash are hashed in parallel.
+        Directories can't be stamped, and raise IsADirectoryError.
+        """
+        mHash: dict[str, str] = {}
+        mStale: dict[str, int] = {}
+        mPrev: dict[str, tuple[int, TypeBlocks]] = {}
+        # Not holding the lock while waiting for the filesystem, for checking many steps in parallel
+        aStats: list[tuple[str, os.stat_result]] = []
+        for path in map(os.path.abspath, aPaths):
+            try:
+                st = statPath(path)
+            except FileNotFoundError:
+                mHash[path] = ''
+                continue
+            if stat.S_ISDIR(st.st_mode):
+                raise IsADirectoryError(errno.EISDIR, "Can't stamp a directory, declare the files in it instead", path)
+            aStats.append((path, st))
+        with self.lock:
+            conn = self.getConn()
+            for path, st in aStats:
+                row = conn.execute("SELECT size, mtime, hash, blocks FROM files WHERE path=?", (path,)).fetchone()
+                if row is not None and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+                    mHash[path] = str(row[2])
+                    continue
+                mStale[path] = st.st_mtime_ns
+                if row is not None and row[3] is not None and path in self.setAppendOnly:
+                    mPrev[path] = (row[0], row[3])
+
+        if mStale:
+            mResult = self.service.hashFiles(mStale, mPrev)
+            with self.lock:
+                self.getConn().executemany("INSERT OR REPLACE INTO files VALUES (?,?,?,?,?)", (
+                    (path, size, mStale[path], digest, blocks) for path, (digest, size, blocks) in mResult.items()))
+            # Removed since being looked at: just as missing
+            mHash.update((path, mResult[path][0] if path in mResult else '') for path in mStale)
+        return mHash
+
+    def getHash(self, path: str) -> str:
+        """
+        Get the content hash of a file, or '' if it doesn't exist.
+        """
+        return self.getHashes((path,))[os.path.abspath(path)]
+
+    def getSignature(self, aInputs: Iterable[str], aOutputs: Iterable[str], extra: str = '') -> str:
+        """
+        Summarize the contents of all inputs and outputs, plus any extra string,
+        into one hash.
+        """
+        aInputs = tuple(aInputs)
+        aOutputs = tuple(aOutputs)
+        mHash = self.getHashes(aInputs + aOutputs)
+        h = hashlib.sha256(extra.encode())
+        for tag, aPaths in (('I', aInputs), ('O', aOutputs)):
+            for path in map(os.path.abspath, aPaths):
+                h.update(F"\0{tag}\0{path}\0{mHash[path]}".encode())
+        return h.hexdigest()
+
+    def isUpToDate(self, key: str, aInputs: Iterable[str], aOutputs: Iterable[str], extra: str = '') -> bool:
+        """
+        Check whether all outputs exist, and nothing changed since record() was
+        last called with the same key.
+        """
+        aOutputs = tuple(aOutputs)
+        if not all(existsPath(path) for path in aOutputs):
+            return False
+        with self.lock:
+            row = self.getConn().execute("SELECT signature FROM steps WHERE key=?", (key,)).fetchone()
+        if row is None:
+            return False
+        return bool(row[0] == self.getSignature(aInputs, aOutputs, extra))
+
+    def record(self, key: str, aInputs: Iterable[str], aOutputs: Iterable[str], extra: str = '') -> None:
+        """
+        Remember the current state of inputs and outputs after a successful run.
+        """
+        signature = self.getSignature(aInputs, aOutputs, extra)
+        with self.lock:
+            self.getConn().execute("INSERT OR REPLACE INTO steps VALUES (?,?)", (key, signature))
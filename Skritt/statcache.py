@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright 2024-2025, Hojin Koh
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+# File metadata cache shared by everything checking files during one run.
+#
+# The first lookup in a directory lists it whole with os.scandir(), and all
+# lookups there are then answered from that listing: files not in it are
+# known to be missing without asking the filesystem, and each file is stat()ed
+# at most once. On network filesystems, where every lookup is a round trip,
+# this turns one request per file into about one per directory.
+#
+# Nothing notices files changing by itself: whoever writes files must call
+# invalidatePaths() on them afterwards. Steps do so for their declared outputs.
+
+from __future__ import annotations # Shouldn't be needed after python 3.14
+from collections.abc import Generator, Iterable
+
+import contextlib
+import errno
+import os
+import threading
+from contextvars import ContextVar
+from threading import Lock
+
+class Listing:
+    """
+    Entries of one directory, or None if it couldn't be listed. Filled by the
+    first thread looking into the directory, while the others wait for it.
+    """
+    def __init__(self) -> None:
+        self.event = threading.Event()
+        self.mEntries: dict[str, os.DirEntry[str]] | None = None
+
+class StatCache:
+    """
+    Per-run cache of file metadata, safe to use from many threads
+    """
+    def __init__(self) -> None:
+        self.lock = Lock()
+        self.mDirs: dict[str, Listing] = {}
+
+    def getEntries(self, dirname: str) -> dict[str, os.DirEntry[str]] | None:
+        with self.lock:
+            listing = self.mDirs.get(dirname)
+            isOwner = listing is None
+            if listing is None:
+                listing = self.mDirs[dirname] = Listing()
+        if not isOwner:
+            listing.event.wait()
+            return listing.mEntries
+        try:
+            with os.scandir(dirname) as it:
+                listing.mEntries = {entry.name: entry for entry in it}
+        except (FileNotFoundError, NotADirectoryError):
+            listing.mEntries = {}
+        except OSError:
+            pass # e.g. not readable: each file then gets a stat() of its own
+        finally:
+            listing.event.set()
+        return listing.mEntries
+
+    def stat(self, path: str) -> os.stat_result:
+        """
+        Like os.stat(), following symlinks
+        """
+        path = os.path.abspath(path)
+        dirname, name = os.path.split(path)
+        mEntries = self.getEntries(dirname) if name else None
+        if mEntries is None:
+            return os.stat(path)
+        entry = mEntries.get(name)
+        if entry is None:
+            raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), path)
+        return entry.stat()
+
+    def invalidate(self, aPaths: Iterable[str]) -> None:
+        """
+        Forget what is known about the directories of these paths, and about
+        the paths themselves as directories
+        """
+        with self.lock:
+            for path in map(os.path.abspath, aPaths):
+                self.mDirs.pop(os.path.dirname(path), None)
+                self.mDirs.pop(path, None)
+
+varStatCache: ContextVar[StatCache | None] = ContextVar('varStatCache', default=None)
+
+@contextlib.contextmanager
+def scopeStatCache() -> Generator[StatCache]:
+    """
+    Use a new StatCache for stat() and invalidatePaths() in this context, and
+    in those copied from it
+    """
+    cache = StatCache()
+    token = varStatCache.set(cache)
+    try:
+        yield cache
+    finally:
+        varStatCache.reset(token)
+
+def statPath(path: str) -> os.stat_result:
+    """
+    os.stat() through the StatCache of this context, if any
+    """
+    cache = varStatCache.get()
+    return os.stat(path) if cache is None else cache.stat(path)
+
+def existsPath(path: str) -> bool:
+    try:
+        statPath(path)
+    except (OSError, ValueError):
+        return False
+    return True
+
+def invalidatePaths(aPaths: Iterable[str]) -> None:
+    """
+    Tell the StatCache of this context, if any, that these files were just written
+    """
+    cache = varStatCache.get()
+    if cache is not None:
+        cache.invalidate(aPaths)
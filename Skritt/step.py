@@ -14,16 +14,34 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from collections.abc import Sequence
-from typing import Self
+from __future__ import annotations # Shouldn't be needed after python 3.14
+from collections.abc import Generator, Mapping, Sequence
+from contextlib import nullcontext
+from typing import IO, TYPE_CHECKING, ContextManager, Literal, Self, overload
 from Skritt.base import TypeHookFunc
 
-import asyncio
+import functools
+import io
+import os
+import threading
+import time
 from datetime import datetime, timedelta
 
 from .base import StepBase
-from .logging import ResourceLogger
-from .subprocess import shellrun, ThreadForSubprocess
+from .logging import ResourceLogger, counterSteps, varSteps
+from .profiling import ResourceProfiler
+
+# The machinery for pipelines, stamps and the scheduler (asyncio, sqlite3...)
+# is imported by the methods needing it, so that --help and --check of steps
+# not declaring files don't pay for it
+if TYPE_CHECKING:
+    import mmap
+    from contextvars import Token
+    from argparse import Namespace
+    import loguru
+    from .logging import TypeLogger
+    from .scheduler import Job
+    from .subprocess import FailFastGroup, LogLimit, ResultPipeline, TypeInput, TypeOutput, TypeStage
 
 class Step(StepBase):
     """
@@ -33,30 +51,187 @@ class Step(StepBase):
     def __init__(self, *args: str) -> None:
         super().__init__(*args)
         self.resLogging = ResourceLogger()
-        self.logger = self.resLogging.logger
+        self.resProfiler = ResourceProfiler()
+        self.idLog = next(counterSteps)
+        self.aStepsLog: tuple[int, ...] = (self.idLog,) # This Step and those it's invoked in, see enterLog()
+        self.loggerBound: loguru.Logger | None = None
+        self.maxrssPipelines = 0 # KiB, the largest of all processes in pipelines run so far
 
         parser = self.getParser()
         parser.add_argument("--logfile", help="File to write log in")
+        parser.add_argument("--logbuffer", choices=('block', 'drop-oldest', 'summarize'),
+                help="Write the log file from a background thread, with this policy when it can't keep up")
         parser.add_argument("--debug", action='store_true', help="Show debug message on screen")
         parser.add_argument("--notitle", action='store_true', help="Disable showing fancy begin/end banners")
         parser.add_argument("--force", action='store_true', help="Run the step even if not necessary")
         parser.add_argument("--check", action='store_true', help="Check if need to run or not and return 0 if need to run")
+        parser.add_argument("--cache", action='store_true', help="Reuse the outputs of an identical earlier run from the output cache, and store them there after running")
+        parser.add_argument("--jobs", type=int, default=0, help="Maximum number of background pipelines running at once (default: number of CPUs)")
+        parser.add_argument("--profile", help="Write timings of lifecycles, hooks and pipelines to this file, in Chrome trace format")
+
+    @property
+    def logger(self) -> loguru.Logger:
+        """
+        The logger tagging records as coming from this Step, from whichever thread
+        """
+        if self.loggerBound is None:
+            self.loggerBound = self.resLogging.logger.bind(aSteps=self.aStepsLog)
+        return self.loggerBound
+
+    def enterLog(self) -> Token[tuple[int, ...]] | None:
+        """
+        Enter this Step for logging in the current context, see ResourceLogger.enterStep()
+        """
+        token = self.resLogging.enterStep(self.idLog)
+        aSteps = varSteps.get()
+        if aSteps != self.aStepsLog:
+            self.aStepsLog = aSteps
+            self.loggerBound = None
+        return token
+
+    # Declared files: the default needed() uses them to decide whether to run
+
+    def inputs(self) -> Sequence[str]:
+        """
+        Function to be overriden to list the files this Step reads
+        """
+        return ()
+
+    def outputs(self) -> Sequence[str]:
+        """
+        Function to be overriden to list the files this Step writes
+        """
+        return ()
+
+    def needed(self) -> bool:
+        """
+        A Step declaring outputs() is needed unless its inputs, outputs and
+        arguments all stayed the same since its last successful run.
+        Steps without declared outputs always run.
+        """
+        aOutputs = self.outputs()
+        if not aOutputs:
+            return True
+        from .stamp import ResourceStamp
+        try:
+            return not ResourceStamp().isUpToDate(self.getStampKey(), self.inputs(), aOutputs, self.getArgsKey())
+        except IsADirectoryError as e:
+            e.add_note(F"Declared by step {self.__class__.__qualname__}")
+            raise
+
+    def getArgsKey(self, args: Namespace | None = None) -> str:
+        """
+        Get a normalized representation of the arguments, leaving out Skritt's
+        own options since they don't change what a Step produces
+        """
+        aSkip = self.getArgumentDests()
+        return repr(sorted((k, v) for k, v in vars(args or self.args).items() if k not in aSkip))
+
+    def getStampKey(self) -> str:
+        aOutputs = sorted(os.path.abspath(path) for path in self.outputs())
+        return F"{self.__class__.__module__}.{self.__class__.__qualname__}:" + "\0".join(aOutputs)
+
+    def getCacheKey(self) -> str:
+        """
+        Key of this run in the output cache: the class, arguments, and contents of the inputs
+        """
+        from .cache import getCacheKey
+        from .stamp import ResourceStamp
+        aInputs = self.inputs()
+        mHash = ResourceStamp().getHashes(aInputs)
+        return getCacheKey(F"{self.__class__.__module__}.{self.__class__.__qualname__}", self.getArgsKey(),
+                [mHash[os.path.abspath(path)] for path in aInputs])
+
+    def restoreOutputs(self) -> bool:
+        """
+        Put back the outputs of an identical earlier run from the output cache,
+        and return whether there was one
+        """
+        aOutputs = self.outputs()
+        if not aOutputs:
+            return False
+        from .cache import ResourceCache
+        from .stamp import ResourceStamp
+        from .statcache import invalidatePaths
+        if not ResourceCache().restore(self.getCacheKey(), aOutputs):
+            return False
+        invalidatePaths(aOutputs)
+        self.logger.info("Restored {:d} outputs from the cache", len(aOutputs))
+        ResourceStamp().record(self.getStampKey(), self.inputs(), aOutputs, self.getArgsKey())
+        return True
+
+    def storeOutputs(self) -> None:
+        """
+        Put the outputs of this run in the output cache
+        """
+        from .cache import ResourceCache
+        from .stamp import ResourceStamp
+        aOutputs = self.outputs()
+        mHash = ResourceStamp().getHashes(aOutputs)
+        ResourceCache().store(self.getCacheKey(), aOutputs, [mHash[os.path.abspath(path)] for path in aOutputs])
+
+    def getHistoryKey(self) -> str | None:
+        """
+        Key of this Step in the run time history: its class and arguments.
+        Usable before parseArgs(), in which case it's None for arguments that
+        don't parse (the error shows when invoked).
+        """
+        if hasattr(self, 'args'):
+            args = self.args
+        else:
+            try:
+                args = self.parseCmdline(isQuiet=True)
+            except (SystemExit, Exception):
+                return None
+        return F"{self.__class__.__module__}.{self.__class__.__qualname__}:{self.getArgsKey(args)}"
+
+    def recordHistory(self, rtn: int, elapsed: float) -> None:
+        """
+        Add this run to the run time history, warning first if it was much
+        slower than usual
+        """
+        import sqlite3
+        from .history import ResourceHistory
+        history = ResourceHistory()
+        key = self.getHistoryKey()
+        if key is None or not history.isEnabled():
+            return
+        try:
+            if rtn == 0 and (regression := history.getRegression(key, elapsed)):
+                median, nRuns = regression
+                self.logger.warning(F"Took {elapsed:.3f}s, {elapsed/median:.1f}x the median {median:.3f}s of the last {nRuns} runs")
+            history.record(key, self.__class__.__qualname__, elapsed, rtn, self.maxrssPipelines or None)
+        except (OSError, sqlite3.Error) as e:
+            self.logger.warning(history.disable(e))
 
     # Additional logging
     def invokeHookFunc(self, name: str, func: TypeHookFunc[Self]) -> None:
-        self.logger.debug(F"Hook {name}: {func.__qualname__}()")
-        super().invokeHookFunc(name, func)
+        if self.resLogging.isReady():
+            self.logger.debug("Hook {}: {}()", name, func.__qualname__)
+        if not self.resProfiler.isEnabled():
+            super().invokeHookFunc(name, func)
+            return
+        with self.resProfiler.spanEnabled(F"hook {name}", 'hook', func=func.__qualname__):
+            super().invokeHookFunc(name, func)
 
     def invokeLifecycle(self, nameLifecycle: str) -> None:
         """
         Call all functions in a certain lifecycle in order, passing `self`.
         """
-        self.logger.debug(F"Lifecycle {self.__class__.__qualname__}::{nameLifecycle}")
-        if nameLifecycle not in self.mLifecycle:
-            return
+        if self.resLogging.isReady():
+            self.logger.debug("Lifecycle {}::{}", self.__class__.__qualname__, nameLifecycle)
+        with self.spanLifecycle(nameLifecycle):
+            for name, func in self.mLifecycle.get(nameLifecycle, ()):
+                self.invokeHookFunc(name, func)
 
-        for name, func in self.listHooks(nameLifecycle):
-            self.invokeHookFunc(name, func)
+    def spanLifecycle(self, nameLifecycle: str) -> ContextManager[None]:
+        """
+        Time a part of the lifecycle as a profiler span. The span name is only
+        formatted when profiling, as this is on the path of every hook.
+        """
+        if not self.resProfiler.isEnabled():
+            return nullcontext()
+        return self.resProfiler.spanEnabled(F"{self.__class__.__qualname__}::{nameLifecycle}", 'lifecycle')
 
     # Fancy logging
     def showHeader(self) -> None:
@@ -78,58 +253,407 @@ class Step(StepBase):
         """
         Same as StepBase's parseArgs, but add preparse and postparse lifecycle
         """
-        self.invokeLifecycle("pre-parse")
-        super().parseArgs()
+        token = self.enterLog()
+        try:
+            timeBegin = time.perf_counter()
+            self.invokeLifecycle("pre-parse")
+            timeParse = time.perf_counter()
+            super().parseArgs()
+
+            # A batch sets these for the whole process: one of its Steps can't change them for the others
+            if self.args.jobs > 0 or self.args.profile:
+                from .batch import varInBatch
+                if varInBatch.get():
+                    self.logger.error("--jobs and --profile can't be given to a Step in a batch, give the batch --pipelines and --profile instead")
+                    del self.args # Rejected like bad arguments: nothing else runs
+                    raise SystemExit(2)
+
+            # Profiling enabled by --profile: pre-parse is over already, but its total time is known
+            if self.args.profile and not self.resProfiler.isEnabled():
+                self.resProfiler.setOutput(self.args.profile)
+                self.resProfiler.addSpan(F"{self.__class__.__qualname__}::pre-parse", 'lifecycle', timeBegin, timeParse)
 
-        # Configure logging based on arguments
-        if self.args.debug:
-            self.resLogging.setStderr('DEBUG')
+            # Configure logging based on arguments
+            if self.args.debug:
+                self.resLogging.setStderr('DEBUG')
 
-        if self.args.logfile:
-            self.hLogfile: int = self.resLogging.setFile(self.args.logfile)
+            if self.args.logfile:
+                self.hLogfile: int = self.resLogging.setFile(self.args.logfile, self.args.logbuffer, idStep=self.idLog)
 
-        if not self.args.notitle:
-            self.showHeader()
-        self.invokeLifecycle("post-parse")
+            if self.args.jobs > 0:
+                from .scheduler import ResourceScheduler
+                ResourceScheduler().setMaxJobs(self.args.jobs)
+
+            if not self.args.notitle:
+                self.showHeader()
+            if self.resProfiler.isEnabled():
+                self.resProfiler.addSpan(F"{self.__class__.__qualname__}::parse", 'lifecycle', timeParse, time.perf_counter())
+            self.invokeLifecycle("post-parse")
+        finally:
+            self.resLogging.leaveStep(token)
 
     def invoke(self) -> int:
         rtn = -1
+        self.resProfiler.enter()
+        token = self.enterLog()
         try:
             if not hasattr(self, 'args'):
                 self.parseArgs()
 
             # If --check is specified, just report if needed and exit
             if self.args.check:
-                isNeeded = self.needed()
+                with self.spanLifecycle("needed"):
+                    isNeeded = self.needed()
                 return 0 if isNeeded else 1
 
             # If --force is specified, ignore the results of needed()
-            if self.args.force or self.needed():
-                rtn = self.execute()
+            if self.args.force:
+                isNeeded = True
             else:
+                with self.spanLifecycle("needed"):
+                    isNeeded = self.needed()
+            if not isNeeded or (self.args.cache and not self.args.force and self.restoreOutputs()):
                 rtn = 0
+                return rtn
+            timeBegin = time.perf_counter()
+            rtn = self.execute()
+            self.recordHistory(rtn, time.perf_counter() - timeBegin)
             return rtn
         finally:
             # Guard against the "--help" scenario to avoid generating unnecessary exceptions
             if hasattr(self, 'args'):
-                self.cleanup()
+                with self.spanLifecycle("cleanup()"):
+                    self.cleanup()
                 self.invokeLifecycle("cleanup")
                 if not self.args.notitle:
                     self.showFooter(rtn)
             if hasattr(self, 'hLogfile'):
                 self.resLogging.removeSink(self.hLogfile)
+            self.resLogging.leaveStep(token)
+            self.resProfiler.leave()
 
     def execute(self) -> int:
         try:
             self.invokeLifecycle("pre-run")
-            return self.main()
+            with self.spanLifecycle("main"):
+                rtn = self.runMain()
+            if self.outputs():
+                from .statcache import invalidatePaths
+                invalidatePaths(self.outputs()) # Even if failed: they may be partly written
+            if rtn == 0 and self.outputs():
+                from .stamp import ResourceStamp
+                try:
+                    ResourceStamp().record(self.getStampKey(), self.inputs(), self.outputs(), self.getArgsKey())
+                except IsADirectoryError as e:
+                    e.add_note(F"Declared by step {self.__class__.__qualname__}")
+                    raise
+                if self.args.cache:
+                    self.storeOutputs()
+            return rtn
         finally:
             self.invokeLifecycle("post-run")
 
-    def shellout(self, *args: Sequence[str]) -> int:
-        return asyncio.run(shellrun(self.logger, args))
+    def shellout(
+            self,
+            *args: TypeStage,
+            stdout: TypeOutput = None,
+            stderr: TypeOutput | Mapping[int, TypeOutput] = None,
+            limit: LogLimit | None = None,
+            stdin: TypeInput = None,
+            group: FailFastGroup | None = None,
+            ) -> int:
+        """
+        Run a pipeline and wait for it. See shellrun() for `stdout`, `stderr`,
+        `limit`, `stdin` and `group`.
+
+        This starts an event loop of its own, so in an `async def main`, await
+        ashellout() instead.
+        """
+        import asyncio
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            raise RuntimeError("shellout() can't run inside an event loop, await ashellout() instead")
+        return asyncio.run(self.runPipeline(args, stdout, stderr, limit, stdin, group=group)).returncode
+
+    async def ashellout(
+            self,
+            *args: TypeStage,
+            stdout: TypeOutput = None,
+            stderr: TypeOutput | Mapping[int, TypeOutput] = None,
+            limit: LogLimit | None = None,
+            stdin: TypeInput = None,
+            group: FailFastGroup | None = None,
+            ) -> int:
+        """
+        Like shellout(), but on the running event loop, so that pipelines can be
+        combined with each other and with other async work (e.g. with asyncio.gather)
+        """
+        return (await self.runPipeline(args, stdout, stderr, limit, stdin, group=group)).returncode
+
+    async def ashellcapture(
+            self,
+            *args: TypeStage,
+            stderr: TypeOutput | Mapping[int, TypeOutput] = None,
+            limit: LogLimit | None = None,
+            stdin: TypeInput = None,
+            group: FailFastGroup | None = None,
+            ) -> bytes:
+        """
+        Like shellcapture() in 'bytes' mode, but on the running event loop
+        """
+        from subprocess import CalledProcessError
+        from .subprocess import getStageCommand
+        buf = io.BytesIO()
+        result = await self.runPipeline(args, buf, stderr, limit, stdin, group=group)
+        if result.returncode != 0:
+            raise CalledProcessError(result.returncode, " | ".join(getStageCommand(entry) for entry in args))
+        return buf.getvalue()
+
+    async def runPipeline(
+            self,
+            aEntries: Sequence[TypeStage],
+            stdout: TypeOutput = None,
+            stderr: TypeOutput | Mapping[int, TypeOutput] = None,
+            limit: LogLimit | None = None,
+            stdin: TypeInput = None,
+            logger: TypeLogger | None = None,
+            group: FailFastGroup | None = None,
+            evtStopped: threading.Event | None = None,
+            ) -> ResultPipeline:
+        from .subprocess import getStageName, shellrun
+        timeBegin = time.perf_counter()
+        try:
+            result = await shellrun(logger or self.logger, aEntries, stdout=stdout, stderr=stderr, limit=limit, stdin=stdin,
+                    group=group, evtStopped=evtStopped)
+        except ExceptionGroup as e:
+            # A stage that couldn't be spawned: raise its error as is, like subprocess.run() does
+            if len(e.exceptions) == 1 and isinstance(e.exceptions[0], OSError):
+                raise e.exceptions[0] from None
+            raise
+        if self.resProfiler.isEnabled():
+            self.resProfiler.addPipeline(" | ".join(getStageName(entry) for entry in aEntries), timeBegin, result)
+        self.maxrssPipelines = max(self.maxrssPipelines, max((stage.maxrss for stage in result.aStages), default=0))
+        return result
+
+    def shellbg(
+            self,
+            *args: TypeStage,
+            stdout: TypeOutput = None,
+            stderr: TypeOutput | Mapping[int, TypeOutput] = None,
+            limit: LogLimit | None = None,
+            stdin: TypeInput = None,
+            group: FailFastGroup | None = None,
+            priority: int = 0,
+            ) -> Job:
+        """
+        Queue a pipeline to run in the background on the shared scheduler, and
+        return a handle whose join() gives the return code, and getResult() the
+        full ResultPipeline with per-stage resource usage.
+
+        An iterable `stdin` is consumed on the scheduler thread. Pipelines
+        sharing a `group` are terminated together on the first failure.
+        """
+        from .scheduler import ResourceScheduler
+        from .subprocess import getStageName
+        return ResourceScheduler().submit(
+                lambda: self.runPipeline(args, stdout, stderr, limit, stdin, group=group),
+                priority=priority,
+                name=" | ".join(getStageName(entry) for entry in args),
+                )
+
+    def getShardLogger(self, iShard: int, nShards: int) -> TypeLogger:
+        """
+        A logger tagging every line with the shard it came from
+        """
+        tag = F"[shard {iShard+1}/{nShards}] "
+        def patch(record: loguru.Record) -> None:
+            record['message'] = tag + record['message'].replace('\n', '\n' + tag)
+        return self.logger.patch(patch)
+
+    def shellshard(
+            self,
+            *args: TypeStage,
+            pathIn: str,
+            pathOut: str,
+            nShards: int = 0,
+            sep: bytes = b'\n',
+            stderr: TypeOutput | Mapping[int, TypeOutput] = None,
+            limit: LogLimit | None = None,
+            priority: int = 0,
+            ) -> int:
+        """
+        Split `pathIn` into shards of whole records ending with `sep`, run the
+        pipeline on each of them in the background, and concatenate their outputs
+        into `pathOut` in order, each one as soon as it and those before it are done.
+
+        The number of shards defaults to the scheduler's concurrency limit,
+        which also bounds how many of them run at once. The logs of each shard
+        are tagged with its number. The shards form a FailFastGroup: on the
+        first failure, the running ones are terminated and the queued ones
+        cancelled, `pathOut` is left alone, and that failure's return code is
+        returned. A shard that can't be started at all (e.g. FileNotFoundError
+        for a missing command) takes the others down the same way, then its
+        error is raised.
+        """
+        import tempfile
+        from concurrent.futures import CancelledError, wait
+        from .scheduler import ResourceScheduler
+        from .shard import appendFile, splitFile
+        from .subprocess import FailFastGroup
+        aRanges = splitFile(pathIn, nShards or ResourceScheduler().nJobs, sep)
+        group = FailFastGroup()
+        dirOut = os.path.dirname(os.path.abspath(pathOut))
+        # Next to the output: same filesystem for copy_file_range() and the final rename
+        with tempfile.TemporaryDirectory(dir=dirOut, prefix=".skritt-shard-") as dirTemp:
+            aPaths = [os.path.join(dirTemp, F"{i:05d}") for i in range(len(aRanges))]
+            aJobs = [
+                    ResourceScheduler().submit(
+                        functools.partial(self.runPipeline, args, path, stderr, limit, rangeIn, self.getShardLogger(i, len(aRanges)), group),
+                        priority=priority,
+                        name=F"shard {i+1}/{len(aRanges)}",
+                        )
+                    for i, (rangeIn, path) in enumerate(zip(aRanges, aPaths))
+                    ]
+            self.logger.info("Sharded {} into {:d} parts", pathIn, len(aRanges))
+
+            rtn = 0
+            pathMerge = os.path.join(dirTemp, "merged")
+            with open(pathMerge, 'wb') as fpOut:
+                for job, path in zip(aJobs, aPaths):
+                    try:
+                        rtnShard = job.join()
+                    except CancelledError:
+                        continue
+                    except BaseException:
+                        # This shard couldn't run at all: the others must be gone before their directory is
+                        for jobOther in aJobs:
+                            jobOther.future.cancel()
+                        group.terminate()
+                        wait([jobOther.future for jobOther in aJobs])
+                        raise
+                    if rtn != 0:
+                        continue
+                    if rtnShard != 0:
+                        rtn = rtnShard
+                        for jobOther in aJobs:
+                            jobOther.future.cancel() # Only succeeds for those not started yet
+                        continue
+                    with open(path, 'rb') as fpIn:
+                        appendFile(fpOut.fileno(), fpIn.fileno())
+                    os.unlink(path)
+            if group.failure is not None:
+                rtn = group.failure.returncode
+            if rtn == 0:
+                os.replace(pathMerge, pathOut)
+        return rtn
+
+    def shelliter(
+            self,
+            *args: TypeStage,
+            lines: bool = True,
+            sizeChunk: int = 1 << 20,
+            stderr: TypeOutput | Mapping[int, TypeOutput] = None,
+            limit: LogLimit | None = None,
+            stdin: TypeInput = None,
+            check: bool = True,
+            ) -> Generator[bytes]:
+        """
+        Run a pipeline in the background, and yield its stdout while it's running,
+        either line by line or in chunks of up to `sizeChunk` bytes.
+
+        The output goes through a pipe read directly by the iterating thread.
+        The pipeline runs on the shared scheduler, but doesn't count against
+        --jobs nor waits behind queued background pipelines, since the caller
+        is waiting on it. When `check` is set, CalledProcessError is raised if
+        the pipeline failed. Stopping the iteration early closes the pipe, and
+        the stages then killed by SIGPIPE are neither logged nor returned as failures.
+        """
+        from subprocess import CalledProcessError
+        from .scheduler import ResourceScheduler
+        from .subprocess import FdOwned, getStageCommand, getStageName
+        fdRead, fdWrite = os.pipe()
+        evtStopped = threading.Event()
+        job = ResourceScheduler().submit(
+                lambda: self.runPipeline(args, FdOwned(fdWrite), stderr, limit, stdin, evtStopped=evtStopped),
+                name=" | ".join(getStageName(entry) for entry in args),
+                isLimited=False,
+                )
+        isComplete = False
+        try:
+            fp = io.BufferedReader(io.FileIO(fdRead, 'r'), sizeChunk)
+            try:
+                if lines:
+                    yield from fp
+                else:
+                    while chunk := fp.read1(sizeChunk):
+                        yield chunk
+                isComplete = True
+            finally:
+                if not isComplete:
+                    evtStopped.set() # Before closing, so that the pipeline can't see the SIGPIPE first
+                fp.close()
+        finally:
+            rtn = job.join()
+        if isComplete and check and rtn != 0:
+            raise CalledProcessError(rtn, " | ".join(getStageCommand(entry) for entry in args))
+
+    @overload
+    def shellcapture(self, *args: TypeStage, mode: Literal['bytes'] = 'bytes',
+            sizeSpool: int = ..., stderr: TypeOutput | Mapping[int, TypeOutput] = ..., limit: LogLimit | None = ...,
+            stdin: TypeInput = ...) -> bytes: ...
+    @overload
+    def shellcapture(self, *args: TypeStage, mode: Literal['spool'],
+            sizeSpool: int = ..., stderr: TypeOutput | Mapping[int, TypeOutput] = ..., limit: LogLimit | None = ...,
+            stdin: TypeInput = ...) -> IO[bytes]: ...
+    @overload
+    def shellcapture(self, *args: TypeStage, mode: Literal['mmap'],
+            sizeSpool: int = ..., stderr: TypeOutput | Mapping[int, TypeOutput] = ..., limit: LogLimit | None = ...,
+            stdin: TypeInput = ...) -> mmap.mmap | bytes: ...
+
+    def shellcapture(
+            self,
+            *args: TypeStage,
+            mode: Literal['bytes', 'spool', 'mmap'] = 'bytes',
+            sizeSpool: int = 64 << 20,
+            stderr: TypeOutput | Mapping[int, TypeOutput] = None,
+            limit: LogLimit | None = None,
+            stdin: TypeInput = None,
+            ) -> bytes | IO[bytes] | mmap.mmap:
+        """
+        Run a pipeline, and return its stdout as:
+        - 'bytes': a bytes object.
+        - 'spool': a file object positioned at the beginning, kept in memory up
+          to `sizeSpool` bytes and moved to a temporary file beyond that.
+        - 'mmap': a read-only mmap of a temporary file the pipeline wrote to
+          directly (or b'' when there was no output).
+
+        Raise CalledProcessError if the pipeline failed.
+        """
+        import mmap
+        import tempfile
+        from subprocess import CalledProcessError
+        from .subprocess import getStageCommand
+        if mode == 'bytes':
+            return b''.join(self.shelliter(*args, lines=False, stderr=stderr, limit=limit, stdin=stdin))
+
+        if mode == 'spool':
+            fpSpool = tempfile.SpooledTemporaryFile(max_size=sizeSpool)
+            try:
+                for chunk in self.shelliter(*args, lines=False, stderr=stderr, limit=limit, stdin=stdin):
+                    fpSpool.write(chunk)
+            except BaseException:
+                fpSpool.close()
+                raise
+            fpSpool.seek(0)
+            return fpSpool
 
-    def shellbg(self, *args: Sequence[str]) -> ThreadForSubprocess:
-        t = ThreadForSubprocess(target=self.shellout, args=args)
-        t.start()
-        return t
+        with tempfile.TemporaryFile() as fp:
+            rtn = self.shellout(*args, stdout=fp, stderr=stderr, limit=limit, stdin=stdin)
+            if rtn != 0:
+                raise CalledProcessError(rtn, " | ".join(getStageCommand(entry) for entry in args))
+            if os.fstat(fp.fileno()).st_size == 0:
+                return b''
+            return mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
@@ -14,78 +14,805 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from typing import no_type_check, Any
-from collections.abc import Sequence
+from typing import BinaryIO, IO, cast
+from collections.abc import AsyncIterable, Callable, Iterable, Iterator, Mapping, Sequence
 
 import asyncio
+import codecs
+import contextvars
+import errno
+import functools
+import io
+import logging
 import os
-from subprocess import PIPE
-from threading import Thread
+import resource
+import signal
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from subprocess import DEVNULL, PIPE, Popen
 
 from .logging import TypeLogger
 
-class ThreadForSubprocess(Thread):
-    def __init__(self, *args: Any, **kwargs: Any) -> None:
-        super().__init__(*args, **kwargs)
-        self._return: int = 0
+class FdOwned(int):
+    """
+    An fd handed over to shellrun(), which closes it as soon as the children
+    have it. Needed for pipes, whose other end only sees EOF once every copy
+    of this end is closed.
+    """
 
-    @no_type_check
-    def run(self) -> None:
-        if self._target is not None:
-            self._return = self._target(*self._args, **self._kwargs)
+@dataclass
+class FileRange:
+    """
+    A byte range of a file, as pipeline input. A negative length means up to the end.
+    """
+    path: str | os.PathLike[str]
+    offset: int = 0
+    length: int = -1
 
-    @no_type_check
-    def join(self, *args: Any) -> int:
-        super().join(*args)
-        return self._return
+@dataclass
+class Filter:
+    """
+    A pipeline stage run in python instead of a process: `func` gets an
+    iterator over the input lines (or chunks, unless `lines`), and returns an
+    iterable of output bytes, typically being a generator.
+    """
+    func: Callable[[Iterator[bytes]], Iterable[bytes]]
+    lines: bool = True
+    name: str = ''
+    sizeChunk: int = 1 << 20
 
+# A pipeline stage: a command, or a python filter (given bare or as a Filter)
+type TypeStage = Sequence[str] | Filter | Callable[[Iterator[bytes]], Iterable[bytes]]
+# Where an output stream can go: None for logging, a path, a raw fd, or a file object
+type TypeOutput = str | os.PathLike[str] | int | BinaryIO | None
+# Where the input can come from: nothing, a path, a raw fd, a file object, a
+# file range, data, or chunks of data from an iterable or async iterable
+type TypeInput = str | os.PathLike[str] | int | BinaryIO | FileRange | bytes | Iterable[bytes] | AsyncIterable[bytes] | None
 
-async def logStream(logger: TypeLogger, stream: asyncio.StreamReader | None, pid: int) -> None:
+SIZE_RELAY = 1 << 20
+SIZE_LOG_CHUNK = 1 << 18
+LEN_LOG_LINE_MAX = 1 << 20 # Longer lines get broken up instead of piling up in memory
+
+@dataclass
+class LogLimit:
+    """
+    Limits on how much of one output stream gets logged. Zero means no limit.
+
+    The first `nHead` lines are logged, and afterwards only one out of every
+    `nSample` lines (none if 0). On top of that, at most `rate` lines per second
+    are logged. The last `nTail` of the lines held back are still logged when
+    the stream ends, followed by a count of what was suppressed.
+    """
+    nHead: int = 0
+    nTail: int = 0
+    nSample: int = 0
+    rate: float = 0.0
+
+class LogLimiter:
+    """
+    Apply a LogLimit to one stream
+    """
+    def __init__(self, limit: LogLimit) -> None:
+        self.limit = limit
+        self.nSeen = 0
+        self.nSuppressed = 0
+        self.aTail: deque[str] = deque(maxlen=limit.nTail or None)
+        self.tokens = limit.rate
+        self.timeLast = time.monotonic()
+
+    def filter(self, aLines: list[str]) -> list[str]:
+        """
+        Return the lines to be logged among a new batch
+        """
+        limit = self.limit
+        nBegin = self.nSeen
+        self.nSeen += len(aLines)
+        aKept: Sequence[int] = range(len(aLines))
+        if (limit.nHead or limit.nSample) and self.nSeen > limit.nHead:
+            nHead = max(limit.nHead - nBegin, 0)
+            aKept = list(range(nHead))
+            if limit.nSample:
+                # Count the sampling from the end of the head
+                aKept.extend(i for i in range(nHead, len(aLines)) if (nBegin + i - limit.nHead + 1) % limit.nSample == 0)
+
+        if limit.rate:
+            now = time.monotonic()
+            self.tokens = min(self.tokens + (now-self.timeLast) * limit.rate, limit.rate)
+            self.timeLast = now
+            aKept = aKept[:int(self.tokens)]
+            self.tokens -= len(aKept)
+
+        if len(aKept) == len(aLines):
+            return aLines
+        setKept = set(aKept)
+        aSuppressed = [line for i, line in enumerate(aLines) if i not in setKept]
+        self.nSuppressed += len(aSuppressed)
+        if limit.nTail:
+            self.aTail.extend(aSuppressed[-limit.nTail:])
+        return [aLines[i] for i in aKept]
+
+    def finish(self) -> tuple[list[str], int]:
+        """
+        Return the tail lines to be logged at the end, and the number of lines
+        that were never logged
+        """
+        return list(self.aTail), self.nSuppressed - len(self.aTail)
+
+def logLines(logger: TypeLogger, prefix: str, aLines: list[str]) -> None:
+    """
+    Log a batch of lines at PROC level, as a single record whose message holds
+    all of them, one per line. Any sink gets all the output this way, while a
+    record per line would cost a full log dispatch each. With loguru, the record
+    is marked with extra["isBatch"], and ResourceLogger's sinks render it with
+    a header on every line, as if each line was logged on its own.
+    """
+    if not aLines:
+        return
+    # No formatting arguments: loguru then leaves the message alone, braces and all
+    text = '\n'.join(prefix + line.strip() for line in aLines)
+    if len(aLines) > 1 and not isinstance(logger, logging.Logger):
+        logger = logger.bind(isBatch=True)
+    logger.log(22, text)
+
+async def logStream(logger: TypeLogger, stream: asyncio.StreamReader | None, pid: int, limit: LogLimit | None = None) -> None:
+    """
+    Log everything from a stream at PROC level, or only part of it according
+    to `limit`.
+
+    Reads in large chunks and splits them in bulk rather than awaiting each line,
+    and logs each chunk's lines as one batch (see logLines()), so chatty processes
+    don't cost a coroutine round-trip and a full log dispatch per line. Lines of
+    any length are fine, and invalid UTF-8 is replaced rather than fatal.
+    """
+    if stream is None:
+        return
+    prefix = F"({pid:d}) "
+    limiter = LogLimiter(limit) if limit is not None else None
+    isSuppressing = False
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    rest = ''
+    while True:
+        data = await stream.read(SIZE_LOG_CHUNK)
+        aLines = (rest + decoder.decode(data, final=not data)).split('\n')
+        rest = aLines.pop()
+        if len(rest) > LEN_LOG_LINE_MAX or (not data and rest):
+            aLines.append(rest)
+            rest = ''
+        if limiter is not None:
+            nSuppressed = limiter.nSuppressed
+            aLines = limiter.filter(aLines)
+            if not isSuppressing and limiter.nSuppressed > nSuppressed:
+                isSuppressing = True
+                logger.warning("Output of {:d} exceeds the logging limit, suppressing", pid)
+        logLines(logger, prefix, aLines)
+        if not data:
+            break
+
+    if limiter is not None and limiter.nSuppressed:
+        aTail, nSuppressed = limiter.finish()
+        logger.warning("Suppressed {:,} lines from pid {:d}", nSuppressed, pid)
+        logLines(logger, prefix, aTail)
+
+async def relayStream(stream: asyncio.StreamReader | None, fileOut: BinaryIO) -> None:
+    """
+    Copy a stream into a file object that has no real fd, in large blocks
+    """
     if stream is not None:
-        while line := await stream.readline():
-            logger.log(22, "({:d}) {}", pid, line.decode().strip())
+        while data := await stream.read(SIZE_RELAY):
+            fileOut.write(data)
+        fileOut.flush()
+
+def resolveOutput(target: TypeOutput, aFdOwned: list[int]) -> int | BinaryIO | None:
+    """
+    Turn an output target into an fd the child can write to directly.
+    File objects without a real fd are returned as-is and need to be relayed.
+    Fds opened here, or handed over as FdOwned, are appended to aFdOwned so
+    the caller can close them.
+    """
+    if isinstance(target, FdOwned):
+        aFdOwned.append(target)
+    if target is None or isinstance(target, int):
+        return target
+    if isinstance(target, (str, os.PathLike)):
+        fd = os.open(target, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+        aFdOwned.append(fd)
+        return fd
+    try:
+        fd = target.fileno()
+    except (AttributeError, io.UnsupportedOperation):
+        return target
+    # Anything still buffered on the python side must land before the child's output
+    target.flush()
+    return fd
+
+def resolveInput(source: TypeInput, aFdOwned: list[int]) -> int | FileRange | bytes | Iterable[bytes] | AsyncIterable[bytes] | None:
+    """
+    Turn an input source into an fd the child can read from directly, when
+    possible. Other sources are returned as-is, and need to be fed.
+    """
+    if isinstance(source, FdOwned):
+        aFdOwned.append(source)
+    if source is None or isinstance(source, int):
+        return source
+    if isinstance(source, (str, os.PathLike)):
+        fd = os.open(source, os.O_RDONLY)
+        aFdOwned.append(fd)
+        return fd
+    if isinstance(source, (FileRange, bytes)):
+        return source
+    if hasattr(source, 'read') and hasattr(source, 'fileno'):
+        fileIn = cast(BinaryIO, source)
+        try:
+            fd = fileIn.fileno()
+        except io.UnsupportedOperation:
+            return iter(lambda: fileIn.read(SIZE_RELAY), b'')
+        # The python side may have read ahead: make the child start where python left off
+        if fileIn.seekable():
+            os.lseek(fd, fileIn.tell(), os.SEEK_SET)
+        return fd
+    return source
+
+def copyRange(fdIn: int, fdOut: int, offset: int, length: int) -> None:
+    """
+    Copy a range of a file into fdOut within the kernel: splice() when fdOut is
+    a pipe, sendfile() otherwise, and plain reads and writes as a last resort.
+    Blocking, so meant for a worker thread. Stops quietly if the reader is gone.
+    """
+    if length < 0:
+        length = os.fstat(fdIn).st_size - offset
+    try:
+        while length > 0:
+            try:
+                n = os.splice(fdIn, fdOut, min(length, SIZE_RELAY), offset_src=offset)
+            except (AttributeError, OSError) as e:
+                if isinstance(e, OSError) and e.errno != errno.EINVAL:
+                    raise
+                try:
+                    n = os.sendfile(fdOut, fdIn, offset, min(length, SIZE_RELAY))
+                except OSError as e:
+                    if e.errno not in (errno.EINVAL, errno.ENOSYS):
+                        raise
+                    n = os.write(fdOut, os.pread(fdIn, min(length, SIZE_RELAY), offset))
+            if n == 0:
+                break
+            offset += n
+            length -= n
+    except BrokenPipeError:
+        pass
+
+class ProtocolWritePipe(asyncio.BaseProtocol):
+    """
+    Flow control for writing into a pipe: wait on evtWritable before writing more
+    """
+    def __init__(self) -> None:
+        self.evtWritable = asyncio.Event()
+        self.evtWritable.set()
+        self.isClosed = False
+
+    def pause_writing(self) -> None:
+        self.evtWritable.clear()
+
+    def resume_writing(self) -> None:
+        self.evtWritable.set()
+
+    def connection_lost(self, exc: Exception | None) -> None:
+        self.isClosed = True
+        self.evtWritable.set()
+
+class RelayIterable:
+    """
+    Pull chunks from a plain iterable on a worker thread, as a generator or a
+    file object may block on each of them. Chunks gathered while the loop is
+    busy are handed over together, up to SIZE_RELAY bytes ahead of the writer.
+    """
+    def __init__(self, source: Iterable[bytes], loop: asyncio.AbstractEventLoop) -> None:
+        self.source = source
+        self.loop = loop
+        self.cond = threading.Condition()
+        self.aChunks: list[bytes] = []
+        self.nBytes = 0
+        self.isDone = False
+        self.isStopped = False
+        self.evtReady = asyncio.Event()
+
+    def pump(self) -> None:
+        """Run on a worker thread: iterate over the source until it's exhausted or stop() is called"""
+        try:
+            for chunk in self.source:
+                with self.cond:
+                    while self.nBytes >= SIZE_RELAY and not self.isStopped:
+                        self.cond.wait()
+                    if self.isStopped:
+                        return
+                    isWake = not self.aChunks
+                    self.aChunks.append(chunk)
+                    self.nBytes += len(chunk)
+                if isWake:
+                    self.loop.call_soon_threadsafe(self.evtReady.set)
+        finally:
+            with self.cond:
+                self.isDone = True
+            self.loop.call_soon_threadsafe(self.evtReady.set)
+
+    async def take(self) -> tuple[bytes, bool]:
+        """Wait for whatever has been pulled so far, and whether that was the last of it"""
+        await self.evtReady.wait()
+        with self.cond:
+            self.evtReady.clear()
+            data = b''.join(self.aChunks)
+            self.aChunks.clear()
+            self.nBytes = 0
+            self.cond.notify()
+            return data, self.isDone
+
+    def stop(self) -> None:
+        with self.cond:
+            self.isStopped = True
+            self.cond.notify()
+
+async def feedStream(fileOut: IO[bytes], source: FileRange | bytes | Iterable[bytes] | AsyncIterable[bytes]) -> None:
+    """
+    Write an input source into a pipe, and close it at the end. Stops early
+    without complaining if the reading process goes away.
+    """
+    loop = asyncio.get_running_loop()
+    if isinstance(source, FileRange):
+        with fileOut, open(source.path, 'rb') as fpIn:
+            await loop.run_in_executor(None, copyRange, fpIn.fileno(), fileOut.fileno(), source.offset, source.length)
+        return
+
+    protocol = ProtocolWritePipe()
+    transport, _ = await loop.connect_write_pipe(lambda: protocol, fileOut)
+    try:
+        if isinstance(source, bytes):
+            transport.write(source)
+        elif isinstance(source, AsyncIterable):
+            async for chunk in source:
+                await protocol.evtWritable.wait()
+                if protocol.isClosed:
+                    break
+                transport.write(chunk)
+        else:
+            relay = RelayIterable(source, loop)
+            futPump = loop.run_in_executor(None, relay.pump)
+            try:
+                isDone = False
+                while not isDone:
+                    data, isDone = await relay.take()
+                    await protocol.evtWritable.wait()
+                    if protocol.isClosed:
+                        break
+                    transport.write(data)
+            finally:
+                relay.stop()
+            if isDone:
+                await futPump # Raises whatever the source raised
+    finally:
+        transport.close() # Flushes whatever is still buffered, then closes
+
+async def openReader(fileIn: IO[bytes]) -> asyncio.StreamReader:
+    """
+    Wrap the reading end of a pipe into an asyncio stream
+    """
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), fileIn)
+    return reader
+
+async def waitProcess(pid: int, onExit: Callable[[], None] | None = None) -> tuple[int, resource.struct_rusage]:
+    """
+    Reap a child process without blocking the loop, and return its return code
+    (negative for signals, like Popen) along with its resource usage.
+
+    `onExit` is called once the process has exited but before it's reaped,
+    while its pid still can't be reused.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        fdPid = os.pidfd_open(pid)
+    except (AttributeError, OSError):
+        # No pidfd on this platform or kernel: block on a worker thread instead
+        def wait() -> tuple[int, int, resource.struct_rusage]:
+            if onExit is not None:
+                os.waitid(os.P_PID, pid, os.WEXITED | os.WNOWAIT)
+                onExit()
+            return os.wait4(pid, 0)
+        _, status, rusage = await loop.run_in_executor(None, wait)
+        return os.waitstatus_to_exitcode(status), rusage
+    try:
+        evtExit = asyncio.Event()
+        loop.add_reader(fdPid, evtExit.set)
+        try:
+            await evtExit.wait()
+        finally:
+            loop.remove_reader(fdPid)
+    finally:
+        os.close(fdPid)
+    if onExit is not None:
+        onExit()
+    _, status, rusage = os.wait4(pid, 0) # Already exited, won't block
+    return os.waitstatus_to_exitcode(status), rusage
+
+@dataclass
+class ResultStage:
+    """
+    How one process in a pipeline went. Times are in seconds, maxrss in KiB.
 
-async def shellrun(logger: TypeLogger, aEntries: Sequence[Sequence[str]]) -> int:
-    aProcs: list[tuple[asyncio.subprocess.Process, str]] = []
+    Linux keeps maxrss across exec, so it never reads lower than the RSS of
+    this interpreter at the time of spawning. For python filters, pid is the
+    thread id, and maxrss is that of the whole interpreter.
+    """
+    pid: int
+    name: str
+    returncode: int
+    elapsed: float
+    utime: float
+    stime: float
+    maxrss: int
+    inblock: int
+    oublock: int
+    nvcsw: int
+    nivcsw: int
+    timeBegin: float = 0.0 # From time.perf_counter()
+
+@dataclass
+class ResultPipeline:
+    """
+    How a whole pipeline went. The return code is that of the last failing stage.
+    """
+    returncode: int
+    aStages: list[ResultStage]
+
+class FailFastGroup:
+    """
+    Pipelines that go down together: as soon as any stage of any of them
+    fails, all other running stages get SIGTERM, and SIGKILL if still there
+    after `timeGrace` seconds. Stages spawned later are terminated right away.
+
+    Dying of SIGPIPE doesn't count as failing: the reader stopped on purpose,
+    and if it stopped because it failed, that failure counts instead.
+    Usable across threads and event loops.
+    """
+    def __init__(self, timeGrace: float = 5.0) -> None:
+        self.timeGrace = timeGrace
+        self.failure: ResultStage | None = None
+        self.isTerminated = False
+        self.aPids: set[int] = set()
+        self.lock = threading.Lock()
+
+    def isFailed(self) -> bool:
+        return self.failure is not None
+
+    def register(self, pid: int) -> None:
+        with self.lock:
+            self.aPids.add(pid)
+            if self.failure is not None or self.isTerminated:
+                self.signal(pid, signal.SIGTERM)
+
+    def unregister(self, pid: int) -> None:
+        with self.lock:
+            self.aPids.discard(pid)
+
+    def check(self, logger: TypeLogger, stage: ResultStage) -> None:
+        """
+        Take the group down if this finished stage failed, and it's the first failure
+        """
+        if stage.returncode in (0, -signal.SIGPIPE):
+            return
+        with self.lock:
+            if self.failure is not None:
+                return
+            self.failure = stage
+            logger.error("Fail-fast: {:d}({}) returned {:d}, terminating {:d} other processes",
+                    stage.pid, stage.name, stage.returncode, len(self.aPids))
+            for pid in self.aPids:
+                self.signal(pid, signal.SIGTERM)
+        timer = threading.Timer(self.timeGrace, self.kill)
+        timer.daemon = True
+        timer.start()
+
+    def terminate(self) -> None:
+        """
+        Take the group down without a failing stage, e.g. when one of its
+        pipelines couldn't even be started. Stages spawned later are terminated too.
+        """
+        with self.lock:
+            self.isTerminated = True
+            for pid in self.aPids:
+                self.signal(pid, signal.SIGTERM)
+        timer = threading.Timer(self.timeGrace, self.kill)
+        timer.daemon = True
+        timer.start()
+
+    def kill(self) -> None:
+        with self.lock:
+            for pid in self.aPids:
+                self.signal(pid, signal.SIGKILL)
+
+    @staticmethod
+    def signal(pid: int, sig: int) -> None:
+        # Only called with the lock held on registered pids, which are not reaped yet
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            pass
+
+async def reapStage(logger: TypeLogger, proc: Popen[bytes], name: str, timeBegin: float, group: FailFastGroup | None = None) -> ResultStage:
+    if group is None:
+        rtn, rusage = await waitProcess(proc.pid)
+    else:
+        rtn, rusage = await waitProcess(proc.pid, functools.partial(group.unregister, proc.pid))
+    proc.returncode = rtn
+    result = ResultStage(
+            proc.pid, name, rtn, time.perf_counter() - timeBegin,
+            rusage.ru_utime, rusage.ru_stime, rusage.ru_maxrss,
+            rusage.ru_inblock, rusage.ru_oublock, rusage.ru_nvcsw, rusage.ru_nivcsw,
+            timeBegin,
+            )
+    logger.debug(
+            "Reaped {:d}({}) rtn={:d} wall={:.3f}s user={:.3f}s sys={:.3f}s maxrss={:d}KiB io={:d}/{:d}blk csw={:d}/{:d}",
+            result.pid, name, rtn, result.elapsed, result.utime, result.stime, result.maxrss,
+            result.inblock, result.oublock, result.nvcsw, result.nivcsw,
+            )
+    if group is not None:
+        group.check(logger, result)
+    return result
+
+def getStageName(entry: TypeStage) -> str:
+    if isinstance(entry, Filter):
+        return entry.name or getattr(entry.func, '__name__', 'python')
+    if callable(entry):
+        return getattr(entry, '__name__', 'python')
+    return entry[0]
+
+def getStageCommand(entry: TypeStage) -> str:
+    if isinstance(entry, Filter) or callable(entry):
+        return F"<{getStageName(entry)}>"
+    return " ".join(entry)
+
+def getThreadUsage() -> resource.struct_rusage:
+    return resource.getrusage(getattr(resource, 'RUSAGE_THREAD', resource.RUSAGE_SELF))
+
+def writeAll(fd: int, data: bytes) -> None:
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+def runFilter(logger: TypeLogger, stage: Filter, fdIn: int, fdOut: int) -> int:
+    """
+    Run a python filter stage between two fds it takes over, with the return
+    code a process would have had: 0, 1 on an exception, or -SIGPIPE when the
+    next stage went away.
+    """
+    with io.FileIO(fdIn, 'r') as rawIn, io.FileIO(fdOut, 'w') as rawOut:
+        fpIn = io.BufferedReader(rawIn, stage.sizeChunk)
+        aIn: Iterator[bytes] = iter(fpIn) if stage.lines else iter(lambda: fpIn.read1(stage.sizeChunk), b'')
+        # Buffered by hand: a BufferedWriter would retry flushing into a broken pipe when closed
+        aBuf: list[bytes] = []
+        nBuf = 0
+        try:
+            for piece in stage.func(aIn):
+                aBuf.append(piece)
+                nBuf += len(piece)
+                if nBuf >= stage.sizeChunk:
+                    writeAll(rawOut.fileno(), b''.join(aBuf))
+                    aBuf.clear()
+                    nBuf = 0
+            writeAll(rawOut.fileno(), b''.join(aBuf))
+        except BrokenPipeError:
+            return -signal.SIGPIPE
+        except Exception:
+            logger.exception("Filter {} failed", getStageName(stage))
+            return 1
+    return 0
+
+async def reapFilter(logger: TypeLogger, stage: Filter, fdIn: int, fdOut: int, timeBegin: float, group: FailFastGroup | None = None) -> ResultStage:
+    """
+    Run a python filter stage on its own thread, reporting it like a process,
+    with the thread id for pid and the thread's own resource usage
+    """
+    loop = asyncio.get_running_loop()
+    future: asyncio.Future[ResultStage] = loop.create_future()
+    name = getStageName(stage)
+
+    def target() -> None:
+        usageBegin = getThreadUsage()
+        rtn = runFilter(logger, stage, fdIn, fdOut)
+        usage = getThreadUsage()
+        result = ResultStage(
+                threading.get_native_id(), name, rtn, time.perf_counter() - timeBegin,
+                usage.ru_utime - usageBegin.ru_utime, usage.ru_stime - usageBegin.ru_stime, usage.ru_maxrss,
+                usage.ru_inblock - usageBegin.ru_inblock, usage.ru_oublock - usageBegin.ru_oublock,
+                usage.ru_nvcsw - usageBegin.ru_nvcsw, usage.ru_nivcsw - usageBegin.ru_nivcsw,
+                timeBegin,
+                )
+        try:
+            loop.call_soon_threadsafe(future.set_result, result)
+        except RuntimeError: # Loop already gone
+            pass
+
+    # A thread of its own rather than the default executor: it may block on a pipe for long
+    # Also carrying the context over, for the logs to end up with the right Step
+    threading.Thread(target=contextvars.copy_context().run, args=(target,), name=F"SkrittFilter-{name}", daemon=True).start()
+    result = await future
+    logger.debug(
+            "Filter {:d}({}) rtn={:d} wall={:.3f}s user={:.3f}s sys={:.3f}s",
+            result.pid, name, result.returncode, result.elapsed, result.utime, result.stime,
+            )
+    if group is not None:
+        group.check(logger, result)
+    return result
+
+async def shellrun(
+        logger: TypeLogger,
+        aEntries: Sequence[TypeStage],
+        stdout: TypeOutput = None,
+        stderr: TypeOutput | Mapping[int, TypeOutput] = None,
+        limit: LogLimit | None = None,
+        stdin: TypeInput = None,
+        group: FailFastGroup | None = None,
+        evtStopped: threading.Event | None = None,
+        ) -> ResultPipeline:
+    """
+    Run a pipeline of commands, logging the stderr of every stage.
+
+    The first stage reads from `stdin`: a path, an fd or a file object is given
+    to it directly, a FileRange is copied in with splice()/sendfile(), and data
+    or (async) iterables of chunks are written in with flow control. Without
+    it, the first stage reads from /dev/null.
+
+    By default the stdout of the last stage is logged too. Alternatively, `stdout`
+    can point it to a path, an fd or a file object, and `stderr` can do the
+    same either for all stages or, as a mapping, for stage indices. Each logged
+    stream is limited separately by `limit`, if given.
+
+    Every process is reaped together with its resource usage, which is logged
+    at debug level and returned per stage in the result.
+
+    Stages can also be python filters (see Filter), each running on a thread
+    of its own between the pipes, and reported like processes.
+
+    With a `group`, the first failing stage takes down the other stages of
+    this pipeline and of the other pipelines in the group (see FailFastGroup),
+    and nothing is run at all if the group has already failed.
+
+    `evtStopped` is for whoever reads the output to set when it stopped
+    reading on purpose: stages then killed by SIGPIPE are not failures.
+    """
+    if group is not None and group.failure is not None:
+        logger.warning("Not running {} since {:d}({}) already failed",
+                " | ".join(getStageName(entry) for entry in aEntries), group.failure.pid, group.failure.name)
+        return ResultPipeline(group.failure.returncode, [])
+    aProcs: list[tuple[Popen[bytes], str]] = []
     aPipes: list[tuple[int, int]] = []
+    aFdOwned: list[int] = []
+    aTasksReap: list[asyncio.Task[ResultStage]] = []
+    aSpawned: list[str] = []
     try:
         async with asyncio.TaskGroup() as tg:
+            outLast = resolveOutput(stdout, aFdOwned)
+            inFirst = resolveInput(stdin, aFdOwned)
             for i, entry in enumerate(aEntries):
-                fdStdin = PIPE
-                fdStdout = PIPE
-                fdStderr = PIPE
+                if isinstance(stderr, Mapping):
+                    outErr = resolveOutput(stderr.get(i), aFdOwned)
+                elif i == 0:
+                    outErr = resolveOutput(stderr, aFdOwned)
+
+                fdStdin = DEVNULL if inFirst is None else inFirst if isinstance(inFirst, int) else PIPE
+                fdStdout: int = PIPE
+                fdStderr: int = outErr if isinstance(outErr, int) else PIPE
                 if i < len(aEntries)-1:
                     aPipes.append(os.pipe())
                     fdStdout = aPipes[i][1]
+                elif isinstance(outLast, int):
+                    fdStdout = outLast
                 if i > 0:
                     fdStdin = aPipes[i-1][0]
 
-                proc = await asyncio.create_subprocess_exec(
-                        entry[0], *(entry[1:]),
-                        stdin=fdStdin,
-                        stdout=fdStdout,
-                        stderr=fdStderr,
-                        )
+                if isinstance(entry, Filter) or callable(entry):
+                    filt = entry if isinstance(entry, Filter) else Filter(entry)
+                    try:
+                        fdIn, fdOut = await openFilterFds(
+                                logger, tg, fdStdin, fdStdout, inFirst if i == 0 else None, outLast, limit)
+                    finally:
+                        if i < len(aEntries)-1:
+                            os.close(aPipes[i][1])
+                        if i > 0:
+                            os.close(aPipes[i-1][0])
+                    aTasksReap.append(tg.create_task(reapFilter(logger, filt, fdIn, fdOut, time.perf_counter(), group)))
+                    aSpawned.append(F"({getStageName(filt)})")
+                    continue
+
+                try:
+                    proc = Popen(entry, stdin=fdStdin, stdout=fdStdout, stderr=fdStderr)
+                finally:
+                    if i < len(aEntries)-1:
+                        os.close(aPipes[i][1])
+                    if i > 0:
+                        os.close(aPipes[i-1][0])
                 aProcs.append((proc, entry[0]))
+                if group is not None:
+                    group.register(proc.pid)
+                aTasksReap.append(tg.create_task(reapStage(logger, proc, entry[0], time.perf_counter(), group)))
+                aSpawned.append(F"{proc.pid}({entry[0]})")
                 logger.debug("Spawn {:d} {}", proc.pid, " ".join(entry))
 
-                tg.create_task(logStream(logger, proc.stderr, proc.pid))
-                if i == len(aEntries)-1:
-                    tg.create_task(logStream(logger, proc.stdout, proc.pid))
-
-                if i < len(aEntries)-1:
-                    os.close(aPipes[i][1])
-                if i > 0:
-                    os.close(aPipes[i-1][0])
-            logger.info("Spawned {}", " ".join(F"{p.pid}({name})" for p,name in aProcs))
+                if proc.stdin is not None and inFirst is not None and not isinstance(inFirst, int):
+                    tg.create_task(feedStream(proc.stdin, inFirst))
+                if proc.stderr is not None:
+                    if outErr is None:
+                        tg.create_task(logStream(logger, await openReader(proc.stderr), proc.pid, limit))
+                    elif not isinstance(outErr, int):
+                        tg.create_task(relayStream(await openReader(proc.stderr), outErr))
+                if proc.stdout is not None:
+                    if outLast is None:
+                        tg.create_task(logStream(logger, await openReader(proc.stdout), proc.pid, limit))
+                    elif not isinstance(outLast, int):
+                        tg.create_task(relayStream(await openReader(proc.stdout), outLast))
+            # The children have their copies now
+            while aFdOwned:
+                os.close(aFdOwned.pop())
+            logger.info("Spawned {}", " ".join(aSpawned))
     finally:
-        rtn = 0
+        for fd in aFdOwned:
+            os.close(fd)
+        # Only left unreaped when something went wrong: don't leave orphans behind
         for p, name in aProcs:
             if p.returncode is None:
-                p.terminate()
-            await p.wait()
-            if p.returncode is not None and p.returncode != 0:
-                logger.error("Subprocess {:d} returned {:d}", p.pid, p.returncode)
-                rtn = p.returncode
-        return rtn
+                if group is not None:
+                    group.unregister(p.pid)
+                p.returncode = await terminateStage(p.pid)
 
+    aStages = [task.result() for task in aTasksReap]
+    rtn = 0
+    for stage in aStages:
+        if stage.returncode == -signal.SIGPIPE and evtStopped is not None and evtStopped.is_set():
+            logger.debug("Subprocess {:d}({}) stopped by SIGPIPE, its output no longer wanted", stage.pid, stage.name)
+        elif stage.returncode != 0:
+            logger.error("Subprocess {:d}({}) returned {:d}", stage.pid, stage.name, stage.returncode)
+            rtn = stage.returncode
+    return ResultPipeline(rtn, aStages)
+
+async def openFilterFds(
+        logger: TypeLogger,
+        tg: asyncio.TaskGroup,
+        fdStdin: int,
+        fdStdout: int,
+        inFirst: int | FileRange | bytes | Iterable[bytes] | AsyncIterable[bytes] | None,
+        outLast: int | BinaryIO | None,
+        limit: LogLimit | None,
+        ) -> tuple[int, int]:
+    """
+    Get fds of its own for a filter stage to read from and write to, with pipes
+    and tasks set up where a process would have gotten a PIPE
+    """
+    if fdStdin == DEVNULL:
+        fdIn = os.open(os.devnull, os.O_RDONLY)
+    elif fdStdin == PIPE:
+        fdIn, fdFeed = os.pipe()
+        assert inFirst is not None and not isinstance(inFirst, int)
+        tg.create_task(feedStream(open(fdFeed, 'wb'), inFirst))
+    else:
+        fdIn = os.dup(fdStdin)
+
+    if fdStdout != PIPE:
+        fdOut = os.dup(fdStdout)
+    else:
+        fdRead, fdOut = os.pipe()
+        fileRead = open(fdRead, 'rb')
+        if outLast is None:
+            tg.create_task(logStream(logger, await openReader(fileRead), os.getpid(), limit))
+        else:
+            assert not isinstance(outLast, int)
+            tg.create_task(relayStream(await openReader(fileRead), outLast))
+    return fdIn, fdOut
+
+async def terminateStage(pid: int) -> int:
+    try:
+        os.kill(pid, signal.SIGTERM)
+    except ProcessLookupError:
+        pass
+    rtn, _ = await waitProcess(pid)
+    return rtn
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright 2024-2025, Hojin Koh
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+# Benchmark: constructing and parsing the arguments of many Steps of one class
+# Usage: python bench/bench_argparse.py [nSteps=10000]
+#
+# "shared" is the normal path, where Steps of a class share a cached parser;
+# "detached" gives every Step a parser of its own, which is what building a
+# parser per Step used to cost.
+
+import sys
+import time
+
+from Skritt.base import StepBase
+
+class BenchStep(StepBase):
+    def __init__(self, *args: str) -> None:
+        super().__init__(*args)
+        self.getParser().add_argument("--mode", choices=('fast', 'slow'), default='fast')
+        self.getParser().add_argument("--nj", type=int, default=1)
+        self.getParser("BenchStep").add_argument("input")
+        self.getParser("BenchStep").add_argument("output")
+
+    def main(self) -> int:
+        return 0
+
+def run(nSteps: int, isDetached: bool) -> float:
+    timeStart = time.perf_counter()
+    for i in range(nSteps):
+        step = BenchStep(f"in{i}.txt", "out.txt", "--nj", "4")
+        if isDetached:
+            step.detachParser()
+        step.parseArgs()
+    return time.perf_counter() - timeStart
+
+def main() -> None:
+    nSteps = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    run(100, False)
+    for name, isDetached in (("detached", True), ("shared", False)):
+        timeTotal = run(nSteps, isDetached)
+        print(f"{name:>8}: {timeTotal*1e6/nSteps:7.1f} us/step ({timeTotal:.2f}s for {nSteps} steps)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright 2024-2025, Hojin Koh
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+# Benchmark: many invocations of a Step class, one process each vs one batch
+# Usage: python bench/bench_batch.py [nInvocations=200] [nJobs=1]
+#
+# The Step runs a small pipeline, as real ones would. "process" starts a fresh
+# interpreter per invocation, "batch" runs them all through python -m Skritt.batch.
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+MODULE = '''
+import sys
+from Skritt import Step
+
+class Sweep(Step):
+    def __init__(self, *args: str) -> None:
+        super().__init__(*args)
+        self.getParser("Sweep").add_argument("value", type=int)
+
+    def main(self) -> int:
+        return self.shellout(["true"])
+
+if __name__ == '__main__':
+    sys.exit(Sweep(*sys.argv[1:]).invoke())
+'''
+
+def main() -> None:
+    nInvocations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    nJobs = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    with tempfile.TemporaryDirectory() as dirTemp:
+        with open(os.path.join(dirTemp, "sweep.py"), 'w') as fp:
+            fp.write(MODULE)
+        dirRoot = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join((dirRoot, dirTemp)))
+
+        timeBegin = time.perf_counter()
+        for i in range(nInvocations):
+            subprocess.run([sys.executable, '-m', 'sweep', str(i), '--notitle'], env=env, check=True, stderr=subprocess.DEVNULL)
+        timeProcess = time.perf_counter() - timeBegin
+
+        manifest = ''.join(F"sweep.Sweep\t{i}\t--notitle\n" for i in range(nInvocations))
+        timeBegin = time.perf_counter()
+        subprocess.run([sys.executable, '-m', 'Skritt.batch', '-', '--jobs', str(nJobs)],
+                input=manifest, text=True, env=env, check=True, stderr=subprocess.DEVNULL)
+        timeBatch = time.perf_counter() - timeBegin
+
+    for name, elapsed in (("process", timeProcess), ("batch", timeBatch)):
+        print(F"{name:>8}: {elapsed:6.2f}s total, {elapsed*1000/nInvocations:6.1f} ms/invocation")
+
+if __name__ == '__main__':
+    main()
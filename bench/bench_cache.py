@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright 2024-2025, Hojin Koh
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+# Benchmark: running a Step vs restoring its output from the output cache
+# Usage: python bench/bench_cache.py [sizeMiB=64]
+#
+# The Step gzips its input. "run" is the first run, "restore" is the same Step
+# with the same arguments and input in another directory, taking the output
+# from the cache instead.
+
+import os
+import sys
+import tempfile
+import time
+
+from Skritt import Step
+
+class Gzip(Step):
+    def __init__(self, *args: str) -> None:
+        super().__init__(*args)
+        self.getParser("Gzip").add_argument("input")
+        self.getParser("Gzip").add_argument("output")
+
+    def inputs(self) -> tuple[str, ...]:
+        return (self.args.input,)
+
+    def outputs(self) -> tuple[str, ...]:
+        return (self.args.output,)
+
+    def main(self) -> int:
+        return self.shellout(["gzip", "-6", "-c", self.args.input], stdout=self.args.output)
+
+def main() -> None:
+    sizeMiB = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    with tempfile.TemporaryDirectory() as dirTemp:
+        os.environ['SKRITT_STAMPDB'] = os.path.join(dirTemp, "stamp.db")
+        os.environ['SKRITT_CACHEDIR'] = os.path.join(dirTemp, "cache")
+        # Half random, half repetitive: gzip has some work to do either way
+        data = os.urandom(sizeMiB << 19) + b"skritt\n" * ((sizeMiB << 19) // 7)
+        mElapsed: dict[str, float] = {}
+        for name in ("run", "restore"):
+            dirWork = os.path.join(dirTemp, name)
+            os.mkdir(dirWork)
+            with open(os.path.join(dirWork, "in.bin"), 'wb') as fp:
+                fp.write(data)
+            os.chdir(dirWork)
+            timeBegin = time.perf_counter()
+            Gzip("--notitle", "--cache", "in.bin", "out.gz").invoke()
+            mElapsed[name] = time.perf_counter() - timeBegin
+            os.chdir(dirTemp)
+
+    for name, elapsed in mElapsed.items():
+        print(F"{name:>8}: {elapsed*1000:8.1f} ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright 2024-2025, Hojin Koh
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+# Benchmark: checking whether many Steps are up to date, one by one vs in bulk
+# Usage: python bench/bench_check.py [nSteps=500] [nDirs=10] [nJobs=8] [latencyMs=0]
+#
+# Each Step reads one shared file and one of its own, and writes one file,
+# spread over nDirs directories. All are up to date. "serial" calls needed()
+# of each in turn, "bulk" uses checkNeeded() with its StatCache. Also counts
+# how many os.stat() and os.scandir() calls each one made.
+#
+# latencyMs adds a delay to each of those calls, as a round trip to a network
+# filesystem would. The stat() of entries from a listing are left as they are,
+# as the listing usually brings their attributes along (NFS READDIRPLUS).
+
+import os
+import sys
+import tempfile
+import time
+from typing import Any
+
+from Skritt import Step
+from Skritt.runner import checkNeeded
+
+class Derive(Step):
+    def __init__(self, *args: str) -> None:
+        super().__init__(*args)
+        self.getParser("Derive").add_argument("shared")
+        self.getParser("Derive").add_argument("input")
+        self.getParser("Derive").add_argument("output")
+
+    def inputs(self) -> tuple[str, ...]:
+        return (self.args.shared, self.args.input)
+
+    def outputs(self) -> tuple[str, ...]:
+        return (self.args.output,)
+
+    def main(self) -> int:
+        with open(self.args.output, 'w') as fp:
+            fp.write(open(self.args.input).read())
+        return 0
+
+class Counter:
+    def __init__(self, func: Any, latency: float) -> None:
+        self.func = func
+        self.latency = latency
+        self.n = 0
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        self.n += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return self.func(*args, **kwargs)
+
+def main() -> None:
+    nSteps = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    nDirs = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    nJobs = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+    latency = float(sys.argv[4]) / 1000 if len(sys.argv) > 4 else 0.0
+    with tempfile.TemporaryDirectory() as dirTemp:
+        os.environ['SKRITT_STAMPDB'] = os.path.join(dirTemp, "stamp.db")
+        os.environ['SKRITT_HISTORYDB'] = ""
+        pathShared = os.path.join(dirTemp, "shared")
+        with open(pathShared, 'w') as fp:
+            fp.write("shared")
+        def makeSteps() -> list[Derive]:
+            aSteps = []
+            for i in range(nSteps):
+                dirStep = os.path.join(dirTemp, F"d{i % nDirs}")
+                os.makedirs(dirStep, exist_ok=True)
+                pathIn = os.path.join(dirStep, F"in{i}")
+                if not os.path.exists(pathIn):
+                    with open(pathIn, 'w') as fp:
+                        fp.write(str(i))
+                aSteps.append(Derive("--notitle", pathShared, pathIn, os.path.join(dirStep, F"out{i}")))
+            return aSteps
+        for step in makeSteps():
+            step.invoke()
+
+        mResult: dict[str, tuple[float, int, int]] = {}
+        for name in ("serial", "bulk"):
+            aSteps = makeSteps()
+            stat, scandir = Counter(os.stat, latency), Counter(os.scandir, latency)
+            os.stat, os.scandir = stat, scandir
+            try:
+                timeBegin = time.perf_counter()
+                if name == "serial":
+                    for step in aSteps:
+                        step.parseArgs()
+                        assert not step.needed()
+                else:
+                    assert not any(checkNeeded(aSteps, nJobs))
+                mResult[name] = (time.perf_counter() - timeBegin, stat.n, scandir.n)
+            finally:
+                os.stat, os.scandir = stat.func, scandir.func
+
+    for name, (elapsed, nStat, nScandir) in mResult.items():
+        print(F"{name:>8}: {elapsed*1000:8.1f} ms, {nStat:6d} stat(), {nScandir:4d} scandir()")
+
+if __name__ == '__main__':
+    main()
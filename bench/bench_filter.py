@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright 2024-2025, Hojin Koh
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Benchmark: a trivial per-line transform as a sed process vs a python filter stage
+# Usage: python bench/bench_filter.py [nLines=5000000]
+
+from collections.abc import Iterable, Iterator
+
+import asyncio
+import sys
+import time
+
+from Skritt.logging import ResourceLogger
+from Skritt.subprocess import shellrun, TypeStage
+
+def prefix(aLines: Iterator[bytes]) -> Iterable[bytes]:
+    for line in aLines:
+        yield b"utt-" + line
+
+def measure(nLines: int, stage: TypeStage) -> tuple[float, float]:
+    timeBegin = time.perf_counter()
+    result = asyncio.run(shellrun(ResourceLogger().logger, (
+        ('seq', str(nLines)), stage, ('wc', '-l'),
+        ), stdout='/dev/null'))
+    elapsed = time.perf_counter() - timeBegin
+    cpu = sum(s.utime + s.stime for s in result.aStages)
+    return nLines / elapsed, cpu
+
+def main() -> None:
+    nLines = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000_000
+    resLogging = ResourceLogger()
+    resLogging.removeSink(resLogging.hStderr)
+    print(F"lines: {nLines}")
+    for name, stage in (('sed', ('sed', 's/^/utt-/')), ('python', prefix)):
+        speed, cpu = measure(nLines, stage)
+        print(F"{name:8s} {speed:12.0f} lines/s  cpu {cpu:.2f}s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright 2024-2025, Hojin Koh
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Benchmark: cold vs warm (through the Skritt server) invocations of a trivial Step
+# Usage: python bench/bench_forkserver.py [nRuns=30]
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+SCRIPT = '''
+import sys
+from Skritt import Step
+
+class Trivial(Step):
+    def main(self) -> int:
+        return 0
+
+sys.exit(Trivial(*sys.argv[1:]).invoke())
+'''
+
+def measure(aCmd: list[str], nRuns: int, env: dict[str, str]) -> float:
+    timeBegin = time.perf_counter()
+    for _ in range(nRuns):
+        subprocess.run(aCmd, env=env, check=True, stderr=subprocess.DEVNULL)
+    return (time.perf_counter() - timeBegin) / nRuns
+
+def main() -> None:
+    nRuns = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    dirRoot = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with tempfile.TemporaryDirectory() as dirTemp:
+        pathScript = os.path.join(dirTemp, "trivial.py")
+        with open(pathScript, 'w') as fp:
+            fp.write(SCRIPT)
+        env = dict(os.environ, PYTHONPATH=dirRoot, SKRITT_SOCKET=os.path.join(dirTemp, "skritt.sock"))
+        procServer = subprocess.Popen([sys.executable, '-m', 'Skritt.server'], env=env)
+        try:
+            while not os.path.exists(env['SKRITT_SOCKET']):
+                time.sleep(0.05)
+            aCases = (
+                    ('cold', [sys.executable, pathScript, '--notitle']),
+                    ('warm', [sys.executable, os.path.join(dirRoot, 'Skritt', 'client.py'), pathScript, '--notitle']),
+                    ('warm -m', [sys.executable, '-m', 'Skritt.client', pathScript, '--notitle']),
+                    )
+            for name, aCmd in aCases:
+                print(F"{name:8s} {measure(aCmd, nRuns, env) * 1000:8.1f} ms/run")
+        finally:
+            procServer.terminate()
+            procServer.wait()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright 2024-2025, Hojin Koh
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Benchmark: hashing a directory of large files, read() loop vs HashService
+# Usage: python bench/bench_hashing.py [nFiles=8] [sizeMiB=256]
+
+from collections.abc import Callable
+
+import hashlib
+import os
+import sys
+import tempfile
+import time
+
+from Skritt.hashing import HashService
+
+def hashReadLoop(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as fp:
+        while data := fp.read(1 << 16):
+            h.update(data)
+    return h.hexdigest()
+
+def timeit(name: str, nBytes: int, func: Callable[[], object]) -> None:
+    timeBegin = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - timeBegin
+    print(F"{name:24s} {elapsed:8.3f}s {nBytes/elapsed/(1<<20):10.1f} MiB/s")
+
+def main() -> None:
+    nFiles = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    size = (int(sys.argv[2]) if len(sys.argv) > 2 else 256) << 20
+    with tempfile.TemporaryDirectory() as dirTemp:
+        aPaths = [os.path.join(dirTemp, F"feats{i}.ark") for i in range(nFiles)]
+        block = os.urandom(1 << 20)
+        for path in aPaths:
+            with open(path, 'wb') as fp:
+                for _ in range(size >> 20):
+                    fp.write(block)
+        print(F"{nFiles} files x {size>>20} MiB, {os.cpu_count()} CPUs (page cache warm)")
+
+        service = HashService()
+        timeit("read() loop", nFiles*size, lambda: [hashReadLoop(p) for p in aPaths])
+        timeit("HashService", nFiles*size, lambda: service.hashFiles(aPaths))
+
+        mPrev = {path: result[1:] for path, result in service.hashFiles(aPaths).items()}
+        for path in aPaths:
+            with open(path, 'ab') as fp:
+                fp.write(block)
+        timeit("HashService, appended", nFiles*size, lambda: service.hashFiles(aPaths, mPrev))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright 2024-2025, Hojin Koh
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+# Benchmark: creating many Steps carrying many hooks, and running their lifecycles
+# Usage: python bench/bench_hooks.py [nSteps=10000] [nHooks=32]
+#
+# "instance" registers every hook with addHook() in __init__; "declared" has
+# them declared with @hook, compiled once for the class.
+
+import sys
+import time
+from collections.abc import Callable
+
+from Skritt.base import StepBase, hook
+
+LIFECYCLES = ("pre-parse", "post-parse", "pre-run", "post-run")
+
+def noop(step: StepBase) -> None:
+    pass
+
+def makeNoop() -> Callable[[StepBase], None]:
+    def noop(step: StepBase) -> None:
+        pass
+    return noop
+
+def makeClasses(nHooks: int) -> tuple[type[StepBase], type[StepBase]]:
+    class InstanceStep(StepBase):
+        def __init__(self, *args: str) -> None:
+            super().__init__(*args)
+            for i in range(nHooks):
+                self.addHook(LIFECYCLES[i % len(LIFECYCLES)], F"hook{i}", noop, atBegin=(i % 2 == 0))
+        def main(self) -> int:
+            return 0
+
+    mAttrs: dict[str, object] = {'main': lambda self: 0}
+    for i in range(nHooks):
+        mAttrs[F"hook{i}"] = hook(LIFECYCLES[i % len(LIFECYCLES)], priority=-i if i % 2 == 0 else 0)(makeNoop())
+    DeclaredStep = type("DeclaredStep", (StepBase,), mAttrs)
+    return InstanceStep, DeclaredStep
+
+def run(cls: type[StepBase], nSteps: int) -> float:
+    timeStart = time.perf_counter()
+    for _ in range(nSteps):
+        step = cls()
+        for nameLifecycle in LIFECYCLES:
+            step.invokeLifecycle(nameLifecycle)
+    return time.perf_counter() - timeStart
+
+def main() -> None:
+    nSteps = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    nHooks = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    for cls in makeClasses(nHooks):
+        run(cls, 100)
+        timeTotal = run(cls, nSteps)
+        print(F"{cls.__name__:>13}: {timeTotal*1e6/nSteps:6.1f} us/step ({nHooks} hooks, {nSteps} steps)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright 2024-2025, Hojin Koh
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Benchmark: a saturated pipeline logging to a file, synchronous vs buffered sink
+# Usage: python bench/bench_logsink.py [nLines=2000000] [directory for the log file]
+# Point the directory at the slow (e.g. network) storage to be evaluated.
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from Skritt.logging import ResourceLogger, TypePolicy
+from Skritt.subprocess import shellrun
+
+def measure(dirLog: str, nLines: int, policy: TypePolicy | None) -> float:
+    resLogging = ResourceLogger()
+    pathLog = os.path.join(dirLog, F"bench-{policy}.log")
+    timeBegin = time.perf_counter()
+    handle = resLogging.setFile(pathLog, policy)
+    asyncio.run(shellrun(resLogging.logger, (
+        ('sh', '-c', F'yes "LOG: processed utterance spk001-utt0042 frames=1234" | head -n {nLines}'),
+        )))
+    resLogging.removeSink(handle) # Includes draining the buffer
+    elapsed = time.perf_counter() - timeBegin
+    os.unlink(pathLog)
+    return nLines / elapsed
+
+def main() -> None:
+    nLines = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    resLogging = ResourceLogger()
+    resLogging.removeSink(resLogging.hStderr)
+    with tempfile.TemporaryDirectory(dir=sys.argv[2] if len(sys.argv) > 2 else None) as dirLog:
+        print(F"lines: {nLines}, log in {dirLog}")
+        for policy in (None, 'block', 'drop-oldest'):
+            print(F"{policy or 'sync':12s} {measure(dirLog, nLines, policy):12.0f} lines/s")
+
+if __name__ == '__main__':
+    main()
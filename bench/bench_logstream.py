@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright 2024-2025, Hojin Koh
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Benchmark: lines/sec of subprocess log ingestion, per-line readline vs chunked
+# Usage: python bench/bench_logstream.py [nLines=10000000]
+
+import asyncio
+import sys
+import time
+
+from Skritt.logging import ResourceLogger, TypeLogger
+from Skritt.subprocess import shellrun, LogLimit
+import Skritt.subprocess
+
+async def logStreamReadline(logger: TypeLogger, stream: asyncio.StreamReader | None, pid: int, limit: LogLimit | None = None) -> None:
+    """The original per-line implementation, for comparison"""
+    if stream is not None:
+        while line := await stream.readline():
+            logger.log(22, "({:d}) {}", pid, line.decode().strip())
+
+def measure(nLines: int) -> float:
+    resLogging = ResourceLogger()
+    timeBegin = time.perf_counter()
+    asyncio.run(shellrun(resLogging.logger, (
+        ('sh', '-c', F'yes "LOG: processed utterance spk001-utt0042 frames=1234" | head -n {nLines}'),
+        )))
+    return nLines / (time.perf_counter() - timeBegin)
+
+def main() -> None:
+    nLines = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    resLogging = ResourceLogger()
+    resLogging.removeSink(resLogging.hStderr)
+    resLogging.setFile('/dev/null')
+
+    logStreamChunked = Skritt.subprocess.logStream
+    Skritt.subprocess.logStream = logStreamReadline
+    rateBefore = measure(nLines)
+    Skritt.subprocess.logStream = logStreamChunked
+    rateAfter = measure(nLines)
+
+    print(F"lines:    {nLines}")
+    print(F"readline: {rateBefore:12.0f} lines/s")
+    print(F"chunked:  {rateAfter:12.0f} lines/s ({rateAfter/rateBefore:.2f}x)")
+
+if __name__ == '__main__':
+    main()
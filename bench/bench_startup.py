@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright 2024-2025, Hojin Koh
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Benchmark: startup time of the Skritt package, and of a trivial Step's --check
+# Usage: python bench/bench_startup.py [nRuns=20]
+#
+# Times are the best of nRuns fresh interpreters, and how much that is above
+# a bare `python -c pass`. tests/test_startup.py enforces a budget on the
+# overhead of --check.
+
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SCRIPT = '''
+import sys
+from Skritt import Step
+
+class Trivial(Step):
+    def main(self) -> int:
+        return 0
+
+sys.exit(Trivial(*sys.argv[1:]).invoke())
+'''
+
+def measure(aCmd: list[str], nRuns: int) -> list[float]:
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    aTimes = []
+    for _ in range(nRuns):
+        timeBegin = time.perf_counter()
+        subprocess.run(aCmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        aTimes.append(time.perf_counter() - timeBegin)
+    return aTimes
+
+def main() -> None:
+    nRuns = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    with tempfile.TemporaryDirectory() as dirTemp:
+        pathScript = os.path.join(dirTemp, "trivial.py")
+        with open(pathScript, 'w') as fp:
+            fp.write(SCRIPT)
+        aCases = (
+                ('python -c pass', [sys.executable, '-c', 'pass']),
+                ('import Skritt', [sys.executable, '-c', 'import Skritt']),
+                ('import Step', [sys.executable, '-c', 'from Skritt import Step']),
+                ('import everything', [sys.executable, '-c', 'import Skritt.step, Skritt.runner, Skritt.subprocess, Skritt.scheduler, Skritt.stamp, loguru']),
+                ('--help', [sys.executable, pathScript, '--help']),
+                ('--check --notitle', [sys.executable, pathScript, '--check', '--notitle']),
+                ('--check', [sys.executable, pathScript, '--check']),
+                ('run', [sys.executable, pathScript]),
+                )
+        base = 0.0
+        for name, aCmd in aCases:
+            aTimes = measure(aCmd, nRuns)
+            base = base or min(aTimes)
+            print(F"{name:20s} best {min(aTimes)*1000:7.1f} ms  median {statistics.median(aTimes)*1000:7.1f} ms  overhead {(min(aTimes)-base)*1000:7.1f} ms")
+
+if __name__ == '__main__':
+    main()
@@ -17,6 +17,7 @@
 # Tests related to argparse functionality in StepBase
 
 from argparse import Namespace
+from concurrent.futures import ThreadPoolExecutor
 
 from Skritt.base import StepBase
 
@@ -76,3 +77,63 @@ def test_no_arguments_handled_correctly() -> None:
     step.parseArgs()
     assert isinstance(step.args, Namespace)
     assert vars(step.args) == {}
+
+class ArgStep(MockStep):
+    def __init__(self, *args: str, choices: tuple[str, ...] = ('a', 'b')) -> None:
+        super().__init__(*args)
+        self.getParser().add_argument("--mode", choices=choices, default='a')
+        self.getParser("ArgStep").add_argument("input")
+
+def test_parser_shared() -> None:
+    """
+    Steps of the same class defining the same arguments share one parser.
+    """
+    step1 = ArgStep("x", "--mode", "b")
+    step2 = ArgStep("y")
+    step1.parseArgs()
+    step2.parseArgs()
+    assert (step1.args.input, step1.args.mode) == ("x", "b")
+    assert (step2.args.input, step2.args.mode) == ("y", "a")
+    assert step1.getParserShared() is step2.getParserShared()
+    assert step1.getArgumentDests() == {'mode'}
+    assert step1.getArgumentDests("ArgStep") == {'input'}
+
+def test_parser_shared_different_definitions() -> None:
+    """
+    Arguments defined differently from one Step to another don't get mixed up.
+    """
+    step1 = ArgStep("x", "--mode", "c", choices=('c',))
+    step2 = ArgStep("y")
+    step1.parseArgs()
+    assert step1.args.mode == "c"
+    assert step1.getParserShared() is not step2.getParserShared()
+
+def test_parser_detached() -> None:
+    """
+    Using argparse objects directly gives the Step a parser of its own, still
+    including the arguments defined so far and after.
+    """
+    step = ArgStep("x")
+    step.getParser("ArgStep").set_defaults(extra=1)
+    step.getParser("ArgStep").add_argument("--later", default="l")
+    step.parseArgs()
+    assert (step.args.input, step.args.extra, step.args.later) == ("x", 1, "l")
+    assert step.getArgumentDests("ArgStep") == {'input', 'later'}
+
+    step2 = ArgStep("y")
+    step2.parser.add_argument("--direct", default="d")
+    step2.parseArgs()
+    assert step2.args.direct == "d"
+    assert ArgStep("z").parserOwn is None and step2.parserOwn is not None
+
+def test_parser_shared_threads() -> None:
+    """
+    Parsing with a shared parser from many threads at once.
+    """
+    def parse(i: int) -> str:
+        step = ArgStep(str(i), "--mode", "b")
+        step.parseArgs()
+        assert step.args.mode == "b"
+        return str(step.args.input)
+    with ThreadPoolExecutor(8) as executor:
+        assert list(executor.map(parse, range(200))) == [str(i) for i in range(200)]
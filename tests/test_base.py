@@ -16,6 +16,8 @@
 
 # Tests related to basic running flow
 
+import asyncio
+
 import pytest
 
 from Skritt.base import StepBase
@@ -71,3 +73,20 @@ def test_invoke_return_no_main_called() -> None:
     assert result == 0
     assert step.main_called is False
     assert step.cleanup_called is True # At invoke level, cleanup should always be called
+
+def test_invoke_async_main() -> None:
+    """Test an `async def main` is run to completion and its result returned."""
+    class AsyncStep(StepBase):
+        async def main(self) -> int:
+            await asyncio.sleep(0)
+            return 7
+
+    assert AsyncStep().invoke() == 7
+
+def test_invoke_main_returning_none() -> None:
+    """Test a main() returning something else than an int still has it passed on."""
+    class NoneStep(StepBase):
+        def main(self) -> int:
+            return None # type: ignore[return-value]
+
+    assert NoneStep().invoke() is None
@@ -18,7 +18,7 @@
 
 import pytest
 
-from Skritt.base import StepBase, TypeHookFunc
+from Skritt.base import StepBase, TypeHookFunc, hook
 
 class MockStep(StepBase):
     """Mock subclass for testing the hook system in StepBase."""
@@ -114,3 +114,66 @@ def test_hooks_at_beginning(step: MockStep) -> None:
 
     step.invokeLifecycle(nameLifecycle)
     assert step.stateTest == [nameHook1, nameHook2]
+
+class DeclaredStep(MockStep):
+    """Mock subclass declaring hooks at class level."""
+    @hook("prerun")
+    def prepare(self) -> None:
+        self.stateTest.append("prepare")
+
+    @hook("prerun", priority=-10)
+    def early(self) -> None:
+        self.stateTest.append("early")
+
+    @hook("cleanup", name="tidy")
+    @hook("prerun", priority=10)
+    def tidy(self) -> None:
+        self.stateTest.append("tidy")
+
+class DerivedStep(DeclaredStep):
+    """Subclass adding, overriding and re-declaring hooks."""
+    @hook("prerun")
+    def prepareMore(self) -> None:
+        self.stateTest.append("prepareMore")
+
+    def prepare(self) -> None:
+        self.stateTest.append("prepare2")
+
+    @hook("prerun", priority=-20)
+    def tidy(self) -> None:
+        self.stateTest.append("tidy2")
+
+def test_declared_hooks() -> None:
+    """
+    Test that hooks declared with @hook run by priority, then in declaration order.
+    """
+    step = DeclaredStep()
+    step.invokeLifecycle("prerun")
+    assert step.stateTest == ["early", "prepare", "tidy"]
+    assert [name for name, _ in step.listHooks("cleanup")] == ["tidy"]
+    assert sorted(step.listLifecycles()) == ["cleanup", "prerun"]
+
+def test_declared_hooks_inherited() -> None:
+    """
+    Test that hooks are merged along the MRO: overriden methods stay hooked, and
+    re-declared ones take their new place.
+    """
+    step = DerivedStep()
+    step.invokeLifecycle("prerun")
+    assert step.stateTest == ["tidy2", "early", "prepare2", "prepareMore"]
+    assert list(step.listLifecycles()) == ["prerun"]
+    assert list(DeclaredStep().listHooks("cleanup"))
+
+def test_instance_hooks_copy_on_write() -> None:
+    """
+    Test that hooks added to an instance don't affect the class or other instances.
+    """
+    step1 = DeclaredStep()
+    step2 = DeclaredStep()
+    step1.addHook("prerun", "first", getMockHook("first"), atBegin=True)
+    step1.addHook("prerun", "last", getMockHook("last"))
+    assert step2.mLifecycle is DeclaredStep.mLifecycleClass
+    step1.invokeLifecycle("prerun")
+    step2.invokeLifecycle("prerun")
+    assert step1.stateTest == ["first", "early", "prepare", "tidy", "last"]
+    assert step2.stateTest == ["early", "prepare", "tidy"]
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright 2024-2025, Hojin Koh
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Tests related to running manifests of Step invocations in one process
+
+from pathlib import Path
+
+import io
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from Skritt.batch import Invocation, checkBatch, loadClass, parseManifest, runBatch
+from Skritt.scheduler import ResourceScheduler
+
+DIR_ROOT = Path(__file__).parent.parent
+
+MODULE = '''
+import os
+from Skritt import Step
+
+class Touch(Step):
+    """Create a file, failing if asked to"""
+    def __init__(self, *args: str) -> None:
+        super().__init__(*args)
+        self.getParser("Touch").add_argument("path")
+        self.getParser("Touch").add_argument("--rtn", type=int, default=0)
+
+    def main(self) -> int:
+        open(self.args.path, "w").close()
+        return self.args.rtn
+
+    class Inner(Step):
+        def main(self) -> int:
+            return 0
+
+class Stamped(Touch):
+    """Create a file, unless already there"""
+    def outputs(self) -> tuple[str, ...]:
+        return (self.args.path,)
+'''
+
+@pytest.fixture
+def pathModule(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    (tmp_path / "batchsteps.py").write_text(MODULE)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+def test_parse_manifest() -> None:
+    aLines = [
+            '# comment\n',
+            '{"step": "a.B", "args": ["x", 1]}\n',
+            '\n',
+            '["a:B", "y"]\n',
+            'a.B\tz\t--flag\n',
+            'a.B\n',
+            ]
+    assert list(parseManifest(aLines)) == [
+            Invocation(2, "a.B", ["x", "1"]),
+            Invocation(4, "a:B", ["y"]),
+            Invocation(5, "a.B", ["z", "--flag"]),
+            Invocation(6, "a.B", []),
+            ]
+    with pytest.raises(ValueError, match="Line 1"):
+        list(parseManifest(['{"args": []}']))
+    with pytest.raises(ValueError, match="Line 2"):
+        list(parseManifest(['a.B', '{not json']))
+
+def test_load_class(pathModule: Path) -> None:
+    assert loadClass("batchsteps.Touch").__name__ == "Touch"
+    assert loadClass("batchsteps:Touch.Inner").__name__ == "Inner"
+    with pytest.raises(TypeError):
+        loadClass("os.path")
+
+def test_run_batch(pathModule: Path) -> None:
+    """Invocations all run, and a failing one, even through argparse, doesn't stop the others"""
+    aLines = [
+            '{"step": "batchsteps.Touch", "args": ["a", "--notitle"]}',
+            'batchsteps.Touch\tb\t--rtn\t3\t--notitle',
+            '["batchsteps.Touch", "--no-such-option"]',
+            '["batchsteps:Touch", "c", "--notitle"]',
+            ]
+    assert runBatch(aLines, 2, "summary.jsonl") != 0
+    assert all(os.path.exists(name) for name in "abc")
+
+    aSummary = [json.loads(line) for line in open("summary.jsonl")]
+    assert [(r['line'], r['returncode']) for r in aSummary] == [(1, 0), (2, 3), (3, 2), (4, 0)]
+    assert aSummary[1]['args'] == ["b", "--rtn", "3", "--notitle"]
+    assert all(r['elapsed'] >= 0 for r in aSummary)
+
+    assert runBatch(aLines[:1], 1, "summary.tsv") == 0
+    assert open("summary.tsv").read().split('\t')[:3] == ["1", "batchsteps.Touch", "0"]
+
+def test_batch_owns_settings(pathModule: Path) -> None:
+    """Only the batch sets the pipeline limit and the profile, not one of its lines"""
+    aLines = [
+            '["batchsteps.Touch", "a", "--notitle", "--jobs", "1"]',
+            '["batchsteps.Touch", "b", "--notitle", "--profile", "mine.json"]',
+            '["batchsteps.Touch", "c", "--notitle"]',
+            ]
+    assert runBatch(aLines, 1, "summary.jsonl", nPipelines=3, pathProfile="profile.json") == 2
+    assert [json.loads(line)['returncode'] for line in open("summary.jsonl")] == [2, 2, 0]
+    assert not os.path.exists("a") and not os.path.exists("b") and os.path.exists("c")
+    assert ResourceScheduler().nJobs == 3
+    assert os.path.exists("profile.json") and not os.path.exists("mine.json")
+
+def test_check_batch(pathModule: Path) -> None:
+    aLines = ['batchsteps.Stamped\ta\t--notitle', 'batchsteps.Stamped\tb\t--notitle']
+    assert runBatch(aLines[:1]) == 0
+    fp = io.StringIO()
+    assert checkBatch(aLines, 2, fp) == 0
+    assert fp.getvalue() == "2\tbatchsteps.Stamped\tb\t--notitle\n"
+    assert runBatch(aLines) == 0
+    fp = io.StringIO()
+    assert checkBatch(aLines, 2, fp) == 1
+    assert fp.getvalue() == ""
+
+def test_batch_main(pathModule: Path) -> None:
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join((str(DIR_ROOT), str(pathModule))))
+    proc = subprocess.run(
+            [sys.executable, '-m', 'Skritt.batch', '-', '--jobs', '2'],
+            input='batchsteps.Touch\td\n["batchsteps.Touch", "e"]\n', text=True, env=env,
+            )
+    assert proc.returncode == 0
+    assert os.path.exists("d") and os.path.exists("e")
+
+    proc = subprocess.run(
+            [sys.executable, '-m', 'Skritt.batch', '-'],
+            input='batchsteps.Nothing\tf\n', text=True, env=env, stderr=subprocess.PIPE,
+            )
+    assert proc.returncode == 2
+    assert "Line 1" in proc.stderr
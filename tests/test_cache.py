@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright 2024-2025, Hojin Koh
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+# Tests related to the content-addressed output cache
+
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import multiprocessing
+import os
+
+import pytest
+
+from Skritt import Step
+from Skritt.cache import ResourceCache, cloneFile
+
+@pytest.fixture(autouse=True)
+def cachedir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv('SKRITT_CACHEDIR', str(tmp_path / "cache"))
+
+class UpperStep(Step):
+    """Upper-case the input into the output, counting how many times it really ran"""
+    def __init__(self, *args: str) -> None:
+        super().__init__("--notitle", "--cache", *args)
+        self.getParser("UpperStep").add_argument("input")
+        self.getParser("UpperStep").add_argument("output")
+        self.nRun = 0
+
+    def inputs(self) -> Sequence[str]:
+        return (self.args.input,)
+
+    def outputs(self) -> Sequence[str]:
+        return (self.args.output,)
+
+    def main(self) -> int:
+        self.nRun += 1
+        Path(self.args.output).write_text(Path(self.args.input).read_text().upper())
+        return 0
+
+def makeDir(path: Path, text: str) -> Path:
+    path.mkdir()
+    (path / "in.txt").write_text(text)
+    return path
+
+def runIn(path: Path, *args: str) -> UpperStep:
+    """Run with the same arguments, from a different directory each time"""
+    cwd = os.getcwd()
+    os.chdir(path)
+    try:
+        step = UpperStep(*args, "in.txt", "out.txt")
+        assert step.invoke() == 0
+    finally:
+        os.chdir(cwd)
+    return step
+
+def test_restore_elsewhere(tmp_path: Path) -> None:
+    assert runIn(makeDir(tmp_path / "a", "abc")).nRun == 1
+    pathB = makeDir(tmp_path / "b", "abc")
+    assert runIn(pathB).nRun == 0
+    assert (pathB / "out.txt").read_text() == "ABC"
+    assert runIn(pathB).nRun == 0 # Stamped as up to date after restoring
+    assert runIn(makeDir(tmp_path / "c", "xyz")).nRun == 1
+
+def test_force_skips_restore(tmp_path: Path) -> None:
+    runIn(makeDir(tmp_path / "a", "abc"))
+    assert runIn(makeDir(tmp_path / "b", "abc"), "--force").nRun == 1
+
+def test_restored_is_independent(tmp_path: Path) -> None:
+    runIn(makeDir(tmp_path / "a", "abc"))
+    pathB = makeDir(tmp_path / "b", "abc")
+    runIn(pathB)
+    with open(pathB / "out.txt", 'a') as fp: # Changing a restored output in place
+        fp.write("!")
+    pathC = makeDir(tmp_path / "c", "abc")
+    assert runIn(pathC).nRun == 0
+    assert (pathC / "out.txt").read_text() == "ABC"
+
+def test_changed_source_not_restored(tmp_path: Path) -> None:
+    pathA = makeDir(tmp_path / "a", "abc")
+    runIn(pathA)
+    with open(pathA / "out.txt", 'a') as fp: # May be the very same file as in the store
+        fp.write("!")
+    pathB = makeDir(tmp_path / "b", "abc")
+    assert runIn(pathB).nRun == 1
+    assert (pathB / "out.txt").read_text() == "ABC"
+
+def test_lru_eviction(tmp_path: Path) -> None:
+    cache = ResourceCache(str(tmp_path / "lru"), sizeMax=25)
+    aPaths = []
+    for i in range(3):
+        path = tmp_path / F"f{i}"
+        path.write_text(str(i) * 10)
+        aPaths.append(str(path))
+    cache.store("k0", aPaths[0:1], ["h0"])
+    cache.store("k1", aPaths[1:2], ["h1"])
+    assert cache.restore("k0", [str(tmp_path / "r0")]) # k1 is now the least recently used
+    cache.store("k2", aPaths[2:3], ["h2"])
+    assert cache.getSize() == 20
+    assert not cache.restore("k1", [str(tmp_path / "r1")])
+    assert cache.restore("k0", [str(tmp_path / "r0")])
+    assert cache.restore("k2", [str(tmp_path / "r2")])
+    assert (tmp_path / "r2").read_text() == "2" * 10
+    assert not os.path.exists(cache.getObjectPath("h1"))
+
+def test_shared_objects(tmp_path: Path) -> None:
+    cache = ResourceCache(str(tmp_path / "shared"), sizeMax=15)
+    path = tmp_path / "f"
+    path.write_text("x" * 10)
+    cache.store("k0", [str(path)], ["h"])
+    cache.store("k1", [str(path)], ["h"])
+    assert cache.getSize() == 10 # Stored once
+    cache.removeEntry(cache.getConn(), "k0")
+    assert cache.restore("k1", [str(tmp_path / "r")])
+
+def test_clone_file(tmp_path: Path) -> None:
+    path = tmp_path / "src"
+    path.write_bytes(b"data")
+    path.chmod(0o755)
+    assert cloneFile(str(path), str(tmp_path / "dst")) in ('reflink', 'copy')
+    assert (tmp_path / "dst").read_bytes() == b"data"
+    assert (tmp_path / "dst").stat().st_mode & 0o777 == 0o755
+    assert cloneFile(str(path), str(tmp_path / "link"), isLinkable=True) in ('reflink', 'hardlink')
+
+def storeAndRestore(pathCache: str, pathWork: str, iWorker: int) -> int:
+    """Store entries in a small cache shared with other processes, and restore them back"""
+    cache = ResourceCache(pathCache, sizeMax=2000)
+    nRestored = 0
+    for i in range(30):
+        text = F"{iWorker}-{i % 10}" * 50
+        path = os.path.join(pathWork, F"{iWorker}-{i}")
+        with open(path, 'w') as fp:
+            fp.write(text)
+        cache.store(F"k{text[:4]}", [path], [F"h{text[:4]}"])
+        pathRestore = path + ".restored"
+        if cache.restore(F"k{text[:4]}", [pathRestore]):
+            with open(pathRestore) as fp:
+                assert fp.read() == text
+            nRestored += 1
+    return nRestored
+
+def test_processes(tmp_path: Path) -> None:
+    pathCache = str(tmp_path / "procs")
+    with ProcessPoolExecutor(4, mp_context=multiprocessing.get_context('fork')) as executor:
+        aFutures = [executor.submit(storeAndRestore, pathCache, str(tmp_path), i) for i in range(4)]
+        aRestored = [future.result() for future in aFutures]
+    assert sum(aRestored) > 0
+    assert ResourceCache(pathCache).getSize() <= 2000
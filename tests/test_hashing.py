@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright 2024-2025, Hojin Koh
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Tests related to the file hashing service
+
+import mmap
+import os
+from pathlib import Path
+
+import pytest
+
+import Skritt.hashing
+from Skritt.hashing import HashService, hashBlocks
+
+@pytest.fixture(autouse=True)
+def smallBlocks(monkeypatch: pytest.MonkeyPatch) -> None:
+    # Small blocks, but still crossing mmap offset granularity
+    monkeypatch.setattr(Skritt.hashing, 'SIZE_BLOCK', mmap.ALLOCATIONGRANULARITY + 100)
+
+def test_same_content_same_digest(tmp_path: Path) -> None:
+    data = os.urandom(Skritt.hashing.SIZE_BLOCK * 5 + 7)
+    (tmp_path / "a").write_bytes(data)
+    (tmp_path / "b").write_bytes(data)
+    (tmp_path / "c").write_bytes(data[:-1] + b'x')
+    (tmp_path / "d").write_bytes(data + b'\0')
+    service = HashService(3, nBlocksPerJob=2)
+    mResult = service.hashFiles(str(tmp_path / name) for name in "abcd")
+    aDigests = [mResult[str(tmp_path / name)][0] for name in "abcd"]
+    assert aDigests[0] == aDigests[1]
+    assert len(set(aDigests)) == 3
+
+def test_empty_file(tmp_path: Path) -> None:
+    (tmp_path / "empty").write_bytes(b'')
+    service = HashService()
+    digest, size, blocks = service.hashFiles([str(tmp_path / "empty")])[str(tmp_path / "empty")]
+    assert size == 0
+    assert blocks == b''
+
+def test_blocks_match_direct_hash(tmp_path: Path) -> None:
+    import hashlib
+    data = os.urandom(Skritt.hashing.SIZE_BLOCK * 2 + 10)
+    path = tmp_path / "a"
+    path.write_bytes(data)
+    blocks = hashBlocks(str(path), len(data), 1, 3)
+    assert blocks[:32] == hashlib.sha256(data[Skritt.hashing.SIZE_BLOCK:Skritt.hashing.SIZE_BLOCK*2]).digest()
+    assert blocks[32:] == hashlib.sha256(data[Skritt.hashing.SIZE_BLOCK*2:]).digest()
+
+def test_incremental_append(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    path = str(tmp_path / "log")
+    with open(path, 'wb') as fp:
+        fp.write(os.urandom(Skritt.hashing.SIZE_BLOCK * 3 + 50))
+    service = HashService(2, nBlocksPerJob=1)
+    _, size, blocks = service.hashFiles([path])[path]
+
+    with open(path, 'ab') as fp:
+        fp.write(os.urandom(Skritt.hashing.SIZE_BLOCK * 2))
+
+    aCalls: list[int] = []
+    def hashBlocksCounted(path: str, size: int, iBegin: int, iEnd: int) -> bytes:
+        aCalls.append(iBegin)
+        return hashBlocks(path, size, iBegin, iEnd)
+    monkeypatch.setattr(Skritt.hashing, 'hashBlocks', hashBlocksCounted)
+    digestIncremental = service.hashFile(path, (size, blocks))
+    assert min(aCalls) == 3 # The 3 complete blocks are not read again
+    assert digestIncremental == service.hashFile(path)
+
+def test_missing_file_left_out(tmp_path: Path) -> None:
+    (tmp_path / "a").write_bytes(b"abc")
+    mResult = HashService().hashFiles([str(tmp_path / "a"), str(tmp_path / "gone")])
+    assert list(mResult) == [str(tmp_path / "a")]
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright 2024-2025, Hojin Koh
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+# Tests related to the run time history, and how the Runner uses it
+
+from pathlib import Path
+
+import pytest
+
+from Skritt import Runner, Step
+from Skritt.history import ResourceHistory
+
+class NamedStep(Step):
+    """Step logging its name when it runs"""
+    def __init__(self, aLog: list[str], *args: str) -> None:
+        super().__init__(*args)
+        self.getParser("NamedStep").add_argument("name")
+        self.aLog = aLog
+
+    def main(self) -> int:
+        self.aLog.append(self.args.name)
+        return 0
+
+def test_estimate_median() -> None:
+    history = ResourceHistory()
+    for elapsed in (1.0, 3.0, 2.0):
+        history.record("k", "Step", elapsed, 0)
+    history.record("k", "Step", 100.0, 1) # Failed runs don't count
+    assert history.estimate("k") == 2.0
+    assert history.estimate("other") is None
+    assert history.estimateMany(["k", "other"]) == {"k": 2.0}
+
+def test_regression() -> None:
+    history = ResourceHistory()
+    for _ in range(history.N_MIN_REGRESSION - 1):
+        history.record("k", "Step", 1.0, 0)
+    assert history.getRegression("k", 10.0) is None # Not enough runs yet
+    history.record("k", "Step", 1.0, 0)
+    assert history.getRegression("k", 10.0) == (1.0, history.N_MIN_REGRESSION)
+    assert history.getRegression("k", 1.5) is None
+
+def test_disabled(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv('SKRITT_HISTORYDB', "")
+    history = ResourceHistory()
+    history.record("k", "Step", 1.0, 0)
+    assert history.estimate("k") is None
+
+def test_step_records() -> None:
+    aLog: list[str] = []
+    step = NamedStep(aLog, "--notitle", "a")
+    key = step.getHistoryKey() # Before parsing
+    assert step.invoke() == 0
+    assert step.getHistoryKey() == key
+    assert key is not None and "'a'" in key
+    assert len(ResourceHistory().getElapsed(key)) == 1
+    assert NamedStep(aLog, "--notitle", "b").getHistoryKey() != key
+    assert NamedStep(aLog, "--notitle", "b", "--debug").getHistoryKey() == NamedStep(aLog, "--notitle", "b").getHistoryKey()
+    assert NamedStep(aLog, "--no-such-option").getHistoryKey() is None
+
+def test_step_warns_regression(capfd: pytest.CaptureFixture[str]) -> None:
+    aLog: list[str] = []
+    key = NamedStep(aLog, "a").getHistoryKey()
+    assert key is not None
+    for _ in range(ResourceHistory.N_MIN_REGRESSION):
+        ResourceHistory().record(key, "NamedStep", 1e-9, 0)
+    NamedStep(aLog, "--notitle", "a").invoke()
+    assert "the median" not in capfd.readouterr().err # Much slower, but not by a whole second
+    ResourceHistory.ELAPSED_MIN_REGRESSION = 0.0
+    NamedStep(aLog, "--notitle", "a").invoke()
+    assert F"the median 0.000s of the last {ResourceHistory.N_MIN_REGRESSION+1} runs" in capfd.readouterr().err
+
+def test_longest_first() -> None:
+    aLog: list[str] = []
+    runner = Runner(1)
+    for name, elapsed in (("short", 1.0), ("long", 5.0), ("new", None)):
+        step = runner.add(NamedStep(aLog, "--notitle", name))
+        assert isinstance(step, NamedStep)
+        key = step.getHistoryKey()
+        if key is not None and elapsed is not None:
+            ResourceHistory().record(key, "NamedStep", elapsed, 0)
+    assert runner.run() == 0
+    assert aLog == ["long", "new", "short"] # Unknown ones are taken as typical: the median 3.0
+
+def test_longest_chain_first() -> None:
+    aLog: list[str] = []
+    runner = Runner(1)
+    mSteps = {name: NamedStep(aLog, "--notitle", name) for name in ("a", "b", "c")}
+    for name, elapsed in (("a", 1.0), ("b", 2.0), ("c", 2.0)):
+        key = mSteps[name].getHistoryKey()
+        assert key is not None
+        ResourceHistory().record(key, "NamedStep", elapsed, 0)
+    runner.add(mSteps["b"])
+    runner.add(mSteps["c"], (mSteps["a"],)) # a+c is longer than b
+    assert runner.run() == 0
+    assert aLog == ["a", "b", "c"]
+
+def test_estimate_remaining() -> None:
+    aLog: list[str] = []
+    runner = Runner(2)
+    aSteps = [NamedStep(aLog, "--notitle", str(i)) for i in range(4)]
+    runner.add(aSteps[1], (aSteps[0],))
+    runner.add(aSteps[2])
+    runner.add(aSteps[3])
+    runner.mEstimate = dict.fromkeys(aSteps, 2.0)
+    runner.mChain = {aSteps[0]: 4.0, aSteps[1]: 2.0, aSteps[2]: 2.0, aSteps[3]: 2.0}
+    assert runner.estimateRemaining(0.0) == 4.0 # 8s of work over 2 workers, and a 4s chain
+    runner.mStarted = {aSteps[0]: 0.0}
+    assert runner.estimateRemaining(1.0) == 3.5
+    runner.mReturn = {aSteps[0]: 0, aSteps[2]: 0}
+    assert runner.estimateRemaining(1.0) == 2.0 # Only the chain is left
+
+def test_unwritable(capfd: pytest.CaptureFixture[str], tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """A history that can't be written to is given up on with a warning, never failing a step"""
+    (tmp_path / "file").write_text("")
+    monkeypatch.setenv('SKRITT_HISTORYDB', str(tmp_path / "file" / "history.db"))
+    aLog: list[str] = []
+    runner = Runner(1)
+    runner.add(NamedStep(aLog, "--notitle", "a"))
+    assert runner.run() == 0
+    assert NamedStep(aLog, "--notitle", "b").invoke() == 0
+    assert aLog == ["a", "b"]
+    assert capfd.readouterr().err.count("Not using the run time history") == 1
+    assert not ResourceHistory().isEnabled()
@@ -19,7 +19,7 @@
 import re
 import tempfile
 
-from Skritt.logging import ResourceLogger
+from Skritt.logging import ResourceLogger, SinkBuffered
 
 import pytest
 
@@ -94,3 +94,38 @@ def test_remove_nonexistent_handler() -> None:
 
     with pytest.raises(ValueError):
         resLogging.removeSink(999999)
+
+def test_buffered_file_logging() -> None:
+    resLogging = ResourceLogger()
+
+    with tempfile.NamedTemporaryFile() as tmp:
+        handler_id = resLogging.setFile(tmp.name, 'block')
+        for i in range(1000):
+            resLogging.logger.debug("Buffered message {}", i)
+        resLogging.removeSink(handler_id) # Should drain everything
+
+        with open(tmp.name) as f:
+            content = f.read()
+            assert "Buffered message 0\n" in content
+            assert "Buffered message 999\n" in content
+            assert re.search(r"\d{8} \d{6} \[D\]", content)
+
+@pytest.mark.parametrize("policy, aKept, aLost", [
+    ('drop-oldest', ["m3", "m4"], ["m0", "m1", "m2"]),
+    ('summarize', ["m0", "m1"], ["m2", "m3", "m4"]),
+    ])
+def test_buffered_overflow(policy: str, aKept: list[str], aLost: list[str]) -> None:
+    with tempfile.NamedTemporaryFile() as tmp:
+        sink = SinkBuffered(tmp.name, policy, sizeQueue=2) # type: ignore[arg-type]
+        with sink.cond: # Keep the writer thread from taking anything meanwhile
+            for i in range(5):
+                sink.write(F"m{i}\n")
+        sink.stop()
+
+        with open(tmp.name) as f:
+            content = f.read()
+        for msg in aKept:
+            assert F"{msg}\n" in content
+        for msg in aLost:
+            assert F"{msg}\n" not in content
+        assert "dropped 3 messages" in content
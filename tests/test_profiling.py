@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright 2024-2025, Hojin Koh
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Tests related to lifecycle profiling
+
+import json
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from Skritt import Step
+from Skritt.profiling import ResourceProfiler
+
+class PipelineStep(Step):
+    def __init__(self, *args: str) -> None:
+        super().__init__(*args)
+        self.addHook('pre-run', 'prepare', lambda s: None)
+        self.addHook('cleanup', 'tidy', lambda s: None)
+
+    def main(self) -> int:
+        job = self.shellbg(('echo', 'bg'))
+        rtn = self.shellout(('echo', 'fg'), ('cat',))
+        return rtn + job.join()
+
+def loadTrace(path: Path) -> dict[str, Any]:
+    with open(path) as fp:
+        return dict(json.load(fp))
+
+def test_profile_flag(tmp_path: Path) -> None:
+    pathProfile = tmp_path / "profile.json"
+    assert PipelineStep("--profile", str(pathProfile)).invoke() == 0
+
+    trace = loadTrace(pathProfile)
+    aNames = {event['name'] for event in trace['traceEvents']}
+    for name in ("pre-parse", "parse", "post-parse", "needed", "pre-run", "main", "post-run", "cleanup()", "cleanup"):
+        assert F"PipelineStep::{name}" in aNames
+    assert "hook prepare" in aNames
+    assert "hook tidy" in aNames
+    assert "echo | cat" in aNames
+    assert "echo" in aNames
+    assert all(event['ph'] == 'X' and event['dur'] >= 0 for event in trace['traceEvents'])
+    assert trace['otherData']['summary']["PipelineStep::main"]['count'] == 1
+
+    # Processes are nested in their pipeline
+    aProcs = [event for event in trace['traceEvents'] if event['cat'] == 'process']
+    assert len(aProcs) == 3
+    assert {event['args']['returncode'] for event in aProcs} == {0}
+
+def test_profile_env(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    pathProfile = tmp_path / "profile.json"
+    monkeypatch.setenv('SKRITT_PROFILE', str(pathProfile))
+    assert PipelineStep().invoke() == 0
+    aNames = {event['name'] for event in loadTrace(pathProfile)['traceEvents']}
+    assert "PipelineStep::pre-parse" in aNames
+
+def test_disabled_by_default(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Nothing is timed, and no span is even named"""
+    def fail(*args: Any, **kwargs: Any) -> Any:
+        raise AssertionError("Profiling while disabled")
+    for name in ('spanEnabled', 'addSpan', 'addPipeline'):
+        monkeypatch.setattr(ResourceProfiler, name, fail)
+    assert PipelineStep().invoke() == 0
+    assert ResourceProfiler().aEvents == []
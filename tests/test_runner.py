@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright 2024-2025, Hojin Koh
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Tests related to running multiple Steps with dependencies
+
+import time
+
+import pytest
+
+from Skritt.base import StepBase
+from Skritt.runner import Runner
+
+class SleepStep(StepBase):
+    """Mock step recording when it ran"""
+    def __init__(self, aLog: list[str], name: str, sleep: float = 0.0, rtn: int = 0, needed: bool = True) -> None:
+        super().__init__()
+        self.aLog = aLog
+        self.name = name
+        self.sleep = sleep
+        self.rtn = rtn
+        self.isNeeded = needed
+
+    def needed(self) -> bool:
+        return self.isNeeded
+
+    def main(self) -> int:
+        self.aLog.append(F"begin {self.name}")
+        time.sleep(self.sleep)
+        self.aLog.append(F"end {self.name}")
+        return self.rtn
+
+def test_dependency_order() -> None:
+    aLog: list[str] = []
+    runner = Runner(4)
+    a = SleepStep(aLog, "a", 0.05)
+    b = SleepStep(aLog, "b")
+    c = SleepStep(aLog, "c")
+    runner.add(c, (a, b))
+    runner.add(b, (a,))
+    assert runner.run() == 0
+    assert aLog == ["begin a", "end a", "begin b", "end b", "begin c", "end c"]
+
+def test_independent_in_parallel() -> None:
+    aLog: list[str] = []
+    runner = Runner(2)
+    runner.add(SleepStep(aLog, "a", 0.2))
+    runner.add(SleepStep(aLog, "b", 0.2))
+    timeBegin = time.perf_counter()
+    assert runner.run() == 0
+    assert time.perf_counter() - timeBegin < 0.35
+    assert aLog[:2] == ["begin a", "begin b"]
+
+def test_not_needed_still_satisfies() -> None:
+    aLog: list[str] = []
+    runner = Runner()
+    a = SleepStep(aLog, "a", needed=False)
+    runner.add(SleepStep(aLog, "b"), (a,))
+    assert runner.run() == 0
+    assert aLog == ["begin b", "end b"]
+
+def test_failure_skips_downstream() -> None:
+    aLog: list[str] = []
+    runner = Runner(1)
+    a = SleepStep(aLog, "a", rtn=3)
+    b = runner.add(SleepStep(aLog, "b"), (a,))
+    c = runner.add(SleepStep(aLog, "c"), (b,))
+    d = runner.add(SleepStep(aLog, "d"))
+    assert runner.run() == 3
+    assert "begin b" not in aLog
+    assert "begin c" not in aLog
+    assert "end d" in aLog
+    assert runner.mReturn[c] == -1
+    assert runner.mReturn[d] == 0
+
+class ArgStep(SleepStep):
+    """Mock step parsing its own arguments"""
+    def __init__(self, aLog: list[str], name: str, *args: str) -> None:
+        super().__init__(aLog, name)
+        self.aCmdline = list(args)
+        self.getParser().add_argument("--value", type=int)
+
+def test_system_exit_fails_only_its_step() -> None:
+    aLog: list[str] = []
+    runner = Runner(1)
+    a = runner.add(ArgStep(aLog, "a", "--no-such-option"))
+    b = runner.add(SleepStep(aLog, "b"), (a,))
+    c = runner.add(ArgStep(aLog, "c", "--value", "1"))
+    assert runner.run() == 2
+    assert (runner.mReturn[a], runner.mReturn[b], runner.mReturn[c]) == (2, -1, 0)
+    assert "end c" in aLog
+
+def test_cycle() -> None:
+    aLog: list[str] = []
+    runner = Runner()
+    a = SleepStep(aLog, "a")
+    b = runner.add(SleepStep(aLog, "b"), (a,))
+    runner.add(a, (b,))
+    with pytest.raises(ValueError):
+        runner.run()
+
+def test_critical_path() -> None:
+    aLog: list[str] = []
+    runner = Runner(4)
+    a = SleepStep(aLog, "a", 0.1)
+    b = runner.add(SleepStep(aLog, "b", 0.1), (a,))
+    runner.add(SleepStep(aLog, "c", 0.01), (a,))
+    runner.add(SleepStep(aLog, "d", 0.01))
+    runner.run()
+    elapsed, aPath = runner.getCriticalPath(runner.sortSteps())
+    assert aPath == [a, b]
+    assert elapsed >= 0.2
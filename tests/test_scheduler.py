@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright 2024-2025, Hojin Koh
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Tests related to the background job scheduler
+
+from pathlib import Path
+
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from Skritt import Step
+from Skritt.scheduler import ResourceScheduler, TypeJobFunc
+
+def getJob(aLog: list[str], name: str, rtn: int = 0) -> TypeJobFunc:
+    async def job() -> int:
+        aLog.append(F"begin {name}")
+        await asyncio.sleep(0.05)
+        aLog.append(F"end {name}")
+        return rtn
+    return job
+
+def test_join_returns_exit_code() -> None:
+    res = ResourceScheduler()
+    aLog: list[str] = []
+    assert res.submit(getJob(aLog, "a", 3)).join() == 3
+
+def test_concurrency_limit() -> None:
+    res = ResourceScheduler()
+    res.setMaxJobs(1)
+    aLog: list[str] = []
+    aJobs = [res.submit(getJob(aLog, name)) for name in ("a", "b", "c")]
+    for job in aJobs:
+        job.join()
+    assert aLog == ["begin a", "end a", "begin b", "end b", "begin c", "end c"]
+
+def test_priority_order() -> None:
+    res = ResourceScheduler()
+    res.setMaxJobs(1)
+    aLog: list[str] = []
+    evt = threading.Event()
+    async def blocker() -> int:
+        await asyncio.to_thread(evt.wait)
+        return 0
+    jobBlocker = res.submit(blocker)
+    aJobs = [
+            res.submit(getJob(aLog, "low"), priority=-1),
+            res.submit(getJob(aLog, "normal1")),
+            res.submit(getJob(aLog, "high"), priority=5),
+            res.submit(getJob(aLog, "normal2")),
+            ]
+    evt.set()
+    jobBlocker.join()
+    for job in aJobs:
+        job.join()
+    assert [line for line in aLog if line.startswith("begin")] == [
+            "begin high", "begin normal1", "begin normal2", "begin low"]
+
+def test_exception_propagates() -> None:
+    async def bad() -> int:
+        raise RuntimeError("oops")
+    with pytest.raises(RuntimeError):
+        ResourceScheduler().submit(bad).join()
+
+class BgStep(Step):
+    def main(self) -> int:
+        aJobs = [self.shellbg(('sh', '-c', F'exit {i}')) for i in range(4)]
+        return sum(job.join() for job in aJobs)
+
+def test_shellbg_shares_one_loop() -> None:
+    nThreads = threading.active_count()
+    step = BgStep("--jobs", "2")
+    assert step.invoke() == 6
+    assert ResourceScheduler().nJobs == 2
+    assert threading.active_count() <= nThreads + 1 # Only the scheduler thread
+
+def test_unjoined_finish_at_exit(tmp_path: Path) -> None:
+    """A background pipeline nobody joined still completes before the process exits"""
+    script = '''
+from Skritt import Step
+
+class Forget(Step):
+    def main(self) -> int:
+        self.shellbg(('sh', '-c', 'sleep 0.5; echo done > done.txt'))
+        return 0
+
+Forget("--notitle").invoke()
+'''
+    env = dict(os.environ, PYTHONPATH=str(Path(__file__).parent.parent))
+    subprocess.run([sys.executable, '-c', script], cwd=tmp_path, env=env, check=True, timeout=30)
+    assert (tmp_path / "done.txt").read_text() == "done\n"
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright 2024-2025, Hojin Koh
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Tests related to the forking server and its thin client
+
+from collections.abc import Generator
+from pathlib import Path
+
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import pytest
+
+DIR_ROOT = Path(__file__).parent.parent
+
+SCRIPT = '''
+import os, sys
+from Skritt import Step
+
+class Trivial(Step):
+    def main(self) -> int:
+        print(os.getcwd(), os.environ.get("SKRITT_TEST"), *sys.argv[1:], sys.stdin.read().strip())
+        return int(os.environ.get("SKRITT_TEST_RTN", "0"))
+
+sys.exit(Trivial("--notitle").invoke())
+'''
+
+@pytest.fixture
+def env(tmp_path: Path) -> dict[str, str]:
+    (tmp_path / "trivial.py").write_text(SCRIPT)
+    return dict(os.environ, PYTHONPATH=str(DIR_ROOT), SKRITT_SOCKET=str(tmp_path / "skritt.sock"))
+
+@pytest.fixture
+def server(env: dict[str, str]) -> Generator[subprocess.Popen[bytes]]:
+    proc = subprocess.Popen([sys.executable, '-m', 'Skritt.server', '--preload', 'json'], env=env)
+    timeEnd = time.monotonic() + 20
+    while not os.path.exists(env['SKRITT_SOCKET']):
+        assert time.monotonic() < timeEnd and proc.poll() is None
+        time.sleep(0.05)
+    yield proc
+    proc.terminate()
+    assert proc.wait() == 0
+    assert not os.path.exists(env['SKRITT_SOCKET'])
+
+def runClient(env: dict[str, str], cwd: Path, *args: str, stdin: bytes = b'') -> subprocess.CompletedProcess[bytes]:
+    return subprocess.run([sys.executable, str(DIR_ROOT / 'Skritt' / 'client.py'), *args],
+            env=env, cwd=cwd, input=stdin, capture_output=True)
+
+def test_forwarding(server: subprocess.Popen[bytes], env: dict[str, str], tmp_path: Path) -> None:
+    """argv, environment, working directory, stdio and exit code all go through"""
+    (tmp_path / "sub").mkdir()
+    env = dict(env, SKRITT_TEST="hello", SKRITT_TEST_RTN="3")
+    result = runClient(env, tmp_path / "sub", str(tmp_path / "trivial.py"), "a", "b", stdin=b"in")
+    assert result.returncode == 3
+    assert result.stdout.split() == [str(tmp_path / "sub").encode(), b"hello", b"a", b"b", b"in"]
+    assert b"Retrun 3" not in result.stderr # --notitle
+
+def test_run_module(server: subprocess.Popen[bytes], env: dict[str, str], tmp_path: Path) -> None:
+    result = runClient(env, tmp_path, "-m", "json.tool", stdin=b'{"a":1}')
+    assert result.returncode == 0
+    assert b'"a": 1' in result.stdout
+
+def test_signal_forwarded(server: subprocess.Popen[bytes], env: dict[str, str], tmp_path: Path) -> None:
+    (tmp_path / "sleep.py").write_text("import time\ntime.sleep(30)\n")
+    proc = subprocess.Popen([sys.executable, str(DIR_ROOT / 'Skritt' / 'client.py'), str(tmp_path / "sleep.py")],
+            env=env, stderr=subprocess.DEVNULL)
+    time.sleep(1)
+    proc.send_signal(signal.SIGTERM)
+    assert proc.wait(timeout=10) == -signal.SIGTERM
+
+def test_no_server(env: dict[str, str], tmp_path: Path) -> None:
+    """Without a server, the script runs in the client itself"""
+    result = runClient(dict(env, SKRITT_TEST_RTN="5"), tmp_path, str(tmp_path / "trivial.py"), "c")
+    assert result.returncode == 5
+    assert result.stdout.split()[-1] == b"c"
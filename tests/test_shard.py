@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright 2024-2025, Hojin Koh
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Tests related to sharding files and running pipelines on the shards
+
+import time
+from pathlib import Path
+
+import pytest
+
+from Skritt import Step
+from Skritt.shard import appendFile, splitFile
+
+class ShardStep(Step):
+    def main(self) -> int:
+        return 0
+
+@pytest.fixture
+def step() -> ShardStep:
+    step = ShardStep("--notitle")
+    step.parseArgs()
+    return step
+
+def test_split_on_lines(tmp_path: Path) -> None:
+    pathIn = tmp_path / "in.txt"
+    data = b"".join(b"line %d\n" % i for i in range(1000))
+    pathIn.write_bytes(data)
+    aRanges = splitFile(str(pathIn), 7)
+    assert len(aRanges) == 7
+    assert aRanges[0].offset == 0
+    assert sum(r.length for r in aRanges) == len(data)
+    for r in aRanges:
+        assert data[r.offset + r.length - 1:r.offset + r.length] == b"\n"
+        assert r.offset == 0 or data[r.offset - 1:r.offset] == b"\n"
+
+def test_split_more_shards_than_records(tmp_path: Path) -> None:
+    pathIn = tmp_path / "in.txt"
+    pathIn.write_bytes(b"a\nbbbbbbbbbbbbbbbbbbbb\nc")
+    aRanges = splitFile(str(pathIn), 10)
+    assert [(r.offset, r.length) for r in aRanges] == [(0, 2), (2, 21), (23, 1)]
+    pathIn.write_bytes(b"")
+    assert splitFile(str(pathIn), 4) == []
+
+def test_split_separator(tmp_path: Path) -> None:
+    pathIn = tmp_path / "in.txt"
+    pathIn.write_bytes(b"r1--r2--r3--r4--")
+    aRanges = splitFile(str(pathIn), 2, sep=b"--")
+    assert [(r.offset, r.length) for r in aRanges] == [(0, 8), (8, 8)]
+
+def test_append_file(tmp_path: Path) -> None:
+    pathIn = tmp_path / "in.txt"
+    pathIn.write_bytes(b"x" * 100000)
+    pathOut = tmp_path / "out.txt"
+    with open(pathOut, 'wb') as fpOut, open(pathIn, 'rb') as fpIn:
+        fpOut.write(b"head")
+        fpOut.flush()
+        appendFile(fpOut.fileno(), fpIn.fileno())
+        appendFile(fpOut.fileno(), fpIn.fileno())
+    assert pathOut.read_bytes() == b"head" + b"x" * 200000
+
+def test_shellshard(capfd: pytest.CaptureFixture[str], step: ShardStep, tmp_path: Path) -> None:
+    pathIn = tmp_path / "in.txt"
+    pathIn.write_bytes(b"".join(b"%d\n" % i for i in range(10000)))
+    pathOut = tmp_path / "out.txt"
+    rtn = step.shellshard(('sed', 's/^/n/'), ('sh', '-c', 'cat; echo done >&2'),
+            pathIn=str(pathIn), pathOut=str(pathOut), nShards=4)
+    assert rtn == 0
+    assert pathOut.read_bytes() == b"".join(b"n%d\n" % i for i in range(10000))
+    err = capfd.readouterr().err
+    for i in range(1, 5):
+        assert F"[shard {i}/4]" in err
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["in.txt", "out.txt"]
+
+def test_shellshard_failure(step: ShardStep, tmp_path: Path) -> None:
+    pathIn = tmp_path / "in.txt"
+    pathIn.write_bytes(b"a\nb\nfail\nc\n")
+    pathOut = tmp_path / "out.txt"
+    rtn = step.shellshard(('sh', '-c', 'if grep -q fail; then exit 3; fi'),
+            pathIn=str(pathIn), pathOut=str(pathOut), nShards=4)
+    assert rtn == 3
+    assert not pathOut.exists()
+
+def test_shellshard_failfast(tmp_path: Path) -> None:
+    """A failing shard terminates those still running"""
+    step = ShardStep("--notitle", "--jobs", "4")
+    step.parseArgs()
+    pathIn = tmp_path / "in.txt"
+    pathIn.write_bytes(b"a\nb\nfail\nc\n")
+    timeBegin = time.perf_counter()
+    rtn = step.shellshard(('sh', '-c', 'if grep -q fail; then exit 3; fi; exec sleep 30'),
+            pathIn=str(pathIn), pathOut=str(tmp_path / "out.txt"), nShards=4)
+    assert rtn == 3
+    assert time.perf_counter() - timeBegin < 10
+
+def test_shellshard_spawn_error(tmp_path: Path) -> None:
+    """A shard that can't start raises plainly, after the others are gone"""
+    step = ShardStep("--notitle", "--jobs", "1")
+    step.parseArgs()
+    pathIn = tmp_path / "in.txt"
+    pathIn.write_bytes(b"a\nb\nc\nd\n")
+    with pytest.raises(FileNotFoundError):
+        step.shellshard(('cat',), ('nonexistent-command-for-skritt',),
+                pathIn=str(pathIn), pathOut=str(tmp_path / "out.txt"), nShards=4)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["in.txt"]
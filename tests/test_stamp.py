@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright 2024-2025, Hojin Koh
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Tests related to the stamp store and the default needed() check
+
+import os
+from collections.abc import Iterable, Sequence
+from pathlib import Path
+
+import pytest
+
+from Skritt import Step
+from Skritt.hashing import TypeBlocks
+from Skritt.stamp import ResourceStamp, openDB
+
+class CopyStep(Step):
+    """Copy the input to the output, counting how many times it really ran"""
+    def __init__(self, *args: str) -> None:
+        super().__init__(*args)
+        self.getParser("CopyStep").add_argument("--suffix", default="")
+        self.getParser("CopyStep").add_argument("input")
+        self.getParser("CopyStep").add_argument("output")
+        self.nRun = 0
+
+    def inputs(self) -> Sequence[str]:
+        return (self.args.input,)
+
+    def outputs(self) -> Sequence[str]:
+        return (self.args.output,)
+
+    def main(self) -> int:
+        self.nRun += 1
+        Path(self.args.output).write_text(Path(self.args.input).read_text() + self.args.suffix)
+        return 0
+
+def runCopy(*args: str) -> int:
+    step = CopyStep("--notitle", *args)
+    step.invoke()
+    return step.nRun
+
+def test_skip_when_unchanged(tmp_path: Path) -> None:
+    pathIn, pathOut = tmp_path / "in", tmp_path / "out"
+    pathIn.write_text("abc")
+    assert runCopy(str(pathIn), str(pathOut)) == 1
+    assert runCopy(str(pathIn), str(pathOut)) == 0
+    assert runCopy("--debug", str(pathIn), str(pathOut)) == 0 # Skritt's own options don't count
+
+def test_touch_does_not_rerun(tmp_path: Path) -> None:
+    pathIn, pathOut = tmp_path / "in", tmp_path / "out"
+    pathIn.write_text("abc")
+    assert runCopy(str(pathIn), str(pathOut)) == 1
+    st = pathIn.stat()
+    os.utime(pathIn, ns=(st.st_atime_ns, st.st_mtime_ns - 10**9))
+    assert runCopy(str(pathIn), str(pathOut)) == 0
+
+def test_rerun_on_changes(tmp_path: Path) -> None:
+    pathIn, pathOut = tmp_path / "in", tmp_path / "out"
+    pathIn.write_text("abc")
+    assert runCopy(str(pathIn), str(pathOut)) == 1
+    pathIn.write_text("abcd")
+    assert runCopy(str(pathIn), str(pathOut)) == 1
+    assert runCopy("--suffix", "x", str(pathIn), str(pathOut)) == 1
+    pathOut.write_text("tampered")
+    assert runCopy("--suffix", "x", str(pathIn), str(pathOut)) == 1
+    pathOut.unlink()
+    assert runCopy("--suffix", "x", str(pathIn), str(pathOut)) == 1
+    assert runCopy("--suffix", "x", str(pathIn), str(pathOut)) == 0
+
+def test_check_flag(tmp_path: Path) -> None:
+    pathIn, pathOut = tmp_path / "in", tmp_path / "out"
+    pathIn.write_text("abc")
+    assert CopyStep("--notitle", "--check", str(pathIn), str(pathOut)).invoke() == 0
+    runCopy(str(pathIn), str(pathOut))
+    assert CopyStep("--notitle", "--check", str(pathIn), str(pathOut)).invoke() == 1
+
+def test_rehash_only_on_metadata_change(tmp_path: Path) -> None:
+    res = ResourceStamp()
+    pathIn = tmp_path / "in"
+    pathIn.write_text("abc")
+    aHashed: list[str] = []
+    hashFiles = res.service.hashFiles
+    def hashFilesCounted(aPaths: Iterable[str], mPrev: dict[str, tuple[int, TypeBlocks]] | None = None) -> dict[str, tuple[str, int, TypeBlocks]]:
+        aPaths = list(aPaths)
+        aHashed.extend(aPaths)
+        return hashFiles(aPaths, mPrev)
+    res.service.hashFiles = hashFilesCounted # type: ignore[method-assign]
+
+    digest = res.getHash(str(pathIn))
+    assert res.getHash(str(pathIn)) == digest
+    assert len(aHashed) == 1
+    pathIn.write_text("abcd")
+    assert res.getHash(str(pathIn)) != digest
+    assert len(aHashed) == 2
+    assert res.getHash(str(tmp_path / "nonexistent")) == ''
+
+def test_append_only(tmp_path: Path) -> None:
+    res = ResourceStamp()
+    pathLog = tmp_path / "log"
+    pathLog.write_text("line1\n")
+    res.markAppendOnly(str(pathLog))
+    res.getHash(str(pathLog))
+    with open(pathLog, 'a') as fp:
+        fp.write("line2\n")
+    digest = res.getHash(str(pathLog))
+    assert digest == res.service.hashFile(str(pathLog))
+
+class ListStep(CopyStep):
+    """Write the output without reading the input"""
+    def main(self) -> int:
+        Path(self.args.output).write_text("listed")
+        return 0
+
+def test_directory_input(tmp_path: Path) -> None:
+    pathIn, pathOut = tmp_path / "dir", tmp_path / "out"
+    pathIn.mkdir()
+    with pytest.raises(IsADirectoryError) as info:
+        ListStep("--notitle", str(pathIn), str(pathOut)).invoke()
+    assert "ListStep" in "".join(info.value.__notes__)
+
+    ResourceStamp().record("key", (), (str(pathOut),)) # Something to compare to, so needed() stamps the input
+    step = ListStep("--notitle", str(pathIn), str(pathOut))
+    step.getStampKey = lambda: "key" # type: ignore[method-assign]
+    step.parseArgs()
+    with pytest.raises(IsADirectoryError) as info:
+        step.needed()
+    assert "ListStep" in "".join(info.value.__notes__)
+
+def test_removed_while_hashing(tmp_path: Path) -> None:
+    res = ResourceStamp()
+    pathIn = tmp_path / "in"
+    pathIn.write_text("abc")
+    hashFiles = res.service.hashFiles
+    def hashFilesAfterRemoval(aPaths: Iterable[str], mPrev: dict[str, tuple[int, TypeBlocks]] | None = None) -> dict[str, tuple[str, int, TypeBlocks]]:
+        pathIn.unlink()
+        return hashFiles(aPaths, mPrev)
+    res.service.hashFiles = hashFilesAfterRemoval # type: ignore[method-assign]
+    assert res.getHash(str(pathIn)) == ''
+
+def test_journal_opt_in(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """WAL doesn't work on NFS, so it's only used when asked for"""
+    assert openDB(str(tmp_path / "default.db")).execute("PRAGMA journal_mode").fetchone()[0] == 'delete'
+    monkeypatch.setenv('SKRITT_SQLITE_WAL', '1')
+    assert openDB(str(tmp_path / "wal.db")).execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright 2024-2025, Hojin Koh
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Tests related to startup cost: what gets imported, and how long it takes
+
+from pathlib import Path
+
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+DIR_ROOT = Path(__file__).parent.parent
+BUDGET_CHECK = 0.15 # Seconds over a bare interpreter for --check of a trivial step
+MODULES_HEAVY = ('asyncio', 'loguru', 'sqlite3', 'concurrent.futures', 'subprocess', 'Skritt.subprocess')
+
+SCRIPT = '''
+import sys
+from Skritt import Step
+
+class Trivial(Step):
+    def main(self) -> int:
+        return 0
+
+try:
+    rtn = Trivial(*sys.argv[1:]).invoke()
+finally:
+    print(" ".join(sorted(m for m in %r if m in sys.modules)), file=sys.stderr)
+sys.exit(rtn)
+''' % (MODULES_HEAVY,)
+
+@pytest.fixture
+def pathScript(tmp_path: Path) -> Path:
+    path = tmp_path / "trivial.py"
+    path.write_text(SCRIPT)
+    return path
+
+def run(*args: str) -> subprocess.CompletedProcess[str]:
+    return subprocess.run([sys.executable, *args], env=dict(os.environ, PYTHONPATH=str(DIR_ROOT)),
+            capture_output=True, text=True)
+
+def test_import_package() -> None:
+    result = run('-c', 'import sys, Skritt; print(" ".join(sorted(m for m in sys.modules if m.startswith("Skritt"))))')
+    assert result.stdout.split() == ['Skritt']
+
+def test_check_imports_light(pathScript: Path) -> None:
+    result = run(str(pathScript), '--check', '--notitle')
+    assert result.returncode == 0
+    assert result.stderr.strip() == ""
+
+def test_help_imports_light(pathScript: Path) -> None:
+    result = run(str(pathScript), '--help')
+    assert result.returncode == 0
+    assert result.stderr.strip() == ""
+
+def test_check_budget(pathScript: Path) -> None:
+    def best(*args: str) -> float:
+        aTimes = []
+        for _ in range(5):
+            timeBegin = time.perf_counter()
+            run(*args)
+            aTimes.append(time.perf_counter() - timeBegin)
+        return min(aTimes)
+    overhead = best(str(pathScript), '--check', '--notitle') - best('-c', 'pass')
+    assert overhead < BUDGET_CHECK, F"--check took {overhead*1000:.0f}ms over a bare interpreter"
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright 2024-2025, Hojin Koh
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+# Tests related to the per-run stat cache, and checking many steps at once
+
+from collections.abc import Sequence
+from typing import Any
+from pathlib import Path
+from threading import Barrier, Thread
+
+import os
+
+import pytest
+
+from Skritt import Runner, Step
+from Skritt.runner import checkNeeded
+from Skritt.statcache import StatCache, invalidatePaths, scopeStatCache, statPath
+
+class CountScandir:
+    """Count calls of os.scandir()"""
+    def __init__(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        self.n = 0
+        self.scandir = os.scandir
+        monkeypatch.setattr(os, 'scandir', self)
+
+    def __call__(self, path: str) -> Any:
+        self.n += 1
+        return self.scandir(path)
+
+class AppendStep(Step):
+    """Write the input plus a suffix to the output, counting how many times it really ran"""
+    def __init__(self, *args: str) -> None:
+        super().__init__("--notitle", *args)
+        self.getParser("AppendStep").add_argument("input")
+        self.getParser("AppendStep").add_argument("output")
+        self.nRun = 0
+
+    def inputs(self) -> Sequence[str]:
+        return (self.args.input,)
+
+    def outputs(self) -> Sequence[str]:
+        return (self.args.output,)
+
+    def main(self) -> int:
+        self.nRun += 1
+        Path(self.args.output).write_text(Path(self.args.input).read_text() + "+")
+        return 0
+
+def test_stat(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    counter = CountScandir(monkeypatch)
+    (tmp_path / "a").write_text("aaa")
+    cache = StatCache()
+    assert cache.stat(str(tmp_path / "a")).st_size == 3
+    assert cache.stat(str(tmp_path / "a")) is cache.stat(str(tmp_path / ".." / tmp_path.name / "a"))
+    with pytest.raises(FileNotFoundError):
+        cache.stat(str(tmp_path / "b"))
+    with pytest.raises(FileNotFoundError):
+        cache.stat(str(tmp_path / "nodir" / "b"))
+    assert counter.n == 2
+
+def test_invalidate(tmp_path: Path) -> None:
+    cache = StatCache()
+    with pytest.raises(FileNotFoundError):
+        cache.stat(str(tmp_path / "a"))
+    (tmp_path / "a").write_text("aaa")
+    with pytest.raises(FileNotFoundError): # Not told about it yet
+        cache.stat(str(tmp_path / "a"))
+    cache.invalidate([str(tmp_path / "a")])
+    assert cache.stat(str(tmp_path / "a")).st_size == 3
+
+def test_listed_once(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    counter = CountScandir(monkeypatch)
+    for i in range(8):
+        (tmp_path / str(i)).write_text(str(i))
+    cache = StatCache()
+    barrier = Barrier(8)
+    aSizes: list[int] = []
+    def stat(i: int) -> None:
+        barrier.wait()
+        aSizes.append(cache.stat(str(tmp_path / str(i))).st_size)
+    aThreads = [Thread(target=stat, args=(i,)) for i in range(8)]
+    for thread in aThreads:
+        thread.start()
+    for thread in aThreads:
+        thread.join()
+    assert aSizes == [1] * 8
+    assert counter.n == 1
+
+def test_scope(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    counter = CountScandir(monkeypatch)
+    (tmp_path / "a").write_text("aaa")
+    statPath(str(tmp_path / "a"))
+    assert counter.n == 0
+    with scopeStatCache() as cache:
+        statPath(str(tmp_path / "a"))
+        statPath(str(tmp_path / "a"))
+        assert counter.n == 1
+        invalidatePaths([str(tmp_path / "a")])
+        assert not cache.mDirs
+
+def test_check_needed(tmp_path: Path) -> None:
+    aSteps = []
+    for i in range(20):
+        (tmp_path / F"in{i}").write_text(str(i))
+        aSteps.append(AppendStep(str(tmp_path / F"in{i}"), str(tmp_path / F"out{i}")))
+    for step in aSteps[::2]:
+        assert step.invoke() == 0
+    aSteps.append(AppendStep("--no-such-option"))
+    assert checkNeeded(aSteps, 4) == [False, True] * 10 + [True]
+    (tmp_path / "in0").write_text("changed")
+    assert checkNeeded([AppendStep(str(tmp_path / "in0"), str(tmp_path / "out0"))]) == [True]
+
+def test_check_quietly(capfd: pytest.CaptureFixture[str], tmp_path: Path) -> None:
+    """Checking doesn't set up what only matters when invoked: log files, --jobs, messages"""
+    from Skritt.scheduler import ResourceScheduler
+    nJobs = ResourceScheduler().nJobs
+    (tmp_path / "in").write_text("x")
+    aSteps = [AppendStep("--logfile", str(tmp_path / F"log{i}"), "--jobs", "3", str(tmp_path / "in"), str(tmp_path / F"out{i}"))
+            for i in range(3)]
+    aSteps.append(AppendStep("--help"))
+    assert checkNeeded(aSteps) == [True] * 4
+    assert not any(hasattr(step, 'args') for step in aSteps)
+    assert not any(tmp_path.glob("log*"))
+    assert ResourceScheduler().nJobs == nJobs
+    assert capfd.readouterr() == ("", "")
+    assert aSteps[0].invoke() == 0 # Still parsed and set up when invoked
+    assert (tmp_path / "log0").exists()
+
+def test_runner_check(tmp_path: Path) -> None:
+    (tmp_path / "in").write_text("x")
+    runner = Runner(2)
+    a = runner.add(AppendStep(str(tmp_path / "in"), str(tmp_path / "mid")))
+    b = runner.add(AppendStep(str(tmp_path / "mid"), str(tmp_path / "out")), (a,))
+    assert runner.check() == {a: True, b: True}
+
+def test_run_sees_written_outputs(tmp_path: Path) -> None:
+    """A step reading what another one just wrote, in a directory looked at before that"""
+    (tmp_path / "in").write_text("x")
+    def run() -> tuple[int, int]:
+        runner = Runner(1)
+        a = AppendStep(str(tmp_path / "in"), str(tmp_path / "mid"))
+        b = AppendStep(str(tmp_path / "mid"), str(tmp_path / "out"))
+        runner.add(b, (a,))
+        assert runner.run() == 0
+        return a.nRun, b.nRun
+    assert run() == (1, 1)
+    assert run() == (0, 0)
+    (tmp_path / "in").write_text("y")
+    assert run() == (1, 1)
+    assert (tmp_path / "out").read_text() == "y++"
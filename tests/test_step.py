@@ -21,6 +21,7 @@ from Skritt.base import TypeHookFunc
 
 from Skritt import Step
 
+import asyncio
 import pytest
 
 class NormalStep(Step):
@@ -109,3 +110,31 @@ def test_help_flag() -> None:
     step = NormalStep("--help", should_check=False)
     with pytest.raises(SystemExit):
         step.invoke()
+
+
+class AsyncStep(Step):
+    """Mock class to test `async def main` with awaitable shell helpers"""
+    async def main(self) -> int:
+        aRtn = await asyncio.gather(
+                self.ashellout(('true',)),
+                self.ashellout(('sh', '-c', 'exit 3')),
+                )
+        self.output = await self.ashellcapture(('echo', 'hi'), ('tr', 'a-z', 'A-Z'))
+        self.rtnJob = await self.shellbg(('sh', '-c', 'exit 2')).ajoin()
+        with pytest.raises(RuntimeError):
+            self.shellout(('true',))
+        return sum(aRtn)
+
+
+def test_async_main() -> None:
+    """Test that an async main runs with hooks around it, and can await pipelines"""
+    step = AsyncStep("--notitle")
+    aCalls: list[str] = []
+    step.addHook('pre-run', 'pre-run-test', lambda s: aCalls.append('pre-run'))
+    step.addHook('post-run', 'post-run-test', lambda s: aCalls.append('post-run'))
+    step.addHook('cleanup', 'cleanup-test', lambda s: aCalls.append('cleanup'))
+
+    assert step.invoke() == 3
+    assert step.output == b"HI\n"
+    assert step.rtnJob == 2
+    assert aCalls == ['pre-run', 'post-run', 'cleanup']
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright 2024-2025, Hojin Koh
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Tests related to capturing pipeline output in a Step
+
+import mmap
+from subprocess import CalledProcessError
+
+import pytest
+
+from Skritt import Step
+
+class CaptureStep(Step):
+    def main(self) -> int:
+        return 0
+
+@pytest.fixture
+def step() -> CaptureStep:
+    step = CaptureStep("--notitle")
+    step.parseArgs()
+    return step
+
+def test_capture_bytes(step: CaptureStep, capfd: pytest.CaptureFixture[str]) -> None:
+    assert step.shellcapture(('printf', 'abc\\ndef\\n'), ('tr', 'a-z', 'A-Z')) == b"ABC\nDEF\n"
+    assert "ABC" not in capfd.readouterr().err
+
+def test_capture_spool(step: CaptureStep) -> None:
+    with step.shellcapture(('seq', '100000'), mode='spool', sizeSpool=1000) as fp:
+        assert fp.readline() == b"1\n"
+        assert fp.read().endswith(b"\n100000\n")
+
+def test_capture_mmap(step: CaptureStep) -> None:
+    mm = step.shellcapture(('seq', '3'), mode='mmap')
+    assert isinstance(mm, mmap.mmap)
+    assert mm[:] == b"1\n2\n3\n"
+    assert step.shellcapture(('true',), mode='mmap') == b''
+
+def test_capture_failure(step: CaptureStep) -> None:
+    for mode in ('bytes', 'spool', 'mmap'):
+        with pytest.raises(CalledProcessError) as e:
+            step.shellcapture(('sh', '-c', 'echo partial; exit 3'), mode=mode)
+        assert e.value.returncode == 3
+
+def test_iter_lines(step: CaptureStep) -> None:
+    assert list(step.shelliter(('seq', '5'))) == [b"1\n", b"2\n", b"3\n", b"4\n", b"5\n"]
+
+def test_iter_chunks(step: CaptureStep) -> None:
+    aChunks = list(step.shelliter(('seq', '100000'), lines=False, sizeChunk=4096))
+    assert all(len(chunk) <= 4096 for chunk in aChunks)
+    assert b''.join(aChunks).endswith(b"99999\n100000\n")
+
+def test_iter_early_stop(capfd: pytest.CaptureFixture[str], step: CaptureStep) -> None:
+    """Leaving early shouldn't hang on the still-running pipeline, nor raise or log a failure"""
+    for i, line in enumerate(step.shelliter(('yes',))):
+        if i == 10:
+            break
+    for i, line in enumerate(step.shelliter(('yes',), ('cat',))):
+        if i == 10:
+            break
+    assert "returned" not in capfd.readouterr().err
+
+def test_capture_with_stdin(step: CaptureStep) -> None:
+    assert step.shellcapture(('tr', 'a-z', 'A-Z'), stdin=[b"ab", b"c\n"]) == b"ABC\n"
+    assert step.shellbg(('grep', '-q', 'x'), stdin=b"axb\n").join() == 0
+
+def test_iter_beyond_jobs() -> None:
+    """More live iterators than --jobs, and a capture behind a busy scheduler, don't wait for slots"""
+    step = CaptureStep("--notitle", "--jobs", "1")
+    step.parseArgs()
+    aPairs = list(zip(step.shelliter(('seq', '3')), step.shelliter(('seq', '4', '6'))))
+    assert aPairs == [(b"1\n", b"4\n"), (b"2\n", b"5\n"), (b"3\n", b"6\n")]
+    job = step.shellbg(('sleep', '1'))
+    assert step.shellcapture(('echo', 'x')) == b"x\n"
+    assert not job.done()
+    assert job.join() == 0
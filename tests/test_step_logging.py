@@ -18,9 +18,13 @@
 
 import re
 import tempfile
+import threading
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
 
 import pytest
-from Skritt import Step
+from Skritt import Runner, Step
+from Skritt.subprocess import Filter
 
 class NormalStep(Step):
     """Test implementation of Step"""
@@ -43,6 +47,24 @@ def test_debug_flag(capfd: pytest.CaptureFixture[str]) -> None:
     captured = capfd.readouterr()
     assert "Debug message" in captured.err
 
+def test_debug_flag_first(capfd: pytest.CaptureFixture[str]) -> None:
+    """Test that --debug before anything else is logged doesn't leave two sinks on stderr"""
+    step = NormalStep("--debug", "--notitle")
+    step.invoke()
+    captured = capfd.readouterr()
+    assert captured.err.count("Running main") == 1
+    assert captured.err.count("Debug message from main") == 1
+
+def test_debug_flag_threads(capfd: pytest.CaptureFixture[str]) -> None:
+    """Test that Steps asking for --debug from many threads at once end up with one stderr sink"""
+    runner = Runner(8)
+    for _ in range(8):
+        runner.add(NormalStep("--debug", "--notitle"))
+    assert runner.run() == 0
+    captured = capfd.readouterr()
+    assert captured.err.count("Running main") == 8
+    assert captured.err.count("Debug message from main") == 8
+
 def test_step_logfile_handling() -> None:
     with tempfile.NamedTemporaryFile() as tmp:
         step = NormalStep("--logfile", tmp.name)
@@ -86,3 +108,89 @@ def test_nested_step_logfile_handling() -> None:
             assert "Outer step running" not in content
             assert "Running main" in content
             assert "Debug message from main" in content
+
+def test_logfile_from_threads() -> None:
+    """Lines from threads main() starts itself, which don't get its context, still reach the log file"""
+    from loguru import logger
+
+    class ThreadingStep(Step):
+        def work(self, i: int) -> None:
+            self.logger.info(F"Worker {i}")
+            logger.info(F"Global {i}")
+
+        def main(self) -> int:
+            thread = threading.Thread(target=self.work, args=(0,))
+            thread.start()
+            thread.join()
+            with ThreadPoolExecutor(2) as executor:
+                list(executor.map(self.work, (1, 2)))
+            return 0
+
+    with tempfile.NamedTemporaryFile() as tmp:
+        ThreadingStep("--logfile", tmp.name).invoke()
+        with open(tmp.name) as f:
+            content = f.read()
+        for i in range(3):
+            assert F"Worker {i}" in content
+            assert F"Global {i}" in content # The only Step with a log file
+
+def test_logfile_user_patcher() -> None:
+    """A patcher of the user's own doesn't take records away from log files"""
+    class PatchingStep(Step):
+        def main(self) -> int:
+            self.logger.configure(patcher=lambda record: record['extra'].update(isPatched=True))
+            self.logger.info("After patching")
+            return 0
+
+    with tempfile.NamedTemporaryFile() as tmp:
+        PatchingStep("--logfile", tmp.name).invoke()
+        with open(tmp.name) as f:
+            assert "After patching" in f.read()
+
+def test_step_logfile_buffered() -> None:
+    with tempfile.NamedTemporaryFile() as tmp:
+        step = NormalStep("--logfile", tmp.name, "--logbuffer", "block")
+        step.invoke()
+
+        with open(tmp.name) as f:
+            content = f.read()
+            assert "Running main" in content
+            assert "Retrun 0" in content # Drained only after the footer
+
+def test_concurrent_step_logfiles() -> None:
+    """Steps running at the same time in threads each get only their own lines, PROC ones included"""
+    barrier = threading.Barrier(2)
+
+    class TalkingStep(Step):
+        def __init__(self, *args: str) -> None:
+            super().__init__(*args)
+            self.getParser("TalkingStep").add_argument("name")
+
+        def shout(self, it: Iterator[bytes]) -> Iterator[bytes]:
+            self.logger.info(F"Filter of {self.args.name}")
+            for line in it:
+                yield line.upper()
+
+        def main(self) -> int:
+            name = self.args.name
+            barrier.wait(5)
+            self.logger.info(F"Main of {name}")
+            barrier.wait(5)
+            self.shellout(["echo", F"direct-{name}"])
+            job = self.shellbg(["echo", F"background-{name}"])
+            barrier.wait(5)
+            self.shellout(["echo", F"filtered-{name}"], Filter(self.shout, name="shout"), ["cat"])
+            return job.join()
+
+    with tempfile.NamedTemporaryFile() as tmp1, tempfile.NamedTemporaryFile() as tmp2:
+        runner = Runner(2)
+        runner.add(TalkingStep("one", "--logfile", tmp1.name))
+        runner.add(TalkingStep("two", "--logfile", tmp2.name))
+        assert runner.run() == 0
+
+        for path, name, nameOther in ((tmp1.name, "one", "two"), (tmp2.name, "two", "one")):
+            with open(path) as f:
+                content = f.read()
+            for text in ("Main of {}", "Filter of {}", "direct-{}", "background-{}", "FILTERED-{}"):
+                assert text.format(name) in content.replace(name.upper(), name)
+                assert text.format(nameOther) not in content.replace(nameOther.upper(), nameOther)
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Copyright 2024-2025, Hojin Koh
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Tests related to running subprocess pipelines
+
+from typing import Any
+from collections.abc import Iterable, Iterator
+
+import asyncio
+import io
+import signal
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+from Skritt.logging import ResourceLogger
+from Skritt.subprocess import shellrun, copyRange, FailFastGroup, FileRange, Filter, LogLimit, LogLimiter, TypeStage
+
+def run(*args: TypeStage, **kwargs: Any) -> int:
+    return asyncio.run(shellrun(ResourceLogger().logger, args, **kwargs)).returncode
+
+def test_pipeline_logged(capfd: pytest.CaptureFixture[str]) -> None:
+    """Without redirection, the last stage's stdout goes to the log"""
+    rtn = run(('printf', 'abc\\ndef\\n'), ('sed', 's/d/D/'))
+    assert rtn == 0
+    captured = capfd.readouterr()
+    assert "abc" in captured.err
+    assert "Def" in captured.err
+
+def test_pipeline_return_code() -> None:
+    assert run(('sh', '-c', 'exit 3'), ('cat',)) == 3
+
+def test_stdout_to_path(tmp_path: Path, capfd: pytest.CaptureFixture[str]) -> None:
+    pathOut = tmp_path / "out.txt"
+    rtn = run(('printf', 'abc\\ndef\\n'), ('sed', 's/d/D/'), stdout=pathOut)
+    assert rtn == 0
+    assert pathOut.read_text() == "abc\nDef\n"
+    assert "Def" not in capfd.readouterr().err
+
+def test_stdout_to_file_object(tmp_path: Path) -> None:
+    pathOut = tmp_path / "out.txt"
+    with open(pathOut, 'wb') as fp:
+        fp.write(b"header\n") # Still buffered in python when the child starts
+        assert run(('echo', 'body'), stdout=fp) == 0
+    assert pathOut.read_bytes() == b"header\nbody\n"
+
+def test_stdout_to_memory() -> None:
+    """File objects without a real fd are relayed through python"""
+    buf = io.BytesIO()
+    assert run(('printf', 'abc'), ('tr', 'a-z', 'A-Z'), stdout=buf) == 0
+    assert buf.getvalue() == b"ABC"
+
+def test_stderr_per_stage(tmp_path: Path, capfd: pytest.CaptureFixture[str]) -> None:
+    pathErr = tmp_path / "err.txt"
+    rtn = run(
+            ('sh', '-c', 'echo first >&2; echo data'),
+            ('sh', '-c', 'echo second >&2; cat'),
+            stderr={1: pathErr},
+            )
+    assert rtn == 0
+    assert pathErr.read_text() == "second\n"
+    captured = capfd.readouterr()
+    assert "first" in captured.err
+    assert "second" not in captured.err
+
+def test_log_long_line(capfd: pytest.CaptureFixture[str]) -> None:
+    """Lines longer than asyncio's readline limit used to fail"""
+    assert run(('sh', '-c', 'head -c 200000 /dev/zero | tr "\\\\0" x; echo; echo done')) == 0
+    captured = capfd.readouterr()
+    assert "x"*200000 in captured.err
+    assert "done" in captured.err
+
+def test_log_any_sink() -> None:
+    """Any sink gets every line, batched into one record with the pid prefix on each line"""
+    logger = ResourceLogger().logger
+    buf = io.StringIO()
+    handle = logger.add(buf, format="{message}", filter=lambda record: record['level'].no == 22)
+    try:
+        assert run(('seq', '5')) == 0
+    finally:
+        logger.remove(handle)
+    assert [line.split(") ", 1)[1] for line in buf.getvalue().splitlines()] == ["1", "2", "3", "4", "5"]
+
+def test_log_lenient_decode(capfd: pytest.CaptureFixture[str]) -> None:
+    assert run(('printf', 'bad \\377 byte\\n{braces}\\nno newline')) == 0
+    captured = capfd.readouterr()
+    assert "bad � byte" in captured.err
+    assert "{braces}" in captured.err
+    assert "no newline" in captured.err
+
+def test_both_streams_redirected(tmp_path: Path) -> None:
+    """A stage with nothing to log must still be waited for, not killed"""
+    pathOut = tmp_path / "out.txt"
+    rtn = run(('sh', '-c', 'sleep 0.2; echo late'), stdout=pathOut, stderr=tmp_path / "err.txt")
+    assert rtn == 0
+    assert pathOut.read_text() == "late\n"
+
+def test_stage_resource_usage(capfd: pytest.CaptureFixture[str]) -> None:
+    resLogging = ResourceLogger()
+    resLogging.setStderr('DEBUG')
+    result = asyncio.run(shellrun(resLogging.logger, (
+        ('sh', '-c', 'i=0; while [ $i -lt 20000 ]; do i=$((i+1)); done; echo done'),
+        ('sh', '-c', 'cat; exit 2'),
+        )))
+    assert result.returncode == 2
+    assert [stage.returncode for stage in result.aStages] == [0, 2]
+    assert result.aStages[0].utime + result.aStages[0].stime > 0
+    assert all(stage.maxrss > 0 for stage in result.aStages)
+    assert all(stage.elapsed > 0 for stage in result.aStages)
+    assert "maxrss=" in capfd.readouterr().err
+
+def test_stdin_bytes(tmp_path: Path) -> None:
+    pathOut = tmp_path / "out.txt"
+    assert run(('sed', 's/a/A/'), ('cat',), stdout=pathOut, stdin=b"abc\n") == 0
+    assert pathOut.read_bytes() == b"Abc\n"
+
+def test_stdin_path(tmp_path: Path) -> None:
+    pathIn = tmp_path / "in.txt"
+    pathIn.write_bytes(b"x\n" * 1000)
+    pathOut = tmp_path / "out.txt"
+    assert run(('wc', '-l'), stdout=pathOut, stdin=pathIn) == 0
+    assert pathOut.read_text().strip() == "1000"
+
+def test_stdin_file_object_position(tmp_path: Path) -> None:
+    """The child starts where python stopped reading, not where its read-ahead went"""
+    pathIn = tmp_path / "in.txt"
+    pathIn.write_bytes(b"skip\nkeep\n")
+    buf = io.BytesIO()
+    with open(pathIn, 'rb') as fp:
+        assert fp.readline() == b"skip\n"
+        assert run(('cat',), stdout=buf, stdin=fp) == 0
+    assert buf.getvalue() == b"keep\n"
+
+def test_stdin_iterable_large(tmp_path: Path) -> None:
+    """Much more than a pipe buffer, through a pipeline that doesn't read until later"""
+    pathOut = tmp_path / "out.txt"
+    aChunks = (b"%08d\n" % i for i in range(200000))
+    assert run(('sort', '-r'), ('tail', '-n', '1'), stdout=pathOut, stdin=aChunks) == 0
+    assert pathOut.read_bytes() == b"00000000\n"
+
+def test_stdin_iterable_blocking() -> None:
+    """A source that blocks on each chunk doesn't hold up other pipelines on the loop"""
+    def slow() -> Iterator[bytes]:
+        for i in range(3):
+            time.sleep(0.3)
+            yield b"%d\n" % i
+    async def both() -> tuple[float, float]:
+        logger = ResourceLogger().logger
+        async def timed(coro: Any) -> float:
+            await coro
+            return time.perf_counter()
+        return await asyncio.gather(
+                timed(shellrun(logger, (('cat',),), stdout=buf, stdin=slow())),
+                timed(shellrun(logger, (('true',),))),
+                )
+    buf = io.BytesIO()
+    timeSlow, timeFast = asyncio.run(both())
+    assert buf.getvalue() == b"0\n1\n2\n"
+    assert timeSlow - timeFast > 0.5
+
+def test_stdin_async_iterable() -> None:
+    async def gen() -> Any:
+        for i in range(3):
+            await asyncio.sleep(0)
+            yield b"%d\n" % i
+    buf = io.BytesIO()
+    assert run(('cat',), stdout=buf, stdin=gen()) == 0
+    assert buf.getvalue() == b"0\n1\n2\n"
+
+def test_stdin_reader_exits_early() -> None:
+    """A stage that stops reading doesn't make feeding fail"""
+    buf = io.BytesIO()
+    assert run(('head', '-c', '3'), stdout=buf, stdin=(b"x" * 65536 for _ in range(100))) == 0
+    assert buf.getvalue() == b"xxx"
+
+def test_stdin_file_range(tmp_path: Path) -> None:
+    pathIn = tmp_path / "in.txt"
+    pathIn.write_bytes(b"0123456789")
+    buf = io.BytesIO()
+    assert run(('cat',), stdout=buf, stdin=FileRange(pathIn, 3, 4)) == 0
+    assert buf.getvalue() == b"3456"
+    buf = io.BytesIO()
+    assert run(('cat',), stdout=buf, stdin=FileRange(pathIn, 7)) == 0
+    assert buf.getvalue() == b"789"
+
+def test_copy_range_to_file(tmp_path: Path) -> None:
+    """Not a pipe: falls back from splice()"""
+    pathIn = tmp_path / "in.txt"
+    pathIn.write_bytes(b"0123456789" * 1000)
+    pathOut = tmp_path / "out.txt"
+    with open(pathIn, 'rb') as fpIn, open(pathOut, 'wb') as fpOut:
+        copyRange(fpIn.fileno(), fpOut.fileno(), 5, 20)
+    assert pathOut.read_bytes() == b"56789012345678901234"
+
+def upper(aLines: Iterator[bytes]) -> Iterable[bytes]:
+    for line in aLines:
+        yield line.upper()
+
+def test_filter_between_processes(tmp_path: Path) -> None:
+    pathOut = tmp_path / "out.txt"
+    result = asyncio.run(shellrun(ResourceLogger().logger,
+            (('seq', '100000'), upper, ('tail', '-n', '1')), stdout=pathOut))
+    assert result.returncode == 0
+    assert pathOut.read_bytes() == b"100000\n"
+    assert [stage.name for stage in result.aStages] == ['seq', 'upper', 'tail']
+
+def test_filter_first_and_last(capfd: pytest.CaptureFixture[str]) -> None:
+    """A filter reading stdin and one whose output gets logged"""
+    buf = io.BytesIO()
+    assert run(upper, ('rev',), stdout=buf, stdin=b"abc\n") == 0
+    assert buf.getvalue() == b"CBA\n"
+    assert run(('echo', 'hello'), Filter(upper, name='up')) == 0
+    assert "HELLO" in capfd.readouterr().err
+
+def test_filter_chunks() -> None:
+    buf = io.BytesIO()
+    filt = Filter(lambda aChunks: [str(sum(len(c) for c in aChunks)).encode()], lines=False, sizeChunk=4096)
+    assert run(('head', '-c', '100000', '/dev/zero'), filt, stdout=buf) == 0
+    assert buf.getvalue() == b"100000"
+
+def test_filter_exception(capfd: pytest.CaptureFixture[str]) -> None:
+    def broken(aLines: Iterator[bytes]) -> Iterable[bytes]:
+        raise ValueError("oops")
+    assert run(('seq', '10'), broken, ('cat',)) == 1
+    err = capfd.readouterr().err
+    assert "Filter broken failed" in err
+    assert "ValueError: oops" in err
+
+def test_filter_downstream_gone() -> None:
+    """Like a process, a filter writing into a closed pipe fails with SIGPIPE"""
+    result = asyncio.run(shellrun(ResourceLogger().logger,
+            (('seq', '1000000'), upper, ('head', '-n', '1')), stdout=io.BytesIO()))
+    assert result.aStages[1].returncode in (0, -signal.SIGPIPE)
+    assert result.aStages[2].returncode == 0
+
+def test_failfast_within_pipeline() -> None:
+    group = FailFastGroup()
+    timeBegin = time.perf_counter()
+    result = asyncio.run(shellrun(ResourceLogger().logger, (('sleep', '30'), ('sh', '-c', 'exit 4')), group=group))
+    assert time.perf_counter() - timeBegin < 10
+    assert [stage.returncode for stage in result.aStages] == [-signal.SIGTERM, 4]
+    assert group.failure is not None and group.failure.name == 'sh'
+
+def test_failfast_across_pipelines(capfd: pytest.CaptureFixture[str]) -> None:
+    group = FailFastGroup()
+    async def both() -> list[int]:
+        logger = ResourceLogger().logger
+        aResults = await asyncio.gather(
+                shellrun(logger, (('sleep', '30'),), group=group),
+                shellrun(logger, (('sh', '-c', 'sleep 0.2; exit 5'),), group=group),
+                )
+        return [r.returncode for r in aResults]
+    timeBegin = time.perf_counter()
+    assert asyncio.run(both()) == [-signal.SIGTERM, 5]
+    assert time.perf_counter() - timeBegin < 10
+    assert "Fail-fast:" in capfd.readouterr().err
+    # Nothing more is started once the group has failed
+    result = asyncio.run(shellrun(ResourceLogger().logger, (('true',),), group=group))
+    assert result.returncode == 5 and result.aStages == []
+
+def test_failfast_escalation() -> None:
+    group = FailFastGroup(timeGrace=0.2)
+    code = "import signal, time; signal.signal(signal.SIGTERM, signal.SIG_IGN); time.sleep(30)"
+    result = asyncio.run(shellrun(ResourceLogger().logger,
+            ((sys.executable, '-c', code), ('sh', '-c', 'sleep 0.5; exit 1')), group=group))
+    assert result.aStages[0].returncode == -signal.SIGKILL
+
+def test_failfast_ignores_sigpipe() -> None:
+    group = FailFastGroup()
+    result = asyncio.run(shellrun(ResourceLogger().logger, (('yes',), ('head', '-n', '1')), stdout=io.BytesIO(), group=group))
+    assert result.aStages[0].returncode == -signal.SIGPIPE
+    assert group.failure is None
+
+def test_killed_by_signal() -> None:
+    assert run(('sh', '-c', 'kill -TERM $$')) == -15
+
+def test_missing_command() -> None:
+    with pytest.raises(ExceptionGroup) as e:
+        run(('echo', 'hi'), ('nonexistent-command-for-skritt',))
+    assert e.group_contains(FileNotFoundError)
+
+def test_limit_head_tail(capfd: pytest.CaptureFixture[str]) -> None:
+    rtn = run(('seq', '100000'), limit=LogLimit(nHead=5, nTail=3))
+    assert rtn == 0
+    aLogged = [line.split(') ', 1)[1] for line in capfd.readouterr().err.splitlines() if '[L]' in line]
+    assert aLogged == ['1', '2', '3', '4', '5', '99998', '99999', '100000']
+
+def test_limit_summary(capfd: pytest.CaptureFixture[str]) -> None:
+    run(('seq', '100000'), limit=LogLimit(nHead=10, nTail=5))
+    captured = capfd.readouterr()
+    assert "exceeds the logging limit" in captured.err
+    assert "Suppressed 99,985 lines from pid" in captured.err
+
+def test_limit_sampling() -> None:
+    limiter = LogLimiter(LogLimit(nHead=2, nSample=3))
+    aLines = [str(i) for i in range(1, 12)]
+    aOut = limiter.filter(aLines[:4]) + limiter.filter(aLines[4:])
+    assert aOut == ['1', '2', '5', '8', '11']
+    assert limiter.finish() == ([], 6)
+
+def test_limit_sampling_only() -> None:
+    limiter = LogLimiter(LogLimit(nSample=10))
+    aOut = limiter.filter([str(i) for i in range(1, 51)]) + limiter.filter([str(i) for i in range(51, 101)])
+    assert aOut == [str(i) for i in range(10, 101, 10)]
+    assert limiter.finish() == ([], 90)
+
+def test_limit_rate() -> None:
+    limiter = LogLimiter(LogLimit(rate=100))
+    assert len(limiter.filter([str(i) for i in range(1000)])) == 100
+    assert len(limiter.filter(["more"])) == 0
+    assert limiter.nSuppressed == 901
+
+def test_no_limit_passthrough() -> None:
+    limiter = LogLimiter(LogLimit())
+    aLines = [str(i) for i in range(1000)]
+    assert limiter.filter(aLines) is aLines